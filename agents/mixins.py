@@ -4,6 +4,6 @@ from django.shortcuts import redirect
 class OrganizerAndLoginRequiredMixin(AccessMixin):
     """Verify that the current user is authenticated and an Organizer."""
     def dispatch(self, request, *args, **kwargs):
-        if not request.user.is_authenticated or  not request.user.is_organizer:
+        if not request.user.is_authenticated or not request.tenant.is_organizer:
             return redirect("leads:lead-list")
         return super().dispatch(request, *args, **kwargs)
\ No newline at end of file
@@ -5,6 +5,7 @@ app_name = "agents"
 
 urlpatterns = [
     path('', AgentListView.as_view(), name="agent-list"),
+    path('async/', agent_list_async, name="agent-list-async"),
     path('create/', AgentCreateView.as_view(), name="agent-create"),
     path('<int:pk>/', AgentDetailView.as_view(), name='agent-detail'),
     path('<int:pk>/update/', AgentUpdateView.as_view(), name='agent-update'),
@@ -1,22 +1,30 @@
-import random
+from datetime import timedelta
+
+from asgiref.sync import sync_to_async
+from django.http import HttpResponseRedirect
 from django.shortcuts import render
 from django.shortcuts import reverse, redirect
-from django.core.mail import send_mail
 from django.contrib.auth.mixins import LoginRequiredMixin
+from django.utils import timezone
 from django.views.generic import ListView, CreateView, UpdateView, DeleteView, DetailView
 
 
 from .forms import AgentModelForm
-from leads.models import Agent, UserProfile
+from leads.cache import ConditionalGetMixin
+from leads.db import database_sync_to_async
+from leads.mail import enqueue_invitation
+from leads.middleware import aget_tenant
+from leads.models import Agent, LeadEvent, UserProfile
 from .mixins import OrganizerAndLoginRequiredMixin
 
 
-class AgentListView(OrganizerAndLoginRequiredMixin, ListView):
+class AgentListView(OrganizerAndLoginRequiredMixin, ConditionalGetMixin, ListView):
     template_name = "agents/agent_list.html"
+    read_from_replica = True
     context_object_name = "agents"
     def get_queryset(self):
-        organization = self.request.user.userprofile
-        return Agent.objects.filter(organization=organization)
+        organization = self.request.tenant.organization
+        return Agent.objects.filter(organization=organization).select_related("user")
     
 class AgentCreateView(OrganizerAndLoginRequiredMixin, CreateView):
     template_name = "agents/agent_create.html"
@@ -30,26 +38,35 @@ class AgentCreateView(OrganizerAndLoginRequiredMixin, CreateView):
         user = form.save(commit=False)
         user.is_agent = True
         user.is_organizer = False
-        user.set_password(f"{random.randint(0, 1000000)}")
+        #no password to hash, they choose one through the invitation link
+        user.set_unusable_password()
         user.save()
         Agent.objects.create(
             user=user,
-            organization=self.request.user.userprofile
-        )
-        send_mail(
-            subject = "You are invited as an Agent",
-            message= "You were added as an agent on Django CRM 2. Please login to start working.",
-            from_email="admin@email.com",
-            recipient_list=[user.email]
+            organization=self.request.tenant.organization
         )
+        enqueue_invitation(self.request, user)
         return super(AgentCreateView, self).form_valid(form)
     
-class AgentDetailView(OrganizerAndLoginRequiredMixin, DetailView):
+class AgentDetailView(OrganizerAndLoginRequiredMixin, ConditionalGetMixin, DetailView):
     template_name = "agents/agent_detail.html"
+    read_from_replica = True
     context_object_name = "agent"
+    activity_days = 30
+    
+    def get_context_data(self, **kwargs):
+        context = super(AgentDetailView, self).get_context_data(**kwargs)
+        since = timezone.now() - timedelta(days=self.activity_days)
+        activity = LeadEvent.objects.activity(self.object.user, since)
+        context.update({
+            "activity_days": self.activity_days,
+            "activity": [(label, activity.get(kind, 0)) for kind, label in LeadEvent.KIND_CHOICES],
+        })
+        return context
+    
     def get_queryset(self):
-        organization = self.request.user.userprofile
-        return Agent.objects.filter(organization=organization)
+        organization = self.request.tenant.organization
+        return Agent.objects.filter(organization=organization).select_related("user")
     
 class AgentUpdateView(OrganizerAndLoginRequiredMixin, UpdateView):
     template_name = "agents/agent_update.html"
@@ -60,8 +77,8 @@ class AgentUpdateView(OrganizerAndLoginRequiredMixin, UpdateView):
         return reverse("agents:agent-list")
     
     def get_queryset(self):
-        organization = self.request.user.userprofile
-        return Agent.objects.filter(organization=organization)
+        organization = self.request.tenant.organization
+        return Agent.objects.filter(organization=organization).select_related("user")
     
 class AgentDeleteView(OrganizerAndLoginRequiredMixin,DeleteView):
     template_name = "agents/agent_delete.html"
@@ -70,6 +87,21 @@ class AgentDeleteView(OrganizerAndLoginRequiredMixin,DeleteView):
     def get_success_url(self):        
         return reverse("agents:agent-list")
     def get_queryset(self):
-        organization = self.request.user.userprofile
+        organization = self.request.tenant.organization
         return Agent.objects.filter(organization=organization)
-    
\ No newline at end of file
+    
+    def delete(self, request, *args, **kwargs):
+        #soft delete, purge_deleted unassigns its leads in the background
+        self.object = self.get_object()
+        self.object.soft_delete()
+        return HttpResponseRedirect(self.get_success_url())
+    
+
+async def agent_list_async(request):
+    """AgentListView for ASGI servers, see leads.async_views."""
+    tenant = await aget_tenant(request)
+    if not tenant.user.is_authenticated or not tenant.is_organizer:
+        return redirect("leads:lead-list")
+    view = AgentListView(request=request, kwargs={})
+    agents = await database_sync_to_async(list)(view.get_queryset())
+    return await sync_to_async(render)(request, view.template_name, {"agents": agents})
@@ -50,19 +50,22 @@ INSTALLED_APPS = [
     "crispy_tailwind",
     
     #custom apps
-    'leads',
+    'leads.apps.LeadsConfig',
     'agents',
     
 ]
 
 MIDDLEWARE = [
-     "django.middleware.security.SecurityMiddleware",
-    "whitenoise.middleware.WhiteNoiseMiddleware",
     'django.middleware.security.SecurityMiddleware',
+    "whitenoise.middleware.WhiteNoiseMiddleware",
+    'leads.middleware.RequestStatsMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'leads.middleware.TenantMiddleware',
+    'leads.middleware.ReadReplicaMiddleware',
+    'leads.middleware.LeadEventMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -80,6 +83,7 @@ TEMPLATES = [
                 'django.template.context_processors.request',
                 'django.contrib.auth.context_processors.auth',
                 'django.contrib.messages.context_processors.messages',
+                'leads.context_processors.stylesheet',
             ],
         },
     },
@@ -91,16 +95,45 @@ WSGI_APPLICATION = 'djcrm2.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/3.1/ref/settings/#databases
 
-DATABASES = {
-    'default': {
-        'ENGINE': 'django.db.backends.postgresql_psycopg2',
-        'NAME': env("DB_NAME"),
-        'USER': env("DB_USER"),
-        'PASSWORD': env("DB_PASSWORD"),
-        'HOST': env("DB_HOST"),
-        'PORT': env("DB_PORT")
+# DATABASE_URL (e.g. sqlite:///db.sqlite3) replaces the DB_* settings, which
+# are then not needed; handy for local benchmarks.
+if env("DATABASE_URL", default=""):
+    DATABASES = {
+        'default': env.db("DATABASE_URL"),
     }
-}
+else:
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.postgresql_psycopg2',
+            'NAME': env("DB_NAME"),
+            'USER': env("DB_USER"),
+            'PASSWORD': env("DB_PASSWORD"),
+            'HOST': env("DB_HOST"),
+            'PORT': env("DB_PORT"),
+        }
+    }
+# keep connections open between requests instead of paying the Postgres
+# handshake on every one; 0 closes them after each request
+DATABASES['default']['CONN_MAX_AGE'] = env.int("DB_CONN_MAX_AGE", default=60)
+# Ping reused connections at the start of each request and reconnect if the
+# database dropped them while they sat idle.
+DB_CONN_HEALTH_CHECKS = env.bool("DB_CONN_HEALTH_CHECKS", default=True)
+
+# Optional read replica. Views with read_from_replica = True send their GET
+# queries to it, except for users who wrote something in the last
+# READ_YOUR_WRITES_SECONDS, who stay on the primary.
+DATABASE_REPLICA_ALIAS = None
+if env("DB_REPLICA_HOST", default=""):
+    DATABASE_REPLICA_ALIAS = "replica"
+    DATABASES[DATABASE_REPLICA_ALIAS] = {
+        **DATABASES["default"],
+        'HOST': env("DB_REPLICA_HOST"),
+        'PORT': env("DB_REPLICA_PORT", default=DATABASES["default"]["PORT"]),
+        'TEST': {'MIRROR': 'default'},
+    }
+DATABASE_ROUTERS = ["leads.routers.ReplicaRouter"]
+TEST_RUNNER = "djcrm2.test_runner.PrimaryTestRunner"
+READ_YOUR_WRITES_SECONDS = env.int("READ_YOUR_WRITES_SECONDS", default=10)
 
 
 # Password validation
@@ -144,17 +177,74 @@ STATICFILES_DIRS = [
     BASE_DIR / 'static'
 ]
 STATIC_ROOT = "static_root"
-STATICFILES_STORAGES = {
-    # ...
-    "staticfiles": {
-        "BACKEND": "whitenoise.storage.CompressedManifestStaticFilesStorage",
-    },
-}
+# Outside DEBUG, collectstatic adds a content hash to every file name and
+# writes gzip and (with the Brotli package) .br copies next to it, which
+# WhiteNoise serves with a far-future, immutable Cache-Control.
+if not DEBUG:
+    STATICFILES_STORAGE = "whitenoise.storage.CompressedManifestStaticFilesStorage"
+# The Tailwind release build_css runs, and that base.html loads in the
+# browser when there is no built stylesheet. TAILWIND_CLI can point at the
+# standalone binary instead of npx, which needs Node.js.
+TAILWIND_VERSION = "4.1.11"
+TAILWIND_CLI = env("TAILWIND_CLI", default=f"npx --yes @tailwindcss/cli@{TAILWIND_VERSION}")
 
 AUTH_USER_MODEL ='leads.User'
 
+AUTHENTICATION_BACKENDS = [
+    # loads the user with its organization or agent in one query
+    "leads.backends.TenantModelBackend",
+    # still accepts sessions logged in before the backend above existed
+    "django.contrib.auth.backends.ModelBackend",
+]
+
 EMAIL_BACKEND = "django.core.mail.backends.console.EmailBackend"
 
+# Outgoing mail is queued in the OutboundEmail table and delivered by
+# `manage.py send_queued_mail`.
+OUTBOX_BATCH_SIZE = env.int("OUTBOX_BATCH_SIZE", default=100)
+OUTBOX_MAX_ATTEMPTS = env.int("OUTBOX_MAX_ATTEMPTS", default=5)
+OUTBOX_RETRY_BACKOFF = env.int("OUTBOX_RETRY_BACKOFF", default=60)
+# Seconds a worker has to send the batch it claimed before other workers may
+# claim the emails it hasn't marked sent.
+OUTBOX_CLAIM_TIMEOUT = env.int("OUTBOX_CLAIM_TIMEOUT", default=600)
+
+# Per-view query/latency stats, served to staff at /stats/.
+REQUEST_STATS_ENABLED = env.bool("REQUEST_STATS_ENABLED", default=True)
+REQUEST_STATS_WINDOW = env.int("REQUEST_STATS_WINDOW", default=1000)
+# Maximum queries per request by URL name. "log" warns, "raise" fails the
+# request with QueryBudgetExceeded (useful in development and CI).
+QUERY_BUDGETS = {
+    "leads:lead-list": 8,
+    "leads:lead-detail": 6,
+    "leads:category-list": 8,
+    "leads:category-detail": 8,
+    "agents:agent-list": 6,
+}
+QUERY_BUDGET_ACTION = env("QUERY_BUDGET_ACTION", default="log")
+
+CACHES = {
+    "default": env.cache("CACHE_URL", default="locmemcache://"),
+}
+# Whether all workers see the same cache. The default per-process memory
+# cache isn't: a write bumps the organization's version in one worker only,
+# and the others keep serving what they had. Set CACHE_URL to Redis or
+# Memcached to turn on what depends on it.
+SHARED_CACHE = not CACHES["default"]["BACKEND"].endswith(("LocMemCache", "DummyCache"))
+# Seconds to keep rendered list/detail pages, keyed by organization, user and
+# a per-organization version that every write bumps. 0 disables the cache.
+TENANT_VIEW_CACHE_TIMEOUT = env.int("TENANT_VIEW_CACHE_TIMEOUT", default=300 if SHARED_CACHE else 0)
+# Part of every page's ETag. Set it to something new on each deploy, e.g.
+# the commit, so browsers don't keep pages rendered by older templates.
+RELEASE_VERSION = env("RELEASE_VERSION", default="")
+# With a shared cache, sessions are read from it and only written through
+# to the database, so an authenticated request doesn't query
+# django_session. A per-process cache would keep a logged out session alive
+# in the other workers.
+SESSION_ENGINE = env("SESSION_ENGINE", default=(
+    "django.contrib.sessions.backends.cached_db" if SHARED_CACHE
+    else "django.contrib.sessions.backends.db"
+))
+
 LOGIN_REDIRECT_URL = "/leads"
 LOGOUT_REDIRECT_URL = "/"
 LOGIN_URL = "login"
@@ -162,6 +252,22 @@ LOGIN_URL = "login"
 CRISPY_ALLOWED_TEMPLATE_PACKS = "tailwind"
 CRISPY_TEMPLATE_PACK = "tailwind"
 
+# Read category lead counts from the denormalized Category.lead_count column
+# instead of aggregating them from the leads table on every page view.
+CATEGORY_LEAD_COUNTERS = env.bool("CATEGORY_LEAD_COUNTERS", default=False)
+
+# Lead history events are written in one batch after the response is sent,
+# or as soon as this many are waiting. Monthly PostgreSQL partitions older
+# than LEAD_EVENTS_RETAIN_MONTHS are dropped by manage_event_partitions.
+LEAD_EVENTS_MAX_BUFFERED = env.int("LEAD_EVENTS_MAX_BUFFERED", default=500)
+LEAD_EVENTS_RETAIN_MONTHS = env.int("LEAD_EVENTS_RETAIN_MONTHS", default=24)
+
+# Deleted leads, agents and organizations are only marked as deleted in the
+# request. `manage.py purge_deleted` removes them this many rows per
+# transaction, sleeping PURGE_BATCH_PAUSE seconds between batches.
+PURGE_BATCH_SIZE = env.int("PURGE_BATCH_SIZE", default=500)
+PURGE_BATCH_PAUSE = env.float("PURGE_BATCH_PAUSE", default=0.1)
+
 if not DEBUG:
     SECURE_PROXY_SSL_HEADER = ('HTTP_X_FORWARDED_PROTO', 'https')
     SECURE_SSL_REDIRECT = True
@@ -0,0 +1,20 @@
+from django.test.runner import DiscoverRunner
+from django.test.utils import override_settings
+
+
+class PrimaryTestRunner(DiscoverRunner):
+    """
+    Run the tests against the primary even when DB_REPLICA_HOST is set. The
+    replica is a TEST MIRROR of the primary, so it can't see the rows a
+    TestCase writes inside its transaction; tests of the replica routing
+    turn it back on with override_settings(DATABASE_REPLICA_ALIAS="replica").
+    """
+
+    def setup_test_environment(self, **kwargs):
+        super().setup_test_environment(**kwargs)
+        self._primary_only = override_settings(DATABASE_REPLICA_ALIAS=None)
+        self._primary_only.enable()
+
+    def teardown_test_environment(self, **kwargs):
+        self._primary_only.disable()
+        super().teardown_test_environment(**kwargs)
@@ -3,13 +3,15 @@ from django.conf.urls.static import static
 from django.contrib import admin
 from django.contrib.auth.views import LoginView, LogoutView, PasswordResetView, PasswordResetDoneView,PasswordResetConfirmView,PasswordResetCompleteView
 from django.urls import path, include
-from leads.views import landing_page, LandingPageView, SignupView
+from leads.views import landing_page, LandingPageView, SignupView, RequestStatsView
 urlpatterns = [
     path('admin/', admin.site.urls),
     path('', LandingPageView.as_view(), name='landing-page'),
     path('leads/', include('leads.urls', namespace="leads")),
     path('agents/', include('agents.urls', namespace="agents")),
+    path('api/v1/', include('leads.api_urls', namespace="api-v1")),
     path('signup/', SignupView.as_view(), name='signup'),
+    path('stats/', RequestStatsView.as_view(), name='request-stats'),
     path('reset-password/', PasswordResetView.as_view(), name="reset-password"),
     path('password-reset-confirm/<uidb64>/<token>/', PasswordResetConfirmView.as_view(), name="password-reset-confirm"),
     path('password-reset-done/', PasswordResetDoneView.as_view(), name="password_reset_done"),
@@ -0,0 +1,30 @@
+"""
+Gunicorn settings, read from the environment:
+
+    GUNICORN_WORKERS    processes (default: 2 x CPUs + 1)
+    GUNICORN_THREADS    threads per process (default: 4, gthread worker)
+    GUNICORN_TIMEOUT    seconds before a stuck worker is restarted (default: 30)
+    GUNICORN_KEEPALIVE  seconds to keep idle HTTP connections open (default: 5)
+    GUNICORN_MAX_REQUESTS  recycle a worker after this many requests (default: 1000)
+
+Every thread keeps its own persistent database connection (DB_CONN_MAX_AGE),
+so Postgres needs max_connections >= workers x threads for every instance.
+"""
+import multiprocessing
+import os
+
+
+def _int(name, default):
+    return int(os.environ.get(name, default))
+
+
+bind = f"0.0.0.0:{os.environ.get('PORT', '8000')}"
+workers = _int("GUNICORN_WORKERS", multiprocessing.cpu_count() * 2 + 1)
+threads = _int("GUNICORN_THREADS", 4)
+# threads need the gthread worker, the default sync worker ignores them
+worker_class = "gthread" if threads > 1 else "sync"
+timeout = _int("GUNICORN_TIMEOUT", 30)
+keepalive = _int("GUNICORN_KEEPALIVE", 5)
+max_requests = _int("GUNICORN_MAX_REQUESTS", 1000)
+max_requests_jitter = max_requests // 10
+accesslog = "-"
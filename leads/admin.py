@@ -1,8 +1,24 @@
 from django.contrib import admin
-from .models import User, Lead, Agent, UserProfile, Category
+from .models import User, Lead, Agent, UserProfile, Category, OutboundEmail
+
+
+class UserProfileAdmin(admin.ModelAdmin):
+    actions = ["offboard"]
+    
+    def offboard(self, request, queryset):
+        for organization in queryset:
+            organization.soft_delete()
+        self.message_user(request, f"Offboarded {len(queryset)} organizations, purge_deleted will remove their data.")
+    offboard.short_description = "Offboard selected organizations"
+    
+    def has_delete_permission(self, request, obj=None):
+        #a cascading delete of a whole organization is one huge transaction,
+        #offboard it instead
+        return False
 
 admin.site.register(User)
 admin.site.register(Category)
-admin.site.register(UserProfile)
+admin.site.register(UserProfile, UserProfileAdmin)
 admin.site.register(Agent)
-admin.site.register(Lead)
\ No newline at end of file
+admin.site.register(Lead)
+admin.site.register(OutboundEmail)
@@ -0,0 +1,511 @@
+import json
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import F
+from django.forms.models import model_to_dict, modelform_factory
+from django.http import Http404, HttpResponse, JsonResponse
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.views.generic import View
+
+from agents.forms import AgentModelForm
+from .cache import replica_may_lag, tenant_etag
+from .dedup import DUPLICATE_KINDS, blocking_keys
+from .events import record_events
+from .forms import LeadApiForm, LeadCategoryUpdateForm
+from .mail import enqueue_invitation, enqueue_mail
+from .models import Agent, Category, Lead, LeadDedupKey, StaleLeadError, leads_bulk_changed, lead_events
+from .pagination import InvalidCursor, KeysetPaginator
+from .search import normalize_phone
+from .views import TenantLeadMixin
+
+
+class ApiError(Exception):
+
+    def __init__(self, status, message, **extra):
+        super().__init__(message)
+        self.status = status
+        self.data = dict({"error": message}, **extra)
+
+
+def form_errors(form):
+    return {field: [str(error) for error in errors] for field, errors in form.errors.items()}
+
+
+class ApiView(View):
+    """
+    Base of the JSON API. Authenticated by the session and scoped to
+    request.tenant like the HTML views. Rows are read with .values() straight
+    into the response, never as model instances.
+    """
+    #{name in the JSON: lookup for .values()}
+    fields = {}
+    #the fields returned when the request doesn't ask with ?fields=
+    default_fields = ()
+    ordering = ("id",)
+    page_size = 100
+    max_page_size = 1000
+    #items in one bulk create or update
+    max_batch_size = 500
+    organizer_only = False
+    http_method_names = ["get", "post", "patch", "delete", "head", "options"]
+
+    def dispatch(self, request, *args, **kwargs):
+        try:
+            if not request.user.is_authenticated:
+                raise ApiError(401, "Authentication required.")
+            if not request.tenant or (self.organizer_only and not request.tenant.is_organizer):
+                raise ApiError(403, "You do not have access to this resource.")
+            return super(ApiView, self).dispatch(request, *args, **kwargs)
+        except Http404:
+            return JsonResponse({"error": "Not found."}, status=404)
+        except ApiError as e:
+            return JsonResponse(e.data, status=e.status)
+
+    def http_method_not_allowed(self, request, *args, **kwargs):
+        response = super(ApiView, self).http_method_not_allowed(request, *args, **kwargs)
+        raise ApiError(405, f"Method {request.method} not allowed.", allowed=response["Allow"].split(", "))
+
+    def require_organizer(self):
+        if not self.request.tenant.is_organizer:
+            raise ApiError(403, "Only organizers can do this.")
+
+    def get_queryset(self):
+        raise NotImplementedError
+
+    def get_fields(self):
+        """The names requested with ?fields=a,b, in order."""
+        requested = self.request.GET.get("fields")
+        if not requested:
+            return list(self.default_fields or self.fields)
+        names = [name.strip() for name in requested.split(",") if name.strip()]
+        unknown = [name for name in names if name not in self.fields]
+        if unknown:
+            raise ApiError(400, f"Unknown fields: {', '.join(unknown)}.", fields=list(self.fields))
+        return list(dict.fromkeys(names))
+
+    def values(self, queryset, names):
+        """``queryset`` as dicts with ``names`` and the ordering columns as keys."""
+        names = list(dict.fromkeys(names + [name.lstrip("-") for name in self.ordering]))
+        plain = [name for name in names if self.fields.get(name, name) == name]
+        renamed = {name: F(self.fields[name]) for name in names if name not in plain}
+        return queryset.values(*plain, **renamed)
+
+    def conditional_response(self, build):
+        """A JSON response of ``build()``, or 304 if the client's copy is current."""
+        if not settings.SHARED_CACHE:
+            # see ConditionalGetMixin
+            response = JsonResponse(build())
+            patch_cache_control(response, private=True, no_cache=True)
+            return response
+        etag = tenant_etag(self.request)
+        response = get_conditional_response(self.request, etag=etag)
+        if response is None:
+            response = JsonResponse(build())
+            if not replica_may_lag(self.request):
+                response["ETag"] = etag
+        else:
+            response["ETag"] = etag
+        #cached by the client only, and revalidated before every use
+        patch_cache_control(response, private=True, no_cache=True)
+        return response
+
+    def get_payload(self):
+        try:
+            return json.loads(self.request.body or b"null")
+        except ValueError:
+            raise ApiError(400, "The request body is not valid JSON.")
+
+    def get_items(self):
+        """The JSON objects to write and whether an array was sent."""
+        payload = self.get_payload()
+        many = isinstance(payload, list)
+        items = payload if many else [payload]
+        if not all(isinstance(item, dict) for item in items):
+            raise ApiError(400, "Expected a JSON object or an array of objects.")
+        if not items:
+            raise ApiError(400, "The array is empty.")
+        if len(items) > self.max_batch_size:
+            raise ApiError(400, f"At most {self.max_batch_size} items per request.")
+        return items, many
+
+    def get_form(self, form_class, item, instance=None, **kwargs):
+        """
+        A validated form for one item, and its errors. An update validates
+        only the fields the item sends, a create starts from the model's
+        defaults.
+        """
+        unknown = sorted(set(item) - set(form_class._meta.fields) - {"id", "version"})
+        data = {key: value for key, value in item.items() if key != "id"}
+        if instance is None:
+            data = dict(model_to_dict(form_class._meta.model(), fields=form_class._meta.fields), **data)
+        else:
+            form_class = modelform_factory(
+                form_class._meta.model, form=form_class,
+                fields=[name for name in form_class._meta.fields if name in item],
+            )
+        form = form_class(data=data, instance=instance, **kwargs)
+        errors = form_errors(form) if not form.is_valid() else {}
+        errors.update({name: ["This field cannot be written."] for name in unknown})
+        return form, errors
+
+    def check_errors(self, errors):
+        if errors:
+            raise ApiError(400, "Invalid data.", errors=errors)
+
+    def serialize(self, pks, names=None):
+        """The rows with these primary keys, as the list endpoint returns them."""
+        names = names or self.get_fields()
+        rows = self.values(self.get_queryset().filter(pk__in=pks), names).order_by(*self.ordering)
+        return [{name: row[name] for name in names} for row in rows]
+
+    def list_response(self):
+        names = self.get_fields()
+        try:
+            limit = min(max(int(self.request.GET.get("limit", self.page_size)), 1), self.max_page_size)
+        except ValueError:
+            raise ApiError(400, "limit must be a number.")
+
+        def build():
+            paginator = KeysetPaginator(self.values(self.get_queryset(), names), limit, ordering=self.ordering)
+            try:
+                page = paginator.page(self.request.GET.get("cursor") or None)
+            except InvalidCursor:
+                raise ApiError(400, "Invalid cursor.")
+            next_url = None
+            if page.next_cursor is not None:
+                query = self.request.GET.copy()
+                query["cursor"] = page.next_cursor
+                next_url = self.request.build_absolute_uri(f"{self.request.path}?{query.urlencode()}")
+            return {
+                "results": [{name: row[name] for name in names} for row in page],
+                "next_cursor": page.next_cursor,
+                "next": next_url,
+            }
+        return self.conditional_response(build)
+
+    def detail_response(self):
+        names = self.get_fields()
+
+        def build():
+            row = self.values(self.get_queryset().filter(pk=self.kwargs["pk"]), names).first()
+            if row is None:
+                raise Http404
+            return {name: row[name] for name in names}
+        return self.conditional_response(build)
+
+
+class LeadApiMixin(TenantLeadMixin):
+    fields = {
+        "id": "id",
+        "first_name": "first_name",
+        "last_name": "last_name",
+        "age": "age",
+        "email": "email",
+        "phone_number": "phone_number",
+        "description": "description",
+        "date_added": "date_added",
+        "agent": "agent",
+        "category": "category",
+        "version": "version",
+        "updated_at": "updated_at",
+        #joins, only made when asked for
+        "agent_email": "agent__user__email",
+        "category_name": "category__name",
+    }
+    default_fields = (
+        "id", "first_name", "last_name", "age", "email", "phone_number",
+        "description", "date_added", "agent", "category", "version", "updated_at",
+    )
+    #same order and indexes as the lead list
+    ordering = ("date_added", "id")
+
+    def get_form_class(self):
+        #agents can only recategorize their own leads
+        if self.request.tenant.is_organizer:
+            return LeadApiForm
+        return LeadCategoryUpdateForm
+
+    def update_leads(self, items):
+        """
+        Validate every item, then write each lead's changed columns with one
+        conditional UPDATE, all or nothing. Returns the ids written.
+        """
+        form_class = self.get_form_class()
+        ids = [item.get("id") for item in items]
+        if not all(isinstance(pk, int) for pk in ids):
+            raise ApiError(400, "Every item needs an integer id.")
+        leads = self.get_queryset().in_bulk(ids)
+        errors, changes = {}, []
+        for index, (pk, item) in enumerate(zip(ids, items)):
+            lead = leads.get(pk)
+            if lead is None:
+                errors[index] = {"id": ["Not found."]}
+                continue
+            form, item_errors = self.get_form(
+                form_class, item, instance=lead, organization=self.request.tenant.organization,
+            )
+            if item_errors:
+                errors[index] = item_errors
+                continue
+            changes.append((index, lead, form.changed_fields(), form.cleaned_data.get("version")))
+        self.check_errors(errors)
+        with transaction.atomic():
+            for index, lead, fields, version in changes:
+                if not fields:
+                    continue
+                try:
+                    lead.save_changes(fields, version=version, scope=self.get_lead_scope())
+                except StaleLeadError:
+                    raise ApiError(409, "The lead was changed by someone else, reload it.", index=index, id=lead.pk)
+        return ids
+
+
+class LeadListApiView(LeadApiMixin, ApiView):
+    read_from_replica = True
+
+    def get(self, request, *args, **kwargs):
+        return self.list_response()
+
+    def post(self, request, *args, **kwargs):
+        """Create one lead from an object, or many from an array with one bulk INSERT."""
+        self.require_organizer()
+        items, many = self.get_items()
+        organization = request.tenant.organization
+        errors, leads = {}, {}
+        for index, item in enumerate(items):
+            form, item_errors = self.get_form(LeadApiForm, item, organization=organization)
+            if item_errors:
+                errors[index] = item_errors
+                continue
+            lead = form.save(commit=False)
+            lead.organization = organization
+            leads[index] = lead
+        if request.GET.get("allow_duplicates") not in ("1", "true"):
+            errors.update(self.duplicate_errors(organization, leads))
+        self.check_errors(errors)
+        leads = list(leads.values())
+        if not many:
+            leads[0].save()
+            enqueue_mail(
+                subject="A lead has been created.",
+                message="Visit the site to check it out.",
+                from_email="test_sender@test.com",
+                recipient_list=["test_recipient@test.com"]
+            )
+            return JsonResponse(self.serialize([leads[0].pk])[0], status=201)
+        with transaction.atomic():
+            for lead in leads:
+                lead.phone_digits = normalize_phone(lead.phone_number)
+            Lead.objects.bulk_create(leads)
+            #only backends that return primary keys (PostgreSQL) get history
+            record_events([event for lead in leads if lead.pk for event in lead_events(lead, True, None)])
+            LeadDedupKey.objects.index(leads)
+            if any(lead.pk is None for lead in leads):
+                #SQLite's bulk_create returns no primary keys
+                LeadDedupKey.objects.index_missing(organization.pk)
+            leads_bulk_changed.send(sender=Lead, organization_id=organization.pk)
+        enqueue_mail(
+            subject=f"{len(leads)} leads have been created.",
+            message="Visit the site to check them out.",
+            from_email="test_sender@test.com",
+            recipient_list=["test_recipient@test.com"]
+        )
+        pks = [lead.pk for lead in leads if lead.pk is not None]
+        return JsonResponse({"created": len(leads), "results": self.serialize(pks)}, status=201)
+
+    def duplicate_errors(self, organization, leads):
+        """
+        Errors for the leads, by item index, with the email or phone number
+        of an existing lead or of an earlier item. One LeadDedupKey lookup,
+        as for imports.
+        """
+        keys = {
+            index: [key for key in blocking_keys(lead.first_name, lead.last_name, lead.email, lead.phone_number)
+                    if key[0] in DUPLICATE_KINDS]
+            for index, lead in leads.items()
+        }
+        existing = {
+            (kind, key): lead_id
+            for kind, key, lead_id in LeadDedupKey.objects.matching(
+                organization.pk, [key for item_keys in keys.values() for key in item_keys]
+            ).values_list("kind", "key", "lead")
+        }
+        errors, seen = {}, {}
+        for index, item_keys in keys.items():
+            for key in item_keys:
+                if key in existing:
+                    errors[index] = {"__all__": [f"Duplicate of lead {existing[key]}."]}
+                    break
+                if key in seen:
+                    errors[index] = {"__all__": [f"Duplicate of item {seen[key]}."]}
+                    break
+            else:
+                for key in item_keys:
+                    seen[key] = index
+        return errors
+
+    def patch(self, request, *args, **kwargs):
+        """Update many leads from an array of objects with an ``id`` each."""
+        items, many = self.get_items()
+        if not many:
+            raise ApiError(400, "Expected an array, PATCH a single lead at its own URL.")
+        return JsonResponse({"results": self.serialize(self.update_leads(items))})
+
+
+class LeadDetailApiView(LeadApiMixin, ApiView):
+    read_from_replica = True
+
+    def get(self, request, *args, **kwargs):
+        return self.detail_response()
+
+    def patch(self, request, *args, **kwargs):
+        item = self.get_payload()
+        if not isinstance(item, dict):
+            raise ApiError(400, "Expected a JSON object.")
+        self.update_leads([dict(item, id=self.kwargs["pk"])])
+        return JsonResponse(self.serialize([self.kwargs["pk"]])[0])
+
+    def delete(self, request, *args, **kwargs):
+        self.require_organizer()
+        try:
+            with transaction.atomic():
+                self.get_queryset().get(pk=self.kwargs["pk"]).soft_delete()
+        except Lead.DoesNotExist:
+            raise Http404
+        except StaleLeadError:
+            #edited since it was loaded, delete it as it is now
+            self.get_queryset().get(pk=self.kwargs["pk"]).soft_delete()
+        return HttpResponse(status=204)
+
+
+class AgentApiMixin:
+    organizer_only = True
+    fields = {
+        "id": "id",
+        "username": "user__username",
+        "email": "user__email",
+        "first_name": "user__first_name",
+        "last_name": "user__last_name",
+        "updated_at": "updated_at",
+    }
+
+    def get_queryset(self):
+        return Agent.objects.filter(organization=self.request.tenant.organization)
+
+    def save_agents(self, forms):
+        """Create or update the agents' users, all or nothing."""
+        try:
+            with transaction.atomic():
+                return [form.save() for form in forms]
+        except IntegrityError:
+            #two items with the same username
+            raise ApiError(400, "Usernames must be unique.")
+
+    def update_agents(self, items):
+        """Validate every item, then save the changed agents' users. Returns the ids."""
+        ids = [item.get("id") for item in items]
+        if not all(isinstance(pk, int) for pk in ids):
+            raise ApiError(400, "Every item needs an integer id.")
+        agents = self.get_queryset().select_related("user").in_bulk(ids)
+        errors, forms = {}, []
+        for index, (pk, item) in enumerate(zip(ids, items)):
+            agent = agents.get(pk)
+            if agent is None:
+                errors[index] = {"id": ["Not found."]}
+                continue
+            form, item_errors = self.get_form(AgentModelForm, item, instance=agent.user)
+            if item_errors:
+                errors[index] = item_errors
+                continue
+            if form.has_changed():
+                forms.append(form)
+        self.check_errors(errors)
+        self.save_agents(forms)
+        return ids
+
+
+class AgentListApiView(AgentApiMixin, ApiView):
+    read_from_replica = True
+
+    def get(self, request, *args, **kwargs):
+        return self.list_response()
+
+    def post(self, request, *args, **kwargs):
+        """Invite one agent from an object, or many from an array."""
+        items, many = self.get_items()
+        errors, forms = {}, []
+        for index, item in enumerate(items):
+            form, item_errors = self.get_form(AgentModelForm, item)
+            if item_errors:
+                errors[index] = item_errors
+                continue
+            user = form.instance
+            user.is_agent = True
+            user.is_organizer = False
+            #they choose their own through the invitation link
+            user.set_unusable_password()
+            forms.append(form)
+        self.check_errors(errors)
+        with transaction.atomic():
+            users = self.save_agents(forms)
+            agents = [Agent.objects.create(user=user, organization=request.tenant.organization) for user in users]
+        for user in users:
+            enqueue_invitation(request, user)
+        rows = self.serialize([agent.pk for agent in agents])
+        return JsonResponse({"results": rows} if many else rows[0], status=201)
+
+    def patch(self, request, *args, **kwargs):
+        """Update many agents from an array of objects with an ``id`` each."""
+        items, many = self.get_items()
+        if not many:
+            raise ApiError(400, "Expected an array, PATCH a single agent at its own URL.")
+        return JsonResponse({"results": self.serialize(self.update_agents(items))})
+
+
+class AgentDetailApiView(AgentApiMixin, ApiView):
+    read_from_replica = True
+
+    def get(self, request, *args, **kwargs):
+        return self.detail_response()
+
+    def patch(self, request, *args, **kwargs):
+        item = self.get_payload()
+        if not isinstance(item, dict):
+            raise ApiError(400, "Expected a JSON object.")
+        self.update_agents([dict(item, id=self.kwargs["pk"])])
+        return JsonResponse(self.serialize([self.kwargs["pk"]])[0])
+
+    def delete(self, request, *args, **kwargs):
+        try:
+            self.get_queryset().get(pk=self.kwargs["pk"]).soft_delete()
+        except Agent.DoesNotExist:
+            raise Http404
+        return HttpResponse(status=204)
+
+
+class CategoryApiMixin:
+    fields = {
+        "id": "id",
+        "name": "name",
+        #kept up to date by the lead signals
+        "lead_count": "lead_count",
+        "updated_at": "updated_at",
+    }
+
+    def get_queryset(self):
+        return Category.objects.filter(organization=self.request.tenant.organization)
+
+
+class CategoryListApiView(CategoryApiMixin, ApiView):
+    read_from_replica = True
+
+    def get(self, request, *args, **kwargs):
+        return self.list_response()
+
+
+class CategoryDetailApiView(CategoryApiMixin, ApiView):
+    read_from_replica = True
+
+    def get(self, request, *args, **kwargs):
+        return self.detail_response()
@@ -0,0 +1,14 @@
+from django.urls import path
+
+from . import api
+
+app_name = "api"
+
+urlpatterns = [
+    path('leads/', api.LeadListApiView.as_view(), name='lead-list'),
+    path('leads/<int:pk>/', api.LeadDetailApiView.as_view(), name='lead-detail'),
+    path('agents/', api.AgentListApiView.as_view(), name='agent-list'),
+    path('agents/<int:pk>/', api.AgentDetailApiView.as_view(), name='agent-detail'),
+    path('categories/', api.CategoryListApiView.as_view(), name='category-list'),
+    path('categories/<int:pk>/', api.CategoryDetailApiView.as_view(), name='category-detail'),
+]
@@ -1,5 +1,21 @@
 from django.apps import AppConfig
+from django.core.signals import request_finished, request_started
+from django.db.models.signals import post_migrate
+
+
+def reinstall_search_triggers(using, **kwargs):
+    from django.db import connections
+    from .search import install_sqlite_triggers
+    install_sqlite_triggers(connections[using])
 
 
 class LeadsConfig(AppConfig):
     name = 'leads'
+
+    def ready(self):
+        post_migrate.connect(reinstall_search_triggers, sender=self)
+        from .db import check_connections
+        request_started.connect(check_connections, dispatch_uid="leads.db.check_connections")
+        from .events import request_finished_handler, request_started_handler
+        request_started.connect(request_started_handler, dispatch_uid="leads.events.request_started")
+        request_finished.connect(request_finished_handler, dispatch_uid="leads.events.request_finished")
@@ -0,0 +1,150 @@
+import heapq
+import itertools
+from collections import defaultdict
+
+from django.db.models import Count, F, Q
+from django.utils import timezone
+
+from .events import current_actor_id, record_events
+from .models import Lead, Agent, LeadEvent, leads_bulk_changed
+
+ROUND_ROBIN = "round_robin"
+LEAST_LOADED = "least_loaded"
+CATEGORY_AFFINITY = "category_affinity"
+STRATEGY_CHOICES = (
+    (ROUND_ROBIN, "Round robin"),
+    (LEAST_LOADED, "Least loaded"),
+    (CATEGORY_AFFINITY, "Category affinity"),
+)
+
+# keep IN lists under SQLite's host parameter limit
+UPDATE_CHUNK_SIZE = 900
+
+
+def _chunks(ids, size=UPDATE_CHUNK_SIZE):
+    for start in range(0, len(ids), size):
+        yield ids[start:start + size]
+
+
+def _assignment_events(organization, previous_agents, agent_id):
+    """LeadEvents for leads moved from {lead_id: previous agent_id} to ``agent_id``."""
+    actor_id = current_actor_id()
+    return [
+        LeadEvent(
+            organization_id=organization.pk, lead_id=lead_id, actor_id=actor_id,
+            kind=LeadEvent.ASSIGNED, changes={"agent": [previous, agent_id]},
+        )
+        for lead_id, previous in previous_agents.items()
+    ]
+
+
+def bulk_assign(organization, lead_ids, agent):
+    """Assign many leads to one agent with UPDATE ... WHERE id IN (...)."""
+    lead_ids = list(lead_ids)
+    updated = 0
+    for chunk in _chunks(lead_ids):
+        leads = Lead.objects.filter(organization=organization, pk__in=chunk)
+        #the previous agents, for the history
+        previous = dict(leads.exclude(agent=agent).values_list("pk", "agent_id"))
+        updated += leads.update(agent=agent, version=F("version") + 1, updated_at=timezone.now())
+        record_events(_assignment_events(organization, previous, agent.pk))
+    if updated:
+        leads_bulk_changed.send(sender=Lead, organization_id=organization.pk)
+    return updated
+
+
+def agent_loads(organization):
+    """{agent_id: number of live leads} for every agent, in one aggregate query."""
+    return dict(
+        Agent.objects.filter(organization=organization)
+        .annotate(load=Count("lead", filter=Q(lead__deleted_at__isnull=True)))
+        .order_by("pk")
+        .values_list("pk", "load")
+    )
+
+
+def category_affinities(organization):
+    """{category_id: set of agent_ids that already work leads in it}."""
+    affinities = defaultdict(set)
+    rows = (
+        Lead.objects.filter(organization=organization, agent__isnull=False, category__isnull=False)
+        .order_by()
+        .values_list("category", "agent")
+        .distinct()
+    )
+    for category_id, agent_id in rows:
+        affinities[category_id].add(agent_id)
+    return affinities
+
+
+def plan_assignment(leads, loads, strategy, affinities=None):
+    """
+    Decide an agent for each (lead_id, category_id) pair.
+
+    ``loads`` maps agent ids to their current lead count and is updated in
+    place as leads are handed out. Returns {agent_id: [lead_id, ...]}.
+    """
+    plan = defaultdict(list)
+    if not loads:
+        return plan
+    if strategy == ROUND_ROBIN:
+        agents = itertools.cycle(sorted(loads))
+        for lead_id, _ in leads:
+            agent_id = next(agents)
+            plan[agent_id].append(lead_id)
+            loads[agent_id] += 1
+        return plan
+    heap = [(load, agent_id) for agent_id, load in loads.items()]
+    heapq.heapify(heap)
+    for lead_id, category_id in leads:
+        candidates = (affinities or {}).get(category_id)
+        if strategy == CATEGORY_AFFINITY and candidates:
+            # least loaded of the agents already working this category
+            agent_id = min(candidates, key=lambda pk: (loads[pk], pk))
+        else:
+            # pop stale heap entries until one matches the live load
+            while True:
+                load, agent_id = heapq.heappop(heap)
+                if load == loads[agent_id]:
+                    break
+        plan[agent_id].append(lead_id)
+        loads[agent_id] += 1
+        heapq.heappush(heap, (loads[agent_id], agent_id))
+    return plan
+
+
+def auto_assign(organization, strategy=LEAST_LOADED, limit=None):
+    """
+    Spread the organization's unassigned leads over its agents, oldest
+    first. Runs one aggregate query for agent loads, one read of the
+    unassigned lead ids and one UPDATE per agent (per chunk of ids).
+    Returns {agent_id: number of leads assigned}.
+    """
+    loads = agent_loads(organization)
+    if not loads:
+        return {}
+    affinities = category_affinities(organization) if strategy == CATEGORY_AFFINITY else None
+    unassigned = (
+        Lead.objects.filter(organization=organization, agent__isnull=True)
+        .order_by("date_added", "id")
+        .values_list("pk", "category_id")
+    )
+    if limit:
+        unassigned = unassigned[:limit]
+    plan = plan_assignment(list(unassigned), loads, strategy, affinities)
+    assigned = {}
+    for agent_id, lead_ids in plan.items():
+        assigned[agent_id] = 0
+        for chunk in _chunks(lead_ids):
+            # agent__isnull guards against leads assigned meanwhile by hand
+            count = Lead.objects.filter(
+                organization=organization, pk__in=chunk, agent__isnull=True
+            ).update(agent_id=agent_id, version=F("version") + 1, updated_at=timezone.now())
+            if count != len(chunk):
+                #some were taken meanwhile, only log the ones that are now ours
+                chunk = list(Lead.objects.filter(pk__in=chunk, agent_id=agent_id).values_list("pk", flat=True))
+            assigned[agent_id] += count
+            record_events(_assignment_events(organization, dict.fromkeys(chunk), agent_id))
+    if any(assigned.values()):
+        leads_bulk_changed.send(sender=Lead, organization_id=organization.pk)
+    return assigned
@@ -0,0 +1,79 @@
+"""
+Async versions of the hot read-only pages, for running under an ASGI server
+(uvicorn djcrm2.asgi:application). Queries that do not depend on each other
+run concurrently, each on its own connection; the page is then rendered from
+already loaded data.
+"""
+import asyncio
+
+from asgiref.sync import sync_to_async
+from django.contrib.auth.views import redirect_to_login
+from django.http import Http404
+from django.shortcuts import render
+
+from .db import database_sync_to_async
+from .middleware import aget_tenant
+from .pagination import InvalidCursor, KeysetPaginator
+from .views import LeadListView, LeadDetailView, CategoryListView
+
+
+async def _login_required(request):
+    tenant = await aget_tenant(request)
+    if not tenant.user.is_authenticated:
+        return tenant, redirect_to_login(request.get_full_path())
+    return tenant, None
+
+
+async def _render(request, template_name, context):
+    #templates may still touch the session or user, keep them off the loop
+    return await sync_to_async(render)(request, template_name, context)
+
+
+async def lead_list(request):
+    tenant, redirect = await _login_required(request)
+    if redirect:
+        return redirect
+    view = LeadListView(request=request, kwargs={})
+    paginator = KeysetPaginator(view.get_queryset(), view.paginate_by, ordering=view.keyset_ordering)
+    cursor = request.GET.get(view.cursor_kwarg) or None
+    queries = [database_sync_to_async(paginator.page)(cursor)]
+    if tenant.is_organizer:
+        #the unassigned block does not depend on the page, fetch both at once
+        queries.append(database_sync_to_async(list)(view.get_unassigned_queryset()))
+    try:
+        page, *unassigned = await asyncio.gather(*queries)
+    except InvalidCursor:
+        raise Http404("Invalid cursor.")
+    return await _render(request, view.template_name, {
+        "leads": page.object_list,
+        "page_obj": page,
+        "paginator": paginator,
+        "is_paginated": page.has_other_pages(),
+        "unassigned_leads": unassigned[0] if unassigned else None,
+    })
+
+
+async def lead_detail(request, pk):
+    tenant, redirect = await _login_required(request)
+    if redirect:
+        return redirect
+    view = LeadDetailView(request=request, kwargs={"pk": pk})
+    lead = await database_sync_to_async(view.get_queryset().filter(pk=pk).first)()
+    if lead is None:
+        raise Http404("No lead found matching the query")
+    return await _render(request, view.template_name, {"lead": lead})
+
+
+async def category_list(request):
+    tenant, redirect = await _login_required(request)
+    if redirect:
+        return redirect
+    view = CategoryListView(request=request, kwargs={})
+    categories, counts = await asyncio.gather(
+        database_sync_to_async(list)(view.get_queryset()),
+        database_sync_to_async(view.get_lead_counts)(),
+    )
+    return await _render(request, view.template_name, {
+        "category_list": categories,
+        "unassigned_lead_count": view.apply_lead_counts(categories, counts),
+    })
@@ -0,0 +1,20 @@
+from django.contrib.auth.backends import ModelBackend
+
+from .models import User
+
+
+class TenantModelBackend(ModelBackend):
+    """
+    ModelBackend that loads a session's user together with its organization,
+    or its agent row and the agent's organization, in a single query. The
+    tenant middleware then finds them already cached on the user.
+    """
+
+    def get_user(self, user_id):
+        user = (
+            User._default_manager.select_related("userprofile", "agent__organization")
+            .filter(pk=user_id).first()
+        )
+        if user is None or not self.user_can_authenticate(user):
+            return None
+        return user
@@ -0,0 +1,110 @@
+import random
+import time
+import uuid
+from collections import defaultdict
+from contextlib import ExitStack
+
+from django.db import connections
+from django.db.models import Max, Min
+from django.test import Client
+from django.urls import reverse
+
+from .instrumentation import QueryCounter, percentile
+from .models import Agent, Category, Lead
+
+
+class FlowBenchmark:
+    """
+    Drive the test client through the organizer's core flow, login, lead
+    list, lead detail, create, assign and category update, and record the
+    latency and query count of every request by URL name.
+    """
+
+    def __init__(self, organizations, password="password", seed=0):
+        self.organizations = list(organizations)
+        self.password = password
+        self.random = random.Random(seed)
+        self.samples = defaultdict(list)
+        self._choices = {}
+
+    def choices(self, organization):
+        """Lead id range, agent ids and category ids of one organization, loaded once."""
+        if organization.pk not in self._choices:
+            self._choices[organization.pk] = (
+                Lead.objects.filter(organization=organization).aggregate(low=Min("pk"), high=Max("pk")),
+                list(Agent.objects.filter(organization=organization).values_list("pk", flat=True)),
+                list(Category.objects.filter(organization=organization).values_list("pk", flat=True)),
+            )
+        return self._choices[organization.pk]
+
+    def request(self, name, method, url, data=None):
+        counter = QueryCounter()
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(counter))
+            started = time.perf_counter()
+            response = getattr(self.client, method)(url, data)
+            elapsed = time.perf_counter() - started
+        # a form that fails validation is re-rendered with a 200, only a
+        # redirect means the POST did its work
+        expected = 200 if method == "get" else 302
+        if response.status_code != expected:
+            raise AssertionError(f"{method.upper()} {url} returned {response.status_code}, not {expected}.")
+        self.samples[name].append((elapsed, counter.count))
+        return response
+
+    def run_flow(self, organization):
+        lead_ids, agent_ids, category_ids = self.choices(organization)
+        self.client = Client()
+        self.request("login", "post", reverse("login"), {
+            "username": organization.user.username, "password": self.password,
+        })
+        self.request("leads:lead-list", "get", reverse("leads:lead-list"))
+        lead = Lead.objects.filter(
+            organization=organization, pk__gte=self.random.randint(lead_ids["low"], lead_ids["high"])
+        ).order_by("pk").only("pk").first()
+        self.request("leads:lead-detail", "get", reverse("leads:lead-detail", kwargs={"pk": lead.pk}))
+        # a new person every time, or the duplicate check refuses the lead;
+        # seeded leads only have 555 numbers
+        token = uuid.uuid4()
+        email = f"bench-{token.hex}@example.com"
+        self.request("leads:lead-create", "post", reverse("leads:lead-create"), {
+            "first_name": "Bench", "last_name": "Mark", "age": 30, "description": "Benchmark lead.",
+            "email": email, "phone_number": "+1 556 %07d" % (token.int % 10 ** 7),
+        })
+        lead = Lead.objects.filter(organization=organization, email=email).only("pk").first()
+        if lead is None:
+            raise AssertionError(f"The lead-create step created no lead for {organization.user.username}.")
+        self.request("leads:assign-agent", "post", reverse("leads:assign-agent", kwargs={"pk": lead.pk}), {
+            "agent": self.random.choice(agent_ids),
+        })
+        self.request(
+            "leads:lead-category-update", "post",
+            reverse("leads:lead-category-update", kwargs={"pk": lead.pk}),
+            {"category": self.random.choice(category_ids)},
+        )
+
+    def run(self, iterations, warmup=1):
+        """Run ``iterations`` flows, round robin over the organizations."""
+        for i in range(warmup + iterations):
+            if i == warmup:
+                # templates are compiled and caches primed, start measuring
+                self.samples.clear()
+            self.run_flow(self.organizations[i % len(self.organizations)])
+        return self.report()
+
+    def report(self):
+        results = {}
+        for name, samples in self.samples.items():
+            latencies = sorted(elapsed for elapsed, _ in samples)
+            queries = [count for _, count in samples]
+            results[name] = {
+                "requests": len(samples),
+                "requests_per_second": len(samples) / sum(latencies),
+                "p50_ms": percentile(latencies, 0.50) * 1000,
+                "p95_ms": percentile(latencies, 0.95) * 1000,
+                "p99_ms": percentile(latencies, 0.99) * 1000,
+                "mean_queries": sum(queries) / len(queries),
+                "max_queries": max(queries),
+            }
+        return results
@@ -0,0 +1,157 @@
+import hashlib
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.utils.cache import get_conditional_response, patch_cache_control, patch_vary_headers
+from django.utils.http import http_date
+
+from .routers import replica_in_use
+
+
+def _version_key(organization_id):
+    return f"tenant-version:{organization_id}"
+
+
+def _changed_key(organization_id):
+    return f"tenant-changed:{organization_id}"
+
+
+def get_tenant_version(organization_id):
+    """
+    Current cache version of an organization. A missing key starts from the
+    clock rather than 1 so an evicted counter never reuses an old version.
+    """
+    key = _version_key(organization_id)
+    version = cache.get(key)
+    if version is None:
+        cache.add(key, time.time_ns(), None)
+        version = cache.get(key)
+    return version
+
+
+def bump_tenant_version(organization_id):
+    """Invalidate every cached page of one organization and no other."""
+    if organization_id is None:
+        return
+    key = _version_key(organization_id)
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.add(key, time.time_ns(), None)
+    cache.set(_changed_key(organization_id), time.time(), None)
+    #and again once the write commits: a page rendered in between, from
+    #the data before it, must not be kept under the new version
+    if transaction.get_connection().in_atomic_block:
+        transaction.on_commit(lambda: bump_tenant_version(organization_id))
+
+
+def tenant_etag(request):
+    """
+    A validator for one page of the requesting tenant, without querying
+    anything: it changes with every write to the organization, and differs
+    per release, role, user and URL.
+    """
+    tenant = request.tenant
+    key = "%s:%s:%s:%s:%s:%s:%s" % (
+        settings.RELEASE_VERSION,
+        request.resolver_match.view_name,
+        tenant.organization.pk,
+        tenant.role,
+        request.user.pk,
+        get_tenant_version(tenant.organization.pk),
+        request.get_full_path(),
+    )
+    return '"%s"' % hashlib.md5(key.encode()).hexdigest()
+
+
+def replica_may_lag(request):
+    """
+    Whether this request reads from a replica that may not have caught up
+    with the organization's latest write yet, so what it renders could be
+    older than tenant_etag() promises.
+    """
+    if not replica_in_use():
+        return False
+    changed = cache.get(_changed_key(request.tenant.organization.pk))
+    return changed is not None and time.time() - changed < settings.READ_YOUR_WRITES_SECONDS
+
+
+class ConditionalGetMixin:
+    """
+    Answer a GET whose If-None-Match still matches tenant_etag() with
+    304 Not Modified, before any query or rendering. Other responses are
+    marked private and revalidated on every use. Goes before
+    TenantCacheMixin, so a 304 doesn't even read the cache.
+
+    Only with a SHARED_CACHE: the version in the ETag is otherwise kept per
+    worker, and a worker that didn't see a write would still answer 304.
+    """
+    
+    def get_last_modified(self):
+        obj = getattr(self, "object", None)
+        return getattr(obj, "updated_at", None)
+    
+    def get(self, request, *args, **kwargs):
+        if not request.tenant or not settings.SHARED_CACHE:
+            return super().get(request, *args, **kwargs)
+        etag = tenant_etag(request)
+        response = get_conditional_response(request, etag=etag)
+        if response is None:
+            response = super().get(request, *args, **kwargs)
+            if response.status_code != 200:
+                return response
+            last_modified = self.get_last_modified()
+            if last_modified is not None:
+                response["Last-Modified"] = http_date(last_modified.timestamp())
+            if not replica_may_lag(request):
+                response["ETag"] = etag
+        else:
+            response["ETag"] = etag
+        patch_cache_control(response, private=True, no_cache=True)
+        patch_vary_headers(response, ("Cookie",))
+        return response
+
+
+class TenantCacheMixin:
+    """
+    Cache the rendered GET response, headers included, per organization,
+    role, user and tenant version. Any write to the organization's leads,
+    categories or agents bumps the version, so stale entries are never
+    served and simply expire. Pages that render a CSRF token are not
+    cached: the token belongs to the session that rendered them.
+    """
+    cache_timeout = None
+
+    def get_cache_timeout(self):
+        if self.cache_timeout is not None:
+            return self.cache_timeout
+        return settings.TENANT_VIEW_CACHE_TIMEOUT
+
+    def get_cache_key(self):
+        tenant = self.request.tenant
+        organization_id = tenant.organization.pk
+        path = hashlib.md5(self.request.get_full_path().encode()).hexdigest()
+        return "tenant-view:%s:%s:%s:%s:%s:%s" % (
+            self.request.resolver_match.view_name,
+            organization_id,
+            tenant.role,
+            self.request.user.pk,
+            get_tenant_version(organization_id),
+            path,
+        )
+
+    def get(self, request, *args, **kwargs):
+        if not self.get_cache_timeout() or not request.tenant:
+            return super().get(request, *args, **kwargs)
+        key = self.get_cache_key()
+        response = cache.get(key)
+        if response is not None:
+            return response
+        response = super().get(request, *args, **kwargs)
+        if response.status_code == 200:
+            response.render()
+            if not request.META.get("CSRF_COOKIE_USED"):
+                cache.set(key, response, self.get_cache_timeout())
+        return response
@@ -0,0 +1,29 @@
+from django.conf import settings
+from django.contrib.staticfiles import finders
+from django.contrib.staticfiles.storage import ManifestFilesMixin, staticfiles_storage
+
+STYLESHEET = "css/styles.css"
+
+
+def stylesheet(request):
+    """
+    The URL of the Tailwind stylesheet build_css writes, or None before it
+    has been built (and collected, outside DEBUG). In DEBUG base.html then
+    compiles Tailwind in the browser instead; in production a missing
+    stylesheet must show, runserver.sh doesn't start without one.
+    """
+    url = None
+    # in DEBUG the manifest isn't consulted, url() never fails
+    if isinstance(staticfiles_storage, ManifestFilesMixin) and not settings.DEBUG:
+        try:
+            url = staticfiles_storage.url(STYLESHEET)
+        except ValueError:
+            # not in the manifest
+            pass
+    elif finders.find(STYLESHEET) or staticfiles_storage.exists(STYLESHEET):
+        url = staticfiles_storage.url(STYLESHEET)
+    return {
+        "stylesheet_url": url,
+        "compile_in_browser": url is None and settings.DEBUG,
+        "tailwind_version": settings.TAILWIND_VERSION,
+    }
@@ -0,0 +1,41 @@
+from asgiref.sync import SyncToAsync
+from django.conf import settings
+from django.db import close_old_connections, connections
+
+
+def check_connections(**kwargs):
+    """
+    Close persistent connections that went bad while idle (database
+    restart, failover, a proxy's idle timeout) so the request opens a fresh
+    one instead of failing on its first query. Connected to request_started,
+    after Django's own close_old_connections.
+    """
+    if not settings.DB_CONN_HEALTH_CHECKS:
+        return
+    for connection in connections.all():
+        if connection.connection is None or connection.in_atomic_block:
+            continue
+        if not connection.is_usable():
+            connection.close()
+
+
+class DatabaseSyncToAsync(SyncToAsync):
+    """
+    sync_to_async() for ORM work that should run in parallel with other
+    queries of the same request. Each call runs in a pool thread, with that
+    thread's own connection, which is recycled before and after the call
+    the way the request cycle recycles the main one.
+    """
+
+    def __init__(self, func):
+        super().__init__(func, thread_sensitive=False)
+
+    def thread_handler(self, loop, *args, **kwargs):
+        close_old_connections()
+        try:
+            return super().thread_handler(loop, *args, **kwargs)
+        finally:
+            close_old_connections()
+
+
+database_sync_to_async = DatabaseSyncToAsync
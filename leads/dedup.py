@@ -0,0 +1,72 @@
+import hashlib
+
+from .search import normalize_phone
+
+EMAIL = "email"
+PHONE = "phone"
+NAME = "name"
+KIND_CHOICES = (
+    (EMAIL, "Email"),
+    (PHONE, "Phone number"),
+    (NAME, "Name"),
+)
+# kinds that on their own make two leads the same person; a shared name
+# sound is only a candidate, see find_duplicate_leads --by
+DUPLICATE_KINDS = (EMAIL, PHONE)
+# national numbers are compared, so "+1 555 010 2030" matches "555 010 2030"
+PHONE_KEY_DIGITS = 10
+PHONE_MIN_DIGITS = 7
+
+_SOUNDEX_CODES = {
+    **dict.fromkeys("bfpv", "1"),
+    **dict.fromkeys("cgjkqsxz", "2"),
+    **dict.fromkeys("dt", "3"),
+    "l": "4",
+    **dict.fromkeys("mn", "5"),
+    "r": "6",
+}
+
+
+def normalize_email(value):
+    """Lowercased, without a "+tag" in the local part."""
+    local, _, domain = (value or "").strip().lower().rpartition("@")
+    if not local:
+        return domain
+    return "%s@%s" % (local.split("+", 1)[0], domain)
+
+
+def soundex(name):
+    """American Soundex: "Robert" and "Rupert" are both R163, "" for no letters."""
+    letters = [c for c in (name or "").lower() if "a" <= c <= "z"]
+    if not letters:
+        return ""
+    code = letters[0].upper()
+    last = _SOUNDEX_CODES.get(letters[0], "")
+    for c in letters[1:]:
+        digit = _SOUNDEX_CODES.get(c, "")
+        if digit and digit != last:
+            code += digit
+            if len(code) == 4:
+                break
+        # h and w don't separate letters with the same code, vowels do
+        if c not in "hw":
+            last = digit
+    return code.ljust(4, "0")
+
+
+def blocking_keys(first_name, last_name, email, phone_number):
+    """
+    The (kind, key) pairs a lead is filed under in LeadDedupKey. Emails are
+    stored hashed, names by the Soundex of both parts.
+    """
+    keys = []
+    email = normalize_email(email)
+    if "@" in email:
+        keys.append((EMAIL, hashlib.sha1(email.encode()).hexdigest()))
+    digits = normalize_phone(phone_number)
+    if len(digits) >= PHONE_MIN_DIGITS:
+        keys.append((PHONE, digits[-PHONE_KEY_DIGITS:]))
+    first, last = soundex(first_name), soundex(last_name)
+    if first and last:
+        keys.append((NAME, first + last))
+    return keys
@@ -0,0 +1,188 @@
+import logging
+from contextvars import ContextVar
+from datetime import date
+
+from django.conf import settings
+from django.db import DatabaseError, transaction
+
+from .cache import bump_tenant_version
+
+logger = logging.getLogger(__name__)
+
+# the request making the current changes, set by LeadEventMiddleware. Not
+# request.user itself: asgiref compares context values, which would load a
+# lazy user from async code.
+_request = ContextVar("lead_event_request", default=None)
+# events waiting to be written, and whether a request will flush them
+_pending = ContextVar("lead_events_pending", default=None)
+_in_request = ContextVar("lead_events_in_request", default=False)
+
+POSTGRES_PARTITIONED_TABLE_SQL = [
+    # PostgreSQL cannot turn a table into a partitioned one, so the table
+    # Django created (empty at this point) is replaced. A primary key on a
+    # partitioned table has to include the partition key.
+    "DROP TABLE leads_leadevent",
+    """
+    CREATE TABLE leads_leadevent (
+        id bigserial NOT NULL,
+        organization_id integer NOT NULL,
+        lead_id integer NOT NULL,
+        actor_id integer NULL,
+        kind varchar(12) NOT NULL,
+        changes jsonb NOT NULL,
+        created_at timestamp with time zone NOT NULL,
+        PRIMARY KEY (id, created_at)
+    ) PARTITION BY RANGE (created_at)
+    """,
+    "CREATE INDEX lead_event_lead_idx ON leads_leadevent (lead_id, created_at, id)",
+    "CREATE INDEX lead_event_actor_idx ON leads_leadevent (actor_id, created_at)",
+    # rows outside every monthly partition land here instead of failing
+    "CREATE TABLE leads_leadevent_default PARTITION OF leads_leadevent DEFAULT",
+]
+
+
+def set_request(request):
+    """Attribute the events recorded from now on to ``request.user``."""
+    return _request.set(request)
+
+
+def reset_request(token):
+    _request.reset(token)
+
+
+def current_actor_id():
+    user = getattr(_request.get(), "user", None)
+    if user is None or not user.is_authenticated:
+        return None
+    return user.pk
+
+
+def record_events(events):
+    """
+    Queue unsaved LeadEvent instances. They are buffered once the current
+    transaction commits (and dropped if it rolls back), then written with
+    one bulk_create at the end of the request, after the response has been
+    sent. Outside a request they are written at commit.
+    """
+    if not events:
+        return
+
+    def buffer():
+        pending = _pending.get()
+        if pending is None:
+            pending = []
+            _pending.set(pending)
+        pending.extend(events)
+        if not _in_request.get() or len(pending) >= settings.LEAD_EVENTS_MAX_BUFFERED:
+            flush_events()
+
+    transaction.on_commit(buffer)
+
+
+def flush_events():
+    pending = _pending.get()
+    if not pending:
+        return
+    _pending.set([])
+    model = type(pending[0])
+    try:
+        model.objects.bulk_create(pending, batch_size=1000)
+    except DatabaseError:
+        # never fail a request over its audit trail, but say so loudly
+        logger.exception("Could not write %d lead events.", len(pending))
+        return
+    # pages showing activity were validated before these rows existed
+    for organization_id in {event.organization_id for event in pending}:
+        bump_tenant_version(organization_id)
+
+
+def request_started_handler(**kwargs):
+    _in_request.set(True)
+
+
+def request_finished_handler(**kwargs):
+    _in_request.set(False)
+    flush_events()
+
+
+def month_start(day, offset=0):
+    """First day of the month ``offset`` months after the one containing ``day``."""
+    month = day.year * 12 + day.month - 1 + offset
+    return date(month // 12, month % 12 + 1, 1)
+
+
+def partition_name(month):
+    return f"leads_leadevent_y{month.year}m{month.month:02d}"
+
+
+def install_partitioning(connection):
+    """Make leads_leadevent a table partitioned by month on PostgreSQL."""
+    if connection.vendor != "postgresql":
+        return
+    with connection.cursor() as cursor:
+        for sql in POSTGRES_PARTITIONED_TABLE_SQL:
+            cursor.execute(sql)
+
+
+def event_partitions(connection):
+    """The monthly partitions that exist, as {first day of month: table name}."""
+    if connection.vendor != "postgresql":
+        return {}
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT child.relname FROM pg_inherits "
+            "JOIN pg_class parent ON parent.oid = pg_inherits.inhparent "
+            "JOIN pg_class child ON child.oid = pg_inherits.inhrelid "
+            "WHERE parent.relname = 'leads_leadevent'"
+        )
+        names = [row[0] for row in cursor.fetchall()]
+    partitions = {}
+    for name in names:
+        suffix = name[len("leads_leadevent_y"):]
+        if name.startswith("leads_leadevent_y") and len(suffix) == 7 and suffix[4] == "m":
+            partitions[date(int(suffix[:4]), int(suffix[5:]), 1)] = name
+    return partitions
+
+
+def create_partitions(connection, first_month, count):
+    """
+    Create the monthly partitions for ``count`` months from ``first_month``,
+    and for every month that has events in the default partition, which
+    are moved into it. PostgreSQL won't add a partition for rows the
+    default partition still holds, and only monthly ones can be dropped.
+    """
+    existing = event_partitions(connection)
+    months = {month_start(first_month, offset) for offset in range(count)}
+    created = []
+    with transaction.atomic(using=connection.alias), connection.cursor() as cursor:
+        cursor.execute("SELECT DISTINCT date_trunc('month', created_at)::date FROM leads_leadevent_default")
+        months.update(row[0] for row in cursor.fetchall())
+        for month in sorted(months - set(existing)):
+            name = partition_name(month)
+            bounds = [month.isoformat(), month_start(month, 1).isoformat()]
+            cursor.execute(f"CREATE TABLE {name} (LIKE leads_leadevent INCLUDING DEFAULTS)")
+            cursor.execute(
+                "WITH moved AS ("
+                "DELETE FROM leads_leadevent_default WHERE created_at >= %s AND created_at < %s "
+                f"RETURNING *) INSERT INTO {name} SELECT * FROM moved",
+                bounds,
+            )
+            cursor.execute(
+                f"ALTER TABLE leads_leadevent ATTACH PARTITION {name} FOR VALUES FROM (%s) TO (%s)",
+                bounds,
+            )
+            created.append(month)
+    return created
+
+
+def drop_partitions(connection, before):
+    """Detach and drop every monthly partition that ends on or before ``before``."""
+    dropped = []
+    with connection.cursor() as cursor:
+        for month, name in sorted(event_partitions(connection).items()):
+            if month_start(month, 1) > before:
+                continue
+            cursor.execute(f"ALTER TABLE leads_leadevent DETACH PARTITION {name}")
+            cursor.execute(f"DROP TABLE {name}")
+            dropped.append(month)
+    return dropped
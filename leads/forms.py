@@ -1,7 +1,9 @@
 from django import forms
 from django.contrib.auth.forms import  UsernameField, UserCreationForm
 from django.contrib.auth import get_user_model
-from .models import Lead, Agent
+from .assignment import STRATEGY_CHOICES
+from .dedup import DUPLICATE_KINDS, blocking_keys
+from .models import Lead, LeadDedupKey, Agent, Category
 
 
 User = get_user_model()
@@ -18,6 +20,87 @@ class LeadModelForm(forms.ModelForm):
             'email',
             'phone_number',
         )        
+    
+    def __init__(self, *args, organization=None, **kwargs):
+        super(LeadModelForm, self).__init__(*args, **kwargs)
+        if "agent" in self.fields:
+            #labels come from Agent.__str__, which reads the user
+            agents = Agent.objects.select_related("user")
+            if organization is not None:
+                agents = agents.filter(organization=organization)
+            self.fields["agent"].queryset = agents
+
+class LeadCreateForm(LeadModelForm):
+    """Refuses a lead with the email or phone number of an existing one, unless confirmed."""
+    allow_duplicate = forms.BooleanField(
+        required=False, label="Create anyway",
+        help_text="Add the lead even though it looks like one you already have.",
+    )
+    
+    def __init__(self, *args, organization=None, **kwargs):
+        super(LeadCreateForm, self).__init__(*args, organization=organization, **kwargs)
+        self.organization = organization
+    
+    def clean(self):
+        cleaned_data = super(LeadCreateForm, self).clean()
+        if self.organization is None or cleaned_data.get("allow_duplicate"):
+            return cleaned_data
+        keys = [
+            key for key in blocking_keys(
+                cleaned_data.get("first_name"), cleaned_data.get("last_name"),
+                cleaned_data.get("email"), cleaned_data.get("phone_number"),
+            )
+            if key[0] in DUPLICATE_KINDS
+        ]
+        #one query on lead_dedup_key_idx
+        duplicates = list(Lead.objects.filter(
+            pk__in=LeadDedupKey.objects.matching(self.organization.pk, keys).values("lead")
+        )[:3])
+        if duplicates:
+            raise forms.ValidationError(
+                "A lead with this email or phone number already exists: %(leads)s.",
+                code="duplicate",
+                params={"leads": ", ".join(f"{lead} ({lead.email})" for lead in duplicates)},
+            )
+        return cleaned_data
+
+class LeadVersionFormMixin(forms.Form):
+    """Carries the version of the lead the user started editing, see Lead.save_changes."""
+    version = forms.IntegerField(widget=forms.HiddenInput, min_value=0, required=False)
+    
+    def __init__(self, *args, **kwargs):
+        super(LeadVersionFormMixin, self).__init__(*args, **kwargs)
+        if self.instance.pk is not None:
+            self.fields["version"].initial = self.instance.version
+    
+    def changed_fields(self):
+        """The model fields the user changed, for save(update_fields=...)."""
+        return [name for name in self.changed_data if name in self._meta.fields]
+
+class LeadUpdateForm(LeadVersionFormMixin, LeadModelForm):
+    pass
+
+class LeadApiForm(LeadVersionFormMixin, LeadModelForm):
+    """Every lead field organizers can write through the JSON API."""
+    class Meta(LeadModelForm.Meta):
+        fields = LeadModelForm.Meta.fields + ('category',)
+    
+    def __init__(self, *args, organization=None, **kwargs):
+        super(LeadApiForm, self).__init__(*args, organization=organization, **kwargs)
+        if organization is not None and "category" in self.fields:
+            self.fields["category"].queryset = Category.objects.filter(organization=organization)
+
+class LeadImportRowForm(LeadModelForm):
+    """Validates one imported row; agent and category are resolved by name."""
+    class Meta(LeadModelForm.Meta):
+        fields = tuple(f for f in LeadModelForm.Meta.fields if f != 'agent')
+
+class LeadImportForm(forms.Form):
+    file = forms.FileField(help_text="A .csv or .xlsx file with a header row.")
+    batch_size = forms.IntegerField(min_value=1, max_value=10000, initial=1000, required=False)
+    allow_duplicates = forms.BooleanField(
+        required=False, help_text="Also import rows with the email or phone number of an existing lead.",
+    )
 
 class LeadForm(forms.Form):
     first_name = forms.CharField()
@@ -35,13 +118,30 @@ class AssignAgentForm(forms.Form):
     
     def __init__(self, *args, **kwargs):
         request = kwargs.pop("request")
-        agents = Agent.objects.filter(organization=request.user.userprofile)
+        self.organization = request.tenant.organization
+        agents = Agent.objects.filter(organization=self.organization).select_related("user")
         super(AssignAgentForm, self).__init__(*args, **kwargs)
         self.fields["agent"].queryset = agents
         
-class LeadCategoryUpdateForm(forms.ModelForm):
+class BulkAssignAgentForm(AssignAgentForm):
+    leads = forms.ModelMultipleChoiceField(queryset=Lead.objects.none())
+    
+    def __init__(self, *args, **kwargs):
+        super(BulkAssignAgentForm, self).__init__(*args, **kwargs)
+        self.fields["leads"].queryset = Lead.objects.filter(organization=self.organization)
+        
+class AutoAssignForm(forms.Form):
+    strategy = forms.ChoiceField(choices=STRATEGY_CHOICES)
+    limit = forms.IntegerField(min_value=1, required=False, help_text="Leave empty to assign every unassigned lead.")
+        
+class LeadCategoryUpdateForm(LeadVersionFormMixin, forms.ModelForm):
     class Meta:
         model = Lead
         fields = (
             'category',
-        )  
\ No newline at end of file
+        )
+    
+    def __init__(self, *args, organization=None, **kwargs):
+        super(LeadCategoryUpdateForm, self).__init__(*args, **kwargs)
+        if organization is not None and "category" in self.fields:
+            self.fields["category"].queryset = Category.objects.filter(organization=organization)  
\ No newline at end of file
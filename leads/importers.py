@@ -0,0 +1,222 @@
+import csv
+import io
+import os
+import time
+
+from .dedup import DUPLICATE_KINDS, blocking_keys
+from .forms import LeadImportRowForm
+from .mail import enqueue_mail
+from .events import record_events
+from .models import Lead, LeadDedupKey, Agent, Category, leads_bulk_changed, lead_events
+from .search import normalize_phone
+
+
+class LeadImportError(Exception):
+    pass
+
+
+def _normalize_header(name):
+    return str(name or "").strip().lower().replace(" ", "_")
+
+
+def iter_csv_rows(fileobj):
+    """Yield one dict per CSV row without reading the whole file."""
+    if isinstance(fileobj, io.TextIOBase):
+        text = fileobj
+    else:
+        text = io.TextIOWrapper(fileobj, encoding="utf-8-sig", newline="")
+    reader = csv.reader(text)
+    header = [_normalize_header(name) for name in next(reader, [])]
+    for row in reader:
+        yield dict(zip(header, row))
+
+
+def iter_xlsx_rows(fileobj):
+    """Yield one dict per row of the first sheet using openpyxl's read-only mode."""
+    try:
+        import openpyxl
+    except ImportError:
+        raise LeadImportError("Importing .xlsx files requires the openpyxl package.")
+    workbook = openpyxl.load_workbook(fileobj, read_only=True, data_only=True)
+    try:
+        rows = workbook.worksheets[0].iter_rows(values_only=True)
+        header = [_normalize_header(name) for name in next(rows, [])]
+        for row in rows:
+            yield {
+                key: "" if value is None else str(value)
+                for key, value in zip(header, row)
+            }
+    finally:
+        workbook.close()
+
+
+def iter_rows(fileobj, filename):
+    extension = os.path.splitext(filename)[1].lower()
+    if extension == ".csv":
+        return iter_csv_rows(fileobj)
+    if extension == ".xlsx":
+        return iter_xlsx_rows(fileobj)
+    raise LeadImportError(f"Unsupported file type {extension!r}, expected .csv or .xlsx.")
+
+
+class ImportResult:
+
+    def __init__(self):
+        self.created = 0
+        self.rejected = 0
+        self.errors = []
+        self.seconds = 0.0
+
+    @property
+    def rows_per_second(self):
+        if not self.seconds:
+            return 0.0
+        return (self.created + self.rejected) / self.seconds
+
+    def __str__(self):
+        return (
+            f"{self.created} leads imported, {self.rejected} rows rejected "
+            f"in {self.seconds:.1f}s ({self.rows_per_second:.0f} rows/s)"
+        )
+
+
+class LeadImporter:
+    """
+    Validate rows with LeadImportRowForm and insert them with bulk_create.
+
+    Agents (by username or email) and categories (by name) are resolved
+    through lookup tables loaded once per import. Rows with the email or
+    phone number of an existing lead, or of an earlier row, are rejected
+    unless ``allow_duplicates``: one LeadDedupKey lookup per batch, so the
+    only other queries per batch are the INSERTs themselves.
+    """
+    max_reported_errors = 1000
+
+    def __init__(self, organization, batch_size=1000, allow_duplicates=False):
+        self.organization = organization
+        self.batch_size = batch_size
+        self.allow_duplicates = allow_duplicates
+        #(kind, key): line, for the rows imported so far
+        self.seen = {}
+        #whether bulk_create left leads without primary keys to index
+        self.unindexed = False
+        self.agents = {}
+        for pk, username, email in Agent.objects.filter(
+            organization=organization
+        ).values_list("pk", "user__username", "user__email"):
+            self.agents[username.lower()] = pk
+            if email:
+                self.agents[email.lower()] = pk
+        self.categories = {
+            name.lower(): pk
+            for pk, name in Category.objects.filter(
+                organization=organization
+            ).values_list("pk", "name")
+        }
+
+    def build_lead(self, row):
+        """Return (lead, errors) for one parsed row."""
+        form = LeadImportRowForm(data=row)
+        errors = dict(form.errors)
+        lead = form.instance
+        agent = row.get("agent", "").strip().lower()
+        if agent:
+            lead.agent_id = self.agents.get(agent)
+            if lead.agent_id is None:
+                errors["agent"] = [f"Unknown agent {agent!r}."]
+        category = row.get("category", "").strip().lower()
+        if category:
+            lead.category_id = self.categories.get(category)
+            if lead.category_id is None:
+                errors["category"] = [f"Unknown category {category!r}."]
+        lead.organization = self.organization
+        lead.phone_digits = normalize_phone(lead.phone_number)
+        return lead, errors
+
+    def reject(self, result, line, errors):
+        result.rejected += 1
+        if len(result.errors) < self.max_reported_errors:
+            result.errors.append((line, errors))
+
+    def drop_duplicates(self, batch, result):
+        """The leads of ``batch``, (line, lead) pairs, that are no duplicates."""
+        keys = {
+            line: [key for key in blocking_keys(lead.first_name, lead.last_name, lead.email, lead.phone_number)
+                   if key[0] in DUPLICATE_KINDS]
+            for line, lead in batch
+        }
+        existing = {
+            (kind, key): lead_id
+            for kind, key, lead_id in LeadDedupKey.objects.matching(
+                self.organization.pk, [key for line_keys in keys.values() for key in line_keys]
+            ).values_list("kind", "key", "lead")
+        }
+        leads = []
+        for line, lead in batch:
+            for key in keys[line]:
+                if key in existing:
+                    self.reject(result, line, {"__all__": [f"Duplicate of lead {existing[key]}."]})
+                    break
+                if key in self.seen:
+                    self.reject(result, line, {"__all__": [f"Duplicate of row {self.seen[key]}."]})
+                    break
+            else:
+                for key in keys[line]:
+                    self.seen[key] = line
+                leads.append(lead)
+        return leads
+
+    def flush(self, batch, result):
+        if batch:
+            leads = [lead for _, lead in batch] if self.allow_duplicates else self.drop_duplicates(batch, result)
+            if leads:
+                Lead.objects.bulk_create(leads)
+                result.created += len(leads)
+                #only backends that return primary keys (PostgreSQL) get history
+                record_events([event for lead in leads if lead.pk for event in lead_events(lead, True, None)])
+                LeadDedupKey.objects.index(leads)
+                self.unindexed |= any(lead.pk is None for lead in leads)
+            batch.clear()
+
+    def run(self, rows):
+        result = ImportResult()
+        started = time.monotonic()
+        batch = []
+        try:
+            # line 1 is the header
+            for line, row in enumerate(rows, start=2):
+                lead, errors = self.build_lead(row)
+                if errors:
+                    self.reject(result, line, errors)
+                    continue
+                batch.append((line, lead))
+                if len(batch) >= self.batch_size:
+                    self.flush(batch, result)
+            self.flush(batch, result)
+        finally:
+            result.seconds = time.monotonic() - started
+            if self.unindexed:
+                #SQLite's bulk_create returns no primary keys
+                LeadDedupKey.objects.index_missing(self.organization.pk)
+            if result.created:
+                leads_bulk_changed.send(sender=Lead, organization_id=self.organization.pk)
+        return result
+
+    def notify(self, result, filename):
+        """Send one summary email for the whole import."""
+        email = self.organization.user.email
+        if email:
+            enqueue_mail(
+                subject="Your lead import has finished.",
+                message=f"{filename}: {result}.",
+                from_email="test_sender@test.com",
+                recipient_list=[email],
+            )
+
+
+def import_leads(organization, fileobj, filename, batch_size=1000, notify=True, allow_duplicates=False):
+    importer = LeadImporter(organization, batch_size=batch_size, allow_duplicates=allow_duplicates)
+    result = importer.run(iter_rows(fileobj, filename))
+    if notify:
+        importer.notify(result, filename)
+    return result
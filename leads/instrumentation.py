@@ -0,0 +1,75 @@
+import threading
+import time
+from collections import defaultdict, deque
+
+METRICS = ("queries", "db_time", "template_time", "wall_time")
+
+
+class QueryBudgetExceeded(Exception):
+    pass
+
+
+class QueryCounter:
+    """A connection.execute_wrapper() that counts queries and their total time."""
+
+    def __init__(self):
+        self.count = 0
+        self.time = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.count += 1
+            self.time += time.perf_counter() - started
+
+
+def percentile(ordered, fraction):
+    """Nearest-rank percentile of an already sorted, non-empty list."""
+    index = max(int(round(fraction * len(ordered))) - 1, 0)
+    return ordered[min(index, len(ordered) - 1)]
+
+
+class RequestStats:
+    """
+    Rolling window of per-view samples kept in process memory. Each worker
+    process keeps its own window.
+    """
+
+    def __init__(self, window=1000):
+        self.window = window
+        self._lock = threading.Lock()
+        self._samples = defaultdict(lambda: deque(maxlen=self.window))
+        self._totals = defaultdict(int)
+
+    def record(self, view_name, **sample):
+        with self._lock:
+            self._samples[view_name].append(tuple(sample[m] for m in METRICS))
+            self._totals[view_name] += 1
+
+    def reset(self):
+        with self._lock:
+            self._samples.clear()
+            self._totals.clear()
+
+    def snapshot(self):
+        with self._lock:
+            samples = {name: list(window) for name, window in self._samples.items()}
+            totals = dict(self._totals)
+        stats = {}
+        for name, rows in samples.items():
+            view = {"requests": totals[name], "window": len(rows)}
+            for i, metric in enumerate(METRICS):
+                ordered = sorted(row[i] for row in rows)
+                view[metric] = {
+                    "p50": percentile(ordered, 0.50),
+                    "p95": percentile(ordered, 0.95),
+                    "p99": percentile(ordered, 0.99),
+                    "max": ordered[-1],
+                }
+            stats[name] = view
+        return stats
+
+
+request_stats = RequestStats()
@@ -0,0 +1,154 @@
+import logging
+import smtplib
+from datetime import timedelta
+
+from django.conf import settings
+from django.contrib.auth.tokens import default_token_generator
+from django.core.mail import EmailMessage, get_connection
+from django.db import transaction
+from django.db.models import F
+from django.urls import reverse
+from django.utils import timezone
+from django.utils.encoding import force_bytes
+from django.utils.http import urlsafe_base64_encode
+
+from .models import OutboundEmail
+
+logger = logging.getLogger(__name__)
+
+
+def enqueue_mail(subject, message, from_email, recipient_list):
+    """
+    Queue an email for the send_queued_mail worker. Takes the same arguments
+    as django.core.mail.send_mail but only costs a single INSERT.
+    """
+    return OutboundEmail.objects.create(
+        subject=subject,
+        message=message,
+        from_email=from_email,
+        recipients=list(recipient_list),
+    )
+
+
+def enqueue_invitation(request, user):
+    """
+    Queue the invitation of a new agent. Instead of a password, which would
+    cost a full hash on the request, the agent gets a password reset link
+    to choose their own; it expires after PASSWORD_RESET_TIMEOUT.
+    """
+    url = reverse("password-reset-confirm", kwargs={
+        "uidb64": urlsafe_base64_encode(force_bytes(user.pk)),
+        "token": default_token_generator.make_token(user),
+    })
+    return enqueue_mail(
+        subject="You are invited as an Agent",
+        message=(
+            "You were added as an agent on Django CRM 2. "
+            f"Choose your password to start working: {request.build_absolute_uri(url)}"
+        ),
+        from_email="admin@email.com",
+        recipient_list=[user.email],
+    )
+
+
+def retry_delay(attempts):
+    """Exponential backoff: base, 2x base, 4x base... capped at an hour."""
+    seconds = settings.OUTBOX_RETRY_BACKOFF * 2 ** max(attempts - 1, 0)
+    return timedelta(seconds=min(seconds, 3600))
+
+
+def claim_due_mail(batch_size):
+    """
+    Claim up to ``batch_size`` due emails for this worker, in one short
+    transaction: SELECT ... FOR UPDATE SKIP LOCKED lets several workers
+    claim side by side, and moving next_attempt_at OUTBOX_CLAIM_TIMEOUT
+    ahead keeps the rows from the others once the locks are released. If
+    the worker dies, its claim runs out and the emails are sent later.
+    """
+    now = timezone.now()
+    with transaction.atomic():
+        batch = list(
+            OutboundEmail.objects.select_for_update(skip_locked=True)
+            .filter(status=OutboundEmail.QUEUED, next_attempt_at__lte=now)
+            .order_by("next_attempt_at", "id")[:batch_size]
+        )
+        if batch:
+            OutboundEmail.objects.filter(pk__in=[email.pk for email in batch]).update(
+                attempts=F("attempts") + 1,
+                next_attempt_at=now + timedelta(seconds=settings.OUTBOX_CLAIM_TIMEOUT),
+            )
+    for email in batch:
+        email.attempts += 1
+    return batch
+
+
+def release_claim(batch, error):
+    """
+    Give back a claimed batch none of which was tried, e.g. because the
+    SMTP server could not be reached: due again as before, with the same
+    attempts, so an outage never uses up an email's attempts.
+    """
+    for email in batch:
+        email.attempts -= 1
+        email.last_error = str(error)
+    OutboundEmail.objects.bulk_update(batch, ["attempts", "next_attempt_at", "last_error"])
+
+
+def send_queued_mail(batch_size=None, connection=None):
+    """
+    Send one batch of due emails over a single SMTP connection.
+
+    The batch is claimed first (claim_due_mail), so no row lock is held
+    while talking to the SMTP server, and each email is marked sent or
+    failed on its own right after its attempt: a crash never sends an
+    already delivered email again. Pass an already open ``connection`` to
+    keep reusing it across batches. Returns the number of emails sent and
+    the number that failed.
+    """
+    batch_size = batch_size or settings.OUTBOX_BATCH_SIZE
+    batch = claim_due_mail(batch_size)
+    sent = failed = 0
+    if not batch:
+        return sent, failed
+    close_connection = connection is None
+    if connection is None:
+        connection = get_connection()
+    try:
+        try:
+            connection.open()
+        except OSError as e:
+            release_claim(batch, e)
+            raise
+        for email in batch:
+            message = EmailMessage(
+                subject=email.subject,
+                body=email.message,
+                from_email=email.from_email,
+                to=email.recipients,
+                connection=connection,
+            )
+            try:
+                connection.send_messages([message])
+            except (smtplib.SMTPException, OSError) as e:
+                logger.warning("Sending email %s failed: %s", email.pk, e)
+                failed += 1
+                email.last_error = str(e)
+                if email.attempts >= settings.OUTBOX_MAX_ATTEMPTS:
+                    email.status = OutboundEmail.FAILED
+                else:
+                    email.next_attempt_at = timezone.now() + retry_delay(email.attempts)
+                email.save(update_fields=["status", "next_attempt_at", "last_error"])
+                if isinstance(e, smtplib.SMTPServerDisconnected):
+                    #the pooled connection is gone, reconnect for the rest
+                    connection.close()
+                    connection.open()
+            else:
+                sent += 1
+                email.status = OutboundEmail.SENT
+                email.sent_at = timezone.now()
+                email.last_error = ""
+                email.save(update_fields=["status", "sent_at", "last_error"])
+    finally:
+        if close_connection:
+            connection.close()
+    return sent, failed
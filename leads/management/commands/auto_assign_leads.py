@@ -0,0 +1,29 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from leads.assignment import LEAST_LOADED, STRATEGY_CHOICES, auto_assign
+from leads.models import UserProfile
+
+
+class Command(BaseCommand):
+    help = "Spread an organization's unassigned leads over its agents."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--organizer", required=True,
+            help="Username of the organizer whose leads are assigned.",
+        )
+        parser.add_argument(
+            "--strategy", default=LEAST_LOADED,
+            choices=[value for value, _ in STRATEGY_CHOICES],
+        )
+        parser.add_argument("--limit", type=int, default=None)
+
+    def handle(self, *args, **options):
+        try:
+            organization = UserProfile.objects.get(user__username=options["organizer"])
+        except UserProfile.DoesNotExist:
+            raise CommandError(f"No organizer named {options['organizer']!r}.")
+        assigned = auto_assign(organization, options["strategy"], limit=options["limit"])
+        for agent_id, count in sorted(assigned.items()):
+            self.stdout.write(f"Agent {agent_id}: {count} leads")
+        self.stdout.write(f"Assigned {sum(assigned.values())} leads.")
@@ -0,0 +1,78 @@
+import time
+
+from django.conf import settings
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.tokens import default_token_generator
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import Client
+from django.test.utils import override_settings
+from django.urls import reverse
+from django.utils.crypto import get_random_string
+
+from leads.instrumentation import QueryCounter
+from leads.models import User
+
+SETUPS = (
+    ("database sessions, plain user", {
+        "SESSION_ENGINE": "django.contrib.sessions.backends.db",
+        "AUTHENTICATION_BACKENDS": ["django.contrib.auth.backends.ModelBackend"],
+    }),
+    ("cached sessions, user with tenant", {
+        "SESSION_ENGINE": "django.contrib.sessions.backends.cached_db",
+        "AUTHENTICATION_BACKENDS": ["leads.backends.TenantModelBackend"],
+    }),
+)
+
+
+class Command(BaseCommand):
+    help = (
+        "Measure the cost of authenticating a request: requests/sec and queries "
+        "per request for a cached page with database sessions and a plain "
+        "user lookup, and with cached sessions and the tenant loaded with the "
+        "user. Also times hashing a password against making an invitation token."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("username", help="User to log in as.")
+        parser.add_argument("--url", default=None, help="Page to request (default: the lead list).")
+        parser.add_argument("--requests", type=int, default=500)
+
+    def handle(self, *args, **options):
+        try:
+            user = User.objects.get(username=options["username"])
+        except User.DoesNotExist:
+            raise CommandError(f"No user named {options['username']!r}.")
+        url = options["url"] or reverse("leads:lead-list")
+        count = options["requests"]
+        self.stdout.write(f"{count} requests to {url} on {connection.vendor}")
+        #the page itself comes from the tenant cache, what is left is auth
+        with override_settings(TENANT_VIEW_CACHE_TIMEOUT=settings.TENANT_VIEW_CACHE_TIMEOUT or 300):
+            for label, overrides in SETUPS:
+                with override_settings(**overrides):
+                    rate, queries = self.run(user, url, count)
+                self.stdout.write(f"{label:<36}{rate:>10.1f} req/s {queries:>6.1f} queries/request")
+        hashing = self.time_ms(lambda: make_password(get_random_string(12)), 5)
+        token = self.time_ms(lambda: default_token_generator.make_token(user), 100)
+        self.stdout.write(f"{'hashing a random password':<36}{hashing:>10.2f} ms")
+        self.stdout.write(f"{'making an invitation token':<36}{token:>10.2f} ms")
+
+    def run(self, user, url, count):
+        client = Client()
+        client.force_login(user)
+        client.get(url)  # warm up templates, url resolvers and the page cache
+        queries = QueryCounter()
+        with connection.execute_wrapper(queries):
+            started = time.perf_counter()
+            for _ in range(count):
+                response = client.get(url)
+                if response.status_code != 200:
+                    raise CommandError(f"{url} returned {response.status_code}.")
+            elapsed = time.perf_counter() - started
+        return count / elapsed, queries.count / count
+
+    def time_ms(self, function, count):
+        started = time.perf_counter()
+        for _ in range(count):
+            function()
+        return (time.perf_counter() - started) * 1000 / count
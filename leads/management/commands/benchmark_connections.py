@@ -0,0 +1,73 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import close_old_connections, connections
+from django.db.backends.signals import connection_created
+from django.test import Client
+from django.test.utils import override_settings
+from django.urls import reverse
+
+from leads.models import User
+
+
+class Command(BaseCommand):
+    help = (
+        "Measure requests/sec for one page with a new database connection per "
+        "request and with persistent connections."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("username", help="User to log in as.")
+        parser.add_argument("--url", default=None, help="Page to request (default: the lead list).")
+        parser.add_argument("--requests", type=int, default=200)
+        parser.add_argument(
+            "--conn-max-age", type=int, default=None,
+            help="CONN_MAX_AGE for the persistent run (default: the configured value, or 60).",
+        )
+
+    def handle(self, *args, **options):
+        try:
+            user = User.objects.get(username=options["username"])
+        except User.DoesNotExist:
+            raise CommandError(f"No user named {options['username']!r}.")
+        url = options["url"] or reverse("leads:lead-list")
+        max_age = options["conn_max_age"]
+        if max_age is None:
+            max_age = connections["default"].settings_dict["CONN_MAX_AGE"] or 60
+        client = Client()
+        client.force_login(user)
+        self.stdout.write(f"{options['requests']} requests to {url} on {connections['default'].vendor}")
+        #measure the database, not the page cache
+        with override_settings(TENANT_VIEW_CACHE_TIMEOUT=0):
+            for label, conn_max_age in (("new connection per request", 0), ("persistent connections", max_age)):
+                rate, connects = self.run(client, url, options["requests"], conn_max_age)
+                self.stdout.write(f"{label:<28}{rate:>10.1f} req/s {connects:>8} connections opened")
+
+    def run(self, client, url, count, conn_max_age):
+        client.get(url)  # warm up templates and url resolvers
+        originals = {}
+        for connection in connections.all():
+            connection.close()
+            originals[connection.alias] = connection.settings_dict["CONN_MAX_AGE"]
+            connection.settings_dict["CONN_MAX_AGE"] = conn_max_age
+        connects = []
+        def created(connection, **kwargs):
+            connects.append(connection.alias)
+        connection_created.connect(created)
+        try:
+            started = time.perf_counter()
+            for _ in range(count):
+                #the test client skips close_old_connections, do what the
+                #WSGI handler does around every request
+                close_old_connections()
+                response = client.get(url)
+                close_old_connections()
+                if response.status_code != 200:
+                    raise CommandError(f"{url} returned {response.status_code}.")
+            elapsed = time.perf_counter() - started
+        finally:
+            connection_created.disconnect(created)
+            for connection in connections.all():
+                connection.close()
+                connection.settings_dict["CONN_MAX_AGE"] = originals[connection.alias]
+        return count / elapsed, len(connects)
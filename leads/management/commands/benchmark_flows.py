@@ -0,0 +1,83 @@
+import json
+import platform
+import subprocess
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test.utils import setup_databases, teardown_databases
+
+from leads.benchmarks import FlowBenchmark
+from leads.models import UserProfile
+from leads.seeding import Seeder
+
+
+def git_revision():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+class Command(BaseCommand):
+    help = (
+        "Seed a throwaway test database and benchmark login, lead list, lead detail, "
+        "create, assign and category update. Reports req/s, p50/p95/p99 latency and "
+        "query counts per endpoint."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--organizations", type=int, default=2)
+        parser.add_argument("--agents", type=int, default=5, help="Agents per organization.")
+        parser.add_argument("--leads", type=int, default=1000, help="Leads per organization.")
+        parser.add_argument("--iterations", type=int, default=50, help="Flows to run.")
+        parser.add_argument("--seed", type=int, default=0)
+        parser.add_argument("-o", "--output", help="Also write the results to this JSON file.")
+        parser.add_argument(
+            "--keepdb", action="store_true",
+            help="Keep the test database between runs, like manage.py test --keepdb.",
+        )
+
+    def handle(self, *args, **options):
+        old_config = setup_databases(verbosity=0, interactive=False, keepdb=options["keepdb"])
+        try:
+            started = time.perf_counter()
+            organization_ids = Seeder(prefix=f"bench{int(time.time())}", seed=options["seed"]).seed(
+                options["organizations"], options["agents"], options["leads"],
+            )
+            seed_seconds = time.perf_counter() - started
+            organizations = UserProfile.objects.filter(pk__in=organization_ids).select_related("user")
+            results = FlowBenchmark(organizations, seed=options["seed"]).run(options["iterations"])
+        finally:
+            teardown_databases(old_config, verbosity=0, keepdb=options["keepdb"])
+        report = {
+            "revision": git_revision(),
+            "created_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+            "python": platform.python_version(),
+            "database": connection.vendor,
+            "parameters": {
+                key: options[key] for key in ("organizations", "agents", "leads", "iterations", "seed")
+            },
+            "seed_seconds": seed_seconds,
+            "results": results,
+        }
+        self.write_table(report)
+        if options["output"]:
+            with open(options["output"], "w") as f:
+                json.dump(report, f, indent=2)
+
+    def write_table(self, report):
+        self.stdout.write(
+            f"Seeded {report['parameters']['organizations']} organizations in "
+            f"{report['seed_seconds']:.1f}s on {report['database']}."
+        )
+        self.stdout.write(
+            f"{'endpoint':<30}{'req/s':>9}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'queries':>9}"
+        )
+        for name, row in report["results"].items():
+            self.stdout.write(
+                f"{name:<30}{row['requests_per_second']:>9.1f}{row['p50_ms']:>9.1f}"
+                f"{row['p95_ms']:>9.1f}{row['p99_ms']:>9.1f}{row['max_queries']:>9}"
+            )
@@ -0,0 +1,196 @@
+import http.client
+import json
+import os
+import subprocess
+import sys
+import threading
+import time
+from importlib import import_module
+
+from django.conf import settings
+from django.contrib.auth import BACKEND_SESSION_KEY, HASH_SESSION_KEY, SESSION_KEY
+from django.core.management.base import BaseCommand, CommandError
+from django.urls import reverse
+
+from leads.instrumentation import percentile
+from leads.models import User
+
+
+def process_tree(pid):
+    """pid and the pids of all its descendants, from /proc (Linux only)."""
+    children = {}
+    for entry in os.listdir("/proc"):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f"/proc/{entry}/stat") as f:
+                # the command name can contain spaces, the ppid follows the ")"
+                ppid = int(f.read().rsplit(")", 1)[1].split()[1])
+        except (OSError, IndexError, ValueError):
+            continue
+        children.setdefault(ppid, []).append(int(entry))
+    pids, pending = [], [pid]
+    while pending:
+        current = pending.pop()
+        pids.append(current)
+        pending.extend(children.get(current, []))
+    return pids
+
+
+def rss_bytes(pid):
+    """Resident memory of a process and its children."""
+    total = 0
+    for current in process_tree(pid):
+        try:
+            with open(f"/proc/{current}/status") as f:
+                for line in f:
+                    if line.startswith("VmRSS:"):
+                        total += int(line.split()[1]) * 1024
+        except OSError:
+            pass
+    return total
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare the lead list under gunicorn (WSGI) and uvicorn (ASGI, async views) "
+        "with as many workers as fit in the same memory budget."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("username", help="User whose session the load uses.")
+        parser.add_argument("--memory-mb", type=int, default=512, help="Memory budget per server.")
+        parser.add_argument("--concurrency", type=int, default=32, help="Concurrent client connections.")
+        parser.add_argument("--duration", type=float, default=10.0, help="Seconds of load per server.")
+        parser.add_argument("--threads", type=int, default=4, help="gunicorn threads per worker.")
+        parser.add_argument("--port", type=int, default=8765)
+        parser.add_argument("-o", "--output", help="Also write the results to this JSON file.")
+
+    def handle(self, *args, **options):
+        if not os.path.isdir("/proc"):
+            raise CommandError("Memory is measured through /proc, this command needs Linux.")
+        try:
+            user = User.objects.get(username=options["username"])
+        except User.DoesNotExist:
+            raise CommandError(f"No user named {options['username']!r}.")
+        self.cookie = f"{settings.SESSION_COOKIE_NAME}={self.create_session(user)}"
+        budget = options["memory_mb"] * 1024 * 1024
+        servers = {
+            "wsgi": (reverse("leads:lead-list"), lambda workers, port: [
+                sys.executable, "-m", "gunicorn", "djcrm2.wsgi:application", "--config", "gunicorn.conf.py",
+            ], {"GUNICORN_THREADS": str(options["threads"])}),
+            "asgi": (reverse("leads:lead-list-async"), lambda workers, port: [
+                sys.executable, "-m", "uvicorn", "djcrm2.asgi:application",
+                "--port", str(port), "--workers", str(workers), "--no-access-log",
+            ], {}),
+        }
+        results = {}
+        for name, (path, command, env) in servers.items():
+            #size one worker first, then start as many as fit in the budget
+            with self.server(command(1, options["port"]), env, 1, options["port"]) as pid:
+                self.load(path, options["port"], 4, 2.0)
+                per_worker = rss_bytes(pid)
+            workers = max(1, budget // per_worker)
+            with self.server(command(workers, options["port"]), env, workers, options["port"]) as pid:
+                row = self.load(path, options["port"], options["concurrency"], options["duration"])
+                row.update(workers=workers, rss_mb=rss_bytes(pid) / 1024 / 1024)
+            results[name] = row
+            self.stdout.write(
+                f"{name}: {workers} workers, {row['rss_mb']:.0f} MB, {row['requests_per_second']:.1f} req/s, "
+                f"p50 {row['p50_ms']:.1f} ms, p95 {row['p95_ms']:.1f} ms, p99 {row['p99_ms']:.1f} ms, "
+                f"{row['errors']} errors"
+            )
+        if options["output"]:
+            with open(options["output"], "w") as f:
+                json.dump({"parameters": {
+                    key: options[key] for key in ("memory_mb", "concurrency", "duration", "threads")
+                }, "results": results}, f, indent=2)
+
+    def create_session(self, user):
+        """Log ``user`` in the way django.contrib.auth.login() does and return the session key."""
+        session = import_module(settings.SESSION_ENGINE).SessionStore()
+        session[SESSION_KEY] = user._meta.pk.value_to_string(user)
+        session[BACKEND_SESSION_KEY] = settings.AUTHENTICATION_BACKENDS[0]
+        session[HASH_SESSION_KEY] = user.get_session_auth_hash()
+        session.save()
+        return session.session_key
+
+    def server(self, command, env, workers, port):
+        stdout = self.stdout
+
+        class Server:
+            def __enter__(self):
+                self.process = subprocess.Popen(
+                    command,
+                    env={**os.environ, **env, "PORT": str(port), "GUNICORN_WORKERS": str(workers)},
+                    stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+                )
+                deadline = time.monotonic() + 30
+                while time.monotonic() < deadline:
+                    try:
+                        http.client.HTTPConnection("127.0.0.1", port, timeout=1).request("HEAD", "/")
+                        return self.process.pid
+                    except OSError:
+                        time.sleep(0.2)
+                self.process.kill()
+                raise CommandError(f"{command[2]} did not start listening on port {port}.")
+
+            def __exit__(self, *exc_info):
+                self.process.terminate()
+                try:
+                    self.process.wait(timeout=30)
+                except subprocess.TimeoutExpired:
+                    stdout.write(f"{command[2]} did not stop, killing it.")
+                    self.process.kill()
+                    self.process.wait()
+
+        return Server()
+
+    def load(self, path, port, concurrency, duration):
+        """Keep ``concurrency`` keep-alive connections busy for ``duration`` seconds."""
+        headers = {"Cookie": self.cookie, "X-Forwarded-Proto": "https"}
+        latencies, errors = [], []
+        lock = threading.Lock()
+        deadline = time.monotonic() + duration
+
+        def worker():
+            connection = http.client.HTTPConnection("127.0.0.1", port, timeout=30)
+            mine, failed = [], 0
+            while time.monotonic() < deadline:
+                started = time.perf_counter()
+                try:
+                    connection.request("GET", path, headers=headers)
+                    response = connection.getresponse()
+                    response.read()
+                    if response.status != 200:
+                        failed += 1
+                        continue
+                except (OSError, http.client.HTTPException):
+                    failed += 1
+                    connection.close()
+                    connection = http.client.HTTPConnection("127.0.0.1", port, timeout=30)
+                    continue
+                mine.append(time.perf_counter() - started)
+            connection.close()
+            with lock:
+                latencies.extend(mine)
+                errors.append(failed)
+
+        threads = [threading.Thread(target=worker) for _ in range(concurrency)]
+        started = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - started
+        latencies.sort()
+        if not latencies:
+            raise CommandError(f"Every request to {path} failed.")
+        return {
+            "requests": len(latencies),
+            "errors": sum(errors),
+            "requests_per_second": len(latencies) / elapsed,
+            "p50_ms": percentile(latencies, 0.50) * 1000,
+            "p95_ms": percentile(latencies, 0.95) * 1000,
+            "p99_ms": percentile(latencies, 0.99) * 1000,
+        }
@@ -0,0 +1,58 @@
+import os
+import shlex
+import subprocess
+import tempfile
+
+from django.apps import apps
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+# apps whose templates use Tailwind classes, crispy_tailwind for the forms
+TEMPLATE_APPS = ("leads", "agents", "crispy_tailwind")
+
+
+def template_dirs():
+    """The project template directories and those of TEMPLATE_APPS."""
+    dirs = [str(path) for path in settings.TEMPLATES[0]["DIRS"]]
+    for label in TEMPLATE_APPS:
+        path = os.path.join(apps.get_app_config(label).path, "templates")
+        if os.path.isdir(path):
+            dirs.append(path)
+    return dirs
+
+
+class Command(BaseCommand):
+    help = (
+        "Build static/css/styles.css with the Tailwind CLI, keeping only the "
+        "classes used in the templates. Runs settings.TAILWIND_CLI, by "
+        "default a pinned release through npx, which needs Node.js. Run it "
+        "before collectstatic."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "-o", "--output", default=os.path.join(settings.BASE_DIR, "static", "css", "styles.css"),
+        )
+        parser.add_argument(
+            "--cli", default=settings.TAILWIND_CLI,
+            help="Command running the Tailwind CLI, e.g. the path to the standalone binary.",
+        )
+        parser.add_argument("--watch", action="store_true", help="Rebuild whenever a template changes.")
+
+    def handle(self, *args, **options):
+        # source(none): only the directories below are scanned, not the
+        # whole working directory with static_root and node_modules
+        lines = ['@import "tailwindcss" source(none);']
+        lines += ['@source "%s";' % path for path in template_dirs()]
+        os.makedirs(os.path.dirname(options["output"]), exist_ok=True)
+        with tempfile.NamedTemporaryFile("w", suffix=".css") as source:
+            source.write("\n".join(lines) + "\n")
+            source.flush()
+            command = shlex.split(options["cli"]) + ["-i", source.name, "-o", options["output"], "--minify"]
+            if options["watch"]:
+                command.append("--watch")
+            try:
+                subprocess.run(command, check=True)
+            except (OSError, subprocess.CalledProcessError) as e:
+                raise CommandError(f"Tailwind CLI failed: {e}")
+        self.stdout.write(f"Wrote {options['output']} ({os.path.getsize(options['output'])} bytes).")
@@ -0,0 +1,33 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from leads.exporters import iter_lead_csv
+from leads.models import Lead, User
+
+
+class Command(BaseCommand):
+    help = "Stream an organization's leads (or one agent's leads) as CSV."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "username",
+            help="Organizer to export the whole organization for, or agent to export their own leads.",
+        )
+        parser.add_argument("-o", "--output", help="Write to this file instead of stdout.")
+        parser.add_argument("--chunk-size", type=int, default=2000)
+
+    def handle(self, *args, **options):
+        try:
+            user = User.objects.get(username=options["username"])
+        except User.DoesNotExist:
+            raise CommandError(f"No user named {options['username']!r}.")
+        if user.is_organizer:
+            queryset = Lead.objects.filter(organization__user=user)
+        else:
+            queryset = Lead.objects.filter(agent__user=user)
+        lines = iter_lead_csv(queryset, chunk_size=options["chunk_size"])
+        if options["output"]:
+            with open(options["output"], "w", newline="") as f:
+                f.writelines(lines)
+        else:
+            for line in lines:
+                self.stdout.write(line, ending="")
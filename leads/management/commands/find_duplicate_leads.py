@@ -0,0 +1,60 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from leads import dedup
+from leads.models import Lead, LeadDedupKey, StaleLeadError, UserProfile
+
+KINDS = {kind for kind, _ in dedup.KIND_CHOICES}
+
+
+class Command(BaseCommand):
+    help = (
+        "List groups of leads that are the same person, from one pass over "
+        "the dedup key index, and optionally merge each group into its oldest lead."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--organizer", help="Only this organizer's organization.")
+        parser.add_argument(
+            "--by", default=",".join(dedup.DUPLICATE_KINDS),
+            help="Comma separated keys that make two leads duplicates: email, phone, name.",
+        )
+        parser.add_argument(
+            "--merge", action="store_true",
+            help="Fill each group's oldest lead from the others and soft delete them.",
+        )
+
+    def handle(self, *args, **options):
+        kinds = [kind.strip() for kind in options["by"].split(",") if kind.strip()]
+        if not kinds or set(kinds) - KINDS:
+            raise CommandError(f"--by takes a comma separated list of {', '.join(sorted(KINDS))}.")
+        organization_id = None
+        if options["organizer"]:
+            organization = UserProfile.objects.filter(user__username=options["organizer"]).first()
+            if organization is None:
+                raise CommandError(f"No organizer named {options['organizer']!r}.")
+            organization_id = organization.pk
+        #leads that were bulk inserted on SQLite or predate the index
+        LeadDedupKey.objects.index_missing(organization_id)
+        groups = duplicates = merged = 0
+        for organization_id, lead_ids in LeadDedupKey.objects.clusters(kinds, organization_id):
+            groups += 1
+            duplicates += len(lead_ids) - 1
+            self.stdout.write(f"Organization {organization_id}: leads {', '.join(map(str, lead_ids))}")
+            if options["merge"]:
+                merged += self.merge(lead_ids)
+        self.stdout.write(f"{groups} groups, {duplicates} duplicate leads.")
+        if options["merge"]:
+            self.stdout.write(f"Merged {merged} groups.")
+
+    def merge(self, lead_ids):
+        leads = list(Lead.objects.filter(pk__in=lead_ids).order_by("date_added", "id"))
+        if len(leads) < 2:
+            return 0
+        try:
+            with transaction.atomic():
+                leads[0].merge(leads[1:])
+        except StaleLeadError:
+            self.stderr.write(f"Leads {lead_ids} changed while merging, skipped.")
+            return 0
+        return 1
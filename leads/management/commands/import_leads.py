@@ -0,0 +1,50 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from leads.importers import LeadImportError, import_leads
+from leads.models import UserProfile
+
+
+class Command(BaseCommand):
+    help = "Bulk import leads for an organization from a .csv or .xlsx file."
+
+    def add_arguments(self, parser):
+        parser.add_argument("path")
+        parser.add_argument(
+            "--organizer", required=True,
+            help="Username of the organizer whose organization receives the leads.",
+        )
+        parser.add_argument("--batch-size", type=int, default=1000)
+        parser.add_argument(
+            "--no-notify", action="store_true",
+            help="Do not email the organizer a summary when the import finishes.",
+        )
+        parser.add_argument(
+            "--allow-duplicates", action="store_true",
+            help="Also import rows with the email or phone number of an existing lead.",
+        )
+
+    def handle(self, *args, **options):
+        try:
+            organization = UserProfile.objects.select_related("user").get(
+                user__username=options["organizer"]
+            )
+        except UserProfile.DoesNotExist:
+            raise CommandError(f"No organizer named {options['organizer']!r}.")
+        try:
+            with open(options["path"], "rb") as fileobj:
+                result = import_leads(
+                    organization,
+                    fileobj,
+                    options["path"],
+                    batch_size=options["batch_size"],
+                    notify=not options["no_notify"],
+                    allow_duplicates=options["allow_duplicates"],
+                )
+        except (OSError, LeadImportError) as e:
+            raise CommandError(str(e))
+        for line, errors in result.errors:
+            messages = "; ".join(f"{field}: {' '.join(msgs)}" for field, msgs in errors.items())
+            self.stderr.write(f"Row {line}: {messages}")
+        if result.rejected > len(result.errors):
+            self.stderr.write(f"... and {result.rejected - len(result.errors)} more rejected rows.")
+        self.stdout.write(str(result))
@@ -0,0 +1,34 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.utils import timezone
+
+from leads.events import create_partitions, drop_partitions, month_start
+from leads.models import LeadEvent
+
+
+class Command(BaseCommand):
+    help = (
+        "Create the lead event partitions for the coming months and drop the ones "
+        "past the retention period. Run it daily or monthly from cron."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--months-ahead", type=int, default=3)
+        parser.add_argument(
+            "--retain-months", type=int, default=settings.LEAD_EVENTS_RETAIN_MONTHS,
+            help="Keep this many months of events, the current one included.",
+        )
+
+    def handle(self, *args, **options):
+        this_month = month_start(timezone.localdate())
+        cutoff = month_start(this_month, 1 - options["retain_months"])
+        if connection.vendor != "postgresql":
+            #no partitions to drop, delete the old rows instead
+            deleted, _ = LeadEvent.objects.filter(created_at__date__lt=cutoff).delete()
+            self.stdout.write(f"Deleted {deleted} events from before {cutoff}.")
+            return
+        for month in create_partitions(connection, this_month, options["months_ahead"] + 1):
+            self.stdout.write(f"Created the partition for {month:%Y-%m}.")
+        for month in drop_partitions(connection, cutoff):
+            self.stdout.write(f"Dropped the partition for {month:%Y-%m}.")
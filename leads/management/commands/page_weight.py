@@ -0,0 +1,75 @@
+import os
+import re
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.test import Client
+from django.urls import reverse
+
+from leads.models import User
+
+ASSET_RE = re.compile(r"""<(?:link|script|img)\b[^>]*?\b(?:href|src)=["']([^"']+)["']""")
+PAGES = ("leads:lead-list", "leads:category-list", "leads:dashboard", "agents:agent-list")
+
+
+def asset_sizes(url):
+    """
+    Bytes of the collected file behind a static URL: as is, gzipped and
+    Brotli compressed, None for a variant that doesn't exist.
+    """
+    path = os.path.join(settings.STATIC_ROOT, url[len(settings.STATIC_URL):].split("?")[0])
+    if not os.path.isfile(path):
+        return None
+    return tuple(
+        os.path.getsize(variant) if os.path.isfile(variant) else None
+        for variant in (path, path + ".gz", path + ".br")
+    )
+
+
+class Command(BaseCommand):
+    help = (
+        "Report the bytes a browser downloads for each page: the HTML and the "
+        "collected static files it links, uncompressed and as WhiteNoise "
+        "serves them pre-compressed. Run collectstatic first."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("username", help="User to log in as.")
+        parser.add_argument("urls", nargs="*", help="Pages to measure (default: the main list pages).")
+
+    def handle(self, *args, **options):
+        try:
+            user = User.objects.get(username=options["username"])
+        except User.DoesNotExist:
+            raise CommandError(f"No user named {options['username']!r}.")
+        client = Client()
+        client.force_login(user)
+        for url in options["urls"] or [reverse(name) for name in PAGES]:
+            response = client.get(url)
+            if response.status_code != 200:
+                self.stdout.write(f"{url}: {response.status_code}, skipped")
+                continue
+            self.report(url, response.content.decode())
+
+    def report(self, url, html):
+        size = len(html.encode())
+        total = served = size
+        self.stdout.write(url)
+        self.stdout.write(f"  {'(html)':<60}{size:>10}")
+        for asset in dict.fromkeys(ASSET_RE.findall(html)):
+            if not asset.startswith(settings.STATIC_URL):
+                self.stdout.write(f"  {asset:<60}{'external, not measured':>33}")
+                continue
+            sizes = asset_sizes(asset)
+            if sizes is None:
+                self.stdout.write(f"  {asset:<60}{'missing':>10}")
+                continue
+            raw, gzipped, brotli = sizes
+            best = min(variant for variant in sizes if variant is not None)
+            note = "" if best < raw else "  not compressed"
+            self.stdout.write(
+                f"  {asset:<60}{raw:>10}{gzipped or '-':>8} gz{brotli or '-':>8} br{note}"
+            )
+            total += raw
+            served += best
+        self.stdout.write(f"  {'total':<60}{total:>10}, {served} served compressed")
@@ -0,0 +1,38 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from leads.purge import purge_agents, purge_leads, purge_organizations
+
+
+class Command(BaseCommand):
+    help = (
+        "Remove soft deleted organizations, agents and leads in small batches, "
+        "so no delete holds locks for long."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=None, help="Rows per transaction.")
+        parser.add_argument("--pause", type=float, default=None, help="Seconds to sleep between batches.")
+        parser.add_argument(
+            "--loop", action="store_true",
+            help="Keep polling for deleted rows instead of exiting once there are none.",
+        )
+        parser.add_argument(
+            "--interval", type=float, default=60.0,
+            help="Seconds to sleep between polls when there is nothing to purge.",
+        )
+
+    def handle(self, *args, **options):
+        batch = {"batch_size": options["batch_size"], "pause": options["pause"]}
+        while True:
+            #organizations first, their agents' leads need no unassigning
+            organizations = purge_organizations(**batch)
+            agents = purge_agents(**batch)
+            leads = purge_leads(**batch)
+            if organizations or agents or leads:
+                self.stdout.write(f"Purged {organizations} organizations, {agents} agents and {leads} leads.")
+                continue
+            if not options["loop"]:
+                break
+            time.sleep(options["interval"])
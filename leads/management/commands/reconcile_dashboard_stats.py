@@ -0,0 +1,30 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from leads.models import OrganizationStat, UserProfile
+
+
+class Command(BaseCommand):
+    help = (
+        "Recompute the dashboard statistics from the leads and fix any that drifted. "
+        "Safe to run periodically, e.g. nightly from cron."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--organizer",
+            help="Only reconcile this organizer's organization.",
+        )
+
+    def handle(self, *args, **options):
+        organizations = UserProfile.objects.order_by("pk")
+        if options["organizer"]:
+            organizations = organizations.filter(user__username=options["organizer"])
+            if not organizations.exists():
+                raise CommandError(f"No organizer named {options['organizer']!r}.")
+        corrected = 0
+        for organization_id in organizations.values_list("pk", flat=True).iterator():
+            fixed = OrganizationStat.objects.reconcile(organization_id)
+            if fixed:
+                self.stdout.write(f"Organization {organization_id}: corrected {fixed} statistics")
+            corrected += fixed
+        self.stdout.write(f"Corrected {corrected} statistics.")
@@ -0,0 +1,57 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from leads.models import User
+from leads.seeding import Seeder
+
+
+class Command(BaseCommand):
+    help = (
+        "Generate synthetic organizations, agents, categories and leads in bulk. "
+        "Every user's password is --password."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--organizations", type=int, default=10)
+        parser.add_argument("--agents", type=int, default=10, help="Agents per organization.")
+        parser.add_argument("--leads", type=int, default=10000, help="Leads per organization.")
+        parser.add_argument("--seed", type=int, default=0, help="Same seed, same data.")
+        parser.add_argument("--prefix", default="seed", help="Usernames are <prefix>-org<n>[-agent<m>].")
+        parser.add_argument("--password", default="password")
+        parser.add_argument("--batch-size", type=int, default=5000, help="Rows per INSERT or COPY.")
+        parser.add_argument(
+            "--organizations-per-batch", type=int, default=100,
+            help="Organizations created per transaction.",
+        )
+        parser.add_argument(
+            "--no-copy", action="store_true",
+            help="Insert leads with INSERT on PostgreSQL too, instead of COPY.",
+        )
+
+    def handle(self, *args, **options):
+        if User.objects.filter(username__startswith=f"{options['prefix']}-org").exists():
+            raise CommandError(f"Users prefixed {options['prefix']!r} already exist, pick another --prefix.")
+        seeder = Seeder(
+            prefix=options["prefix"],
+            password=options["password"],
+            seed=options["seed"],
+            batch_size=options["batch_size"],
+            use_copy=False if options["no_copy"] else None,
+        )
+        started = time.perf_counter()
+
+        def progress(created):
+            elapsed = time.perf_counter() - started
+            self.stdout.write(
+                f"{created['users']} users, {created['agents']} agents, "
+                f"{created['leads']} leads ({created['leads'] / elapsed:.0f} leads/s)"
+            )
+
+        seeder.seed(
+            options["organizations"], options["agents"], options["leads"],
+            organizations_per_batch=options["organizations_per_batch"], progress=progress,
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f"Seeded {options['organizations']} organizations in {time.perf_counter() - started:.1f}s."
+        ))
@@ -0,0 +1,45 @@
+import time
+
+from django.core.mail import get_connection
+from django.core.management.base import BaseCommand
+
+from leads.mail import send_queued_mail
+
+
+class Command(BaseCommand):
+    help = "Send emails queued in the outbox, in batches over one SMTP connection."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=None)
+        parser.add_argument(
+            "--loop", action="store_true",
+            help="Keep polling the outbox instead of exiting once it is drained.",
+        )
+        parser.add_argument(
+            "--interval", type=float, default=5.0,
+            help="Seconds to sleep between polls when the outbox is empty.",
+        )
+
+    def handle(self, *args, **options):
+        connection = get_connection()
+        try:
+            while True:
+                try:
+                    sent, failed = send_queued_mail(options["batch_size"], connection=connection)
+                except OSError as e:
+                    #SMTP server unreachable, the batch was given back unattempted
+                    self.stderr.write(f"Could not connect to the mail server: {e}")
+                    connection.close()
+                    sent = failed = 0
+                    if not options["loop"]:
+                        raise
+                if sent or failed:
+                    self.stdout.write(f"Sent {sent} emails, {failed} failed.")
+                    continue
+                if not options["loop"]:
+                    break
+                #idle: give the connection back instead of holding it open
+                connection.close()
+                time.sleep(options["interval"])
+        finally:
+            connection.close()
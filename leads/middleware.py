@@ -0,0 +1,231 @@
+import logging
+import time
+from contextlib import ExitStack
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import connections
+from django.utils.functional import SimpleLazyObject
+
+from .events import reset_request, set_request
+from .instrumentation import QueryBudgetExceeded, QueryCounter, request_stats
+from .models import User, UserProfile, Agent
+from .routers import use_replica
+
+logger = logging.getLogger(__name__)
+
+
+class Tenant:
+    """The organization (and, for agents, the Agent row) a request acts for."""
+
+    def __init__(self, user, organization=None, agent=None):
+        self.user = user
+        self.organization = organization
+        self.agent = agent
+
+    @property
+    def is_organizer(self):
+        return self.organization is not None and self.agent is None
+
+    @property
+    def is_agent(self):
+        return self.agent is not None
+
+    @property
+    def role(self):
+        if self.is_organizer:
+            return "organizer"
+        if self.is_agent:
+            return "agent"
+        return None
+
+    def __bool__(self):
+        return self.organization is not None
+
+
+def _preloaded(user, name):
+    """
+    The ``userprofile`` or ``agent`` TenantModelBackend fetched with the
+    user, None if there is none or it is deleted. Raises LookupError when
+    the user came from elsewhere and the relation wasn't loaded.
+    """
+    if not getattr(User, name).is_cached(user):
+        raise LookupError(name)
+    related = getattr(user, name, None)
+    if related is None or related.deleted_at is not None:
+        return None
+    return related
+
+
+def get_tenant(user):
+    """Resolve a user's tenant with at most a single query."""
+    if not user.is_authenticated:
+        return Tenant(user)
+    if user.is_organizer:
+        try:
+            organization = _preloaded(user, "userprofile")
+        except LookupError:
+            organization = UserProfile.objects.filter(user=user).first()
+        if organization is not None:
+            # prime the reverse accessor so user.userprofile costs nothing
+            organization.user = user
+            user.userprofile = organization
+        return Tenant(user, organization=organization)
+    try:
+        agent = _preloaded(user, "agent")
+    except LookupError:
+        agent = Agent.objects.select_related("organization").filter(user=user).first()
+    if agent is None:
+        return Tenant(user)
+    agent.user = user
+    user.agent = agent
+    return Tenant(user, organization=agent.organization, agent=agent)
+
+
+async def aget_tenant(request):
+    """
+    request.tenant for async views. The session, user and tenant lookups
+    run in a worker thread; afterwards the lazy object is resolved and safe
+    to use from async code.
+    """
+    def resolve():
+        bool(request.tenant)
+        return request.tenant
+    return await sync_to_async(resolve)()
+
+
+class TenantMiddleware:
+    """
+    Attach ``request.tenant``, resolved lazily and at most once per request.
+    Must come after AuthenticationMiddleware.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        request.tenant = SimpleLazyObject(lambda: get_tenant(request.user))
+        return self.get_response(request)
+
+
+class RequestStatsMiddleware:
+    """
+    Record query count, DB time, template render time and wall time for
+    every request that resolves to a named URL, and enforce the per-view
+    query budgets in settings.QUERY_BUDGETS.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        request_stats.window = settings.REQUEST_STATS_WINDOW
+
+    def __call__(self, request):
+        if not settings.REQUEST_STATS_ENABLED:
+            return self.get_response(request)
+        counter = QueryCounter()
+        started = time.perf_counter()
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(counter))
+            response = self.get_response(request)
+        wall_time = time.perf_counter() - started
+        match = getattr(request, "resolver_match", None)
+        if match is None:
+            return response
+        request_stats.record(
+            match.view_name,
+            queries=counter.count,
+            db_time=counter.time,
+            template_time=getattr(request, "_template_render_time", 0.0),
+            wall_time=wall_time,
+        )
+        self.check_budget(match.view_name, counter.count)
+        return response
+
+    def process_template_response(self, request, response):
+        started = time.perf_counter()
+        def rendered(response):
+            request._template_render_time = time.perf_counter() - started
+        response.add_post_render_callback(rendered)
+        return response
+
+    def check_budget(self, view_name, queries):
+        budget = settings.QUERY_BUDGETS.get(view_name)
+        if budget is None or queries <= budget:
+            return
+        message = f"{view_name} ran {queries} queries, over its budget of {budget}."
+        if settings.QUERY_BUDGET_ACTION == "raise":
+            raise QueryBudgetExceeded(message)
+        logger.warning(message)
+
+
+class ReadReplicaMiddleware:
+    """
+    Serve safe requests to views marked ``read_from_replica = True`` from the
+    read replica. A successful unsafe request (create, update, assign,
+    delete) pins the client to the primary for READ_YOUR_WRITES_SECONDS so
+    it never reads a replica that has not caught up with its own write.
+    Must come after AuthenticationMiddleware.
+    """
+    cookie_name = "primary_pin"
+    safe_methods = ("GET", "HEAD", "OPTIONS")
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        response = self.get_response(request)
+        if request.method not in self.safe_methods and response.status_code < 400:
+            seconds = settings.READ_YOUR_WRITES_SECONDS
+            response.set_cookie(
+                self.cookie_name, str(int(time.time() + seconds)),
+                max_age=seconds, httponly=True, samesite="Lax",
+            )
+        return response
+
+    def is_pinned(self, request):
+        try:
+            return int(request.COOKIES.get(self.cookie_name, 0)) > time.time()
+        except ValueError:
+            return False
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        view_class = getattr(view_func, "view_class", None)
+        if (
+            request.method not in self.safe_methods
+            or not getattr(view_class, "read_from_replica", False)
+            or settings.DATABASE_REPLICA_ALIAS is None
+            or self.is_pinned(request)
+        ):
+            return None
+        # load the session and user from the primary before switching, a
+        # lagging replica must never log anyone out
+        request.user.is_authenticated
+        # the view runs here so the replica is switched on and off in one
+        # frame; under ASGI __call__ and process_view run in different
+        # contexts. Template responses render inside too, their querysets
+        # are lazy.
+        with use_replica():
+            response = view_func(request, *view_args, **view_kwargs)
+            if callable(getattr(response, "render", None)):
+                started = time.perf_counter()
+                response.render()
+                request._template_render_time = time.perf_counter() - started
+        return response
+
+
+class LeadEventMiddleware:
+    """
+    Attribute the lead history events recorded during a request to the
+    requesting user. Must come after AuthenticationMiddleware.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        token = set_request(request)
+        try:
+            return self.get_response(request)
+        finally:
+            reset_request(token)
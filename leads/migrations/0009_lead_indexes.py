@@ -0,0 +1,29 @@
+# Generated by Django 3.1.4 on 2026-10-17 22:53
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('leads', '0008_auto_20250207_0333'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='lead',
+            index=models.Index(condition=models.Q(agent__isnull=False), fields=['organization', 'date_added', 'id'], name='lead_org_assigned_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='lead',
+            index=models.Index(condition=models.Q(agent__isnull=True), fields=['organization', 'date_added', 'id'], name='lead_org_unassigned_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='lead',
+            index=models.Index(fields=['agent', 'date_added', 'id'], name='lead_agent_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='lead',
+            index=models.Index(fields=['organization', 'category'], name='lead_org_category_idx'),
+        ),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 3.1.4 on 2026-10-17 22:54
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def count_category_leads(apps, schema_editor):
+    Category = apps.get_model('leads', 'Category')
+    Lead = apps.get_model('leads', 'Lead')
+    leads = Lead.objects.filter(category=OuterRef('pk')).order_by().values('category')
+    Category.objects.update(lead_count=Coalesce(
+        Subquery(leads.annotate(count=Count('pk')).values('count')), 0
+    ))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('leads', '0009_lead_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='category',
+            name='lead_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(count_category_leads, migrations.RunPython.noop),
+    ]
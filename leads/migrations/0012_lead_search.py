@@ -0,0 +1,48 @@
+# Generated by Django 3.1.4 on 2026-10-17 23:06
+
+import re
+
+from django.db import migrations, models
+
+
+def fill_phone_digits(apps, schema_editor):
+    Lead = apps.get_model('leads', 'Lead')
+    batch = []
+    for lead in Lead.objects.only('id', 'phone_number').iterator(chunk_size=2000):
+        lead.phone_digits = re.sub(r'\D', '', lead.phone_number or '')
+        batch.append(lead)
+        if len(batch) >= 2000:
+            Lead.objects.bulk_update(batch, ['phone_digits'])
+            batch = []
+    Lead.objects.bulk_update(batch, ['phone_digits'])
+
+
+def install_search(apps, schema_editor):
+    from leads.search import install_search
+    install_search(schema_editor.connection)
+
+
+def uninstall_search(apps, schema_editor):
+    from leads.search import uninstall_search
+    uninstall_search(schema_editor.connection)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('leads', '0011_outboundemail'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='lead',
+            name='phone_digits',
+            field=models.CharField(blank=True, default='', editable=False, max_length=20),
+        ),
+        migrations.AddIndex(
+            model_name='lead',
+            index=models.Index(fields=['organization', 'phone_digits'], name='lead_org_phone_idx'),
+        ),
+        migrations.RunPython(fill_phone_digits, migrations.RunPython.noop),
+        migrations.RunPython(install_search, uninstall_search),
+    ]
@@ -0,0 +1,57 @@
+# Generated by Django 3.1.4 on 2026-10-17 23:21
+
+from collections import Counter
+
+from django.db import migrations, models
+from django.db.models import Count
+from django.db.models.functions import TruncDate
+import django.db.models.deletion
+
+
+def build_organization_stats(apps, schema_editor):
+    Lead = apps.get_model('leads', 'Lead')
+    OrganizationStat = apps.get_model('leads', 'OrganizationStat')
+    counts = Counter()
+    leads = Lead.objects.order_by()
+    for organization_id, agent_id, category_id, count in leads.values_list(
+        'organization', 'agent', 'category'
+    ).annotate(count=Count('pk')):
+        counts[(organization_id, 'total', '')] += count
+        counts[(organization_id, 'category', '' if category_id is None else str(category_id))] += count
+        if agent_id is None:
+            counts[(organization_id, 'unassigned', '')] += count
+        else:
+            counts[(organization_id, 'agent', str(agent_id))] += count
+    for organization_id, day, count in leads.annotate(day=TruncDate('date_added')).values_list(
+        'organization', 'day'
+    ).annotate(count=Count('pk')):
+        counts[(organization_id, 'day', day.isoformat())] += count
+    OrganizationStat.objects.bulk_create([
+        OrganizationStat(organization_id=organization_id, kind=kind, key=key, count=count)
+        for (organization_id, kind, key), count in counts.items()
+    ], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('leads', '0012_lead_search'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='OrganizationStat',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('total', 'Total'), ('unassigned', 'Unassigned'), ('agent', 'Per agent'), ('category', 'Per category'), ('day', 'Per day')], max_length=10)),
+                ('key', models.CharField(blank=True, default='', max_length=20)),
+                ('count', models.IntegerField(default=0)),
+                ('organization', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='leads.userprofile')),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='organizationstat',
+            constraint=models.UniqueConstraint(fields=('organization', 'kind', 'key'), name='organization_stat_unique'),
+        ),
+        migrations.RunPython(build_organization_stats, migrations.RunPython.noop),
+    ]
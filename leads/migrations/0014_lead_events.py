@@ -0,0 +1,46 @@
+# Generated by Django 3.1.4 on 2026-10-17 23:25
+
+from django.conf import settings
+import django.core.serializers.json
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+
+
+def partition_lead_events(apps, schema_editor):
+    from leads.events import create_partitions, install_partitioning, month_start
+    connection = schema_editor.connection
+    if connection.vendor == 'postgresql':
+        install_partitioning(connection)
+        create_partitions(connection, month_start(django.utils.timezone.now().date()), 3)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('leads', '0013_organization_stats'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LeadEvent',
+            fields=[
+                ('id', models.BigAutoField(primary_key=True, serialize=False)),
+                ('kind', models.CharField(choices=[('created', 'Created'), ('updated', 'Updated'), ('assigned', 'Assigned'), ('categorized', 'Categorized'), ('deleted', 'Deleted')], max_length=12)),
+                ('changes', models.JSONField(default=dict, encoder=django.core.serializers.json.DjangoJSONEncoder)),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('actor', models.ForeignKey(blank=True, db_constraint=False, db_index=False, null=True, on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to=settings.AUTH_USER_MODEL)),
+                ('lead', models.ForeignKey(db_constraint=False, db_index=False, on_delete=django.db.models.deletion.DO_NOTHING, related_name='events', to='leads.lead')),
+                ('organization', models.ForeignKey(db_constraint=False, db_index=False, on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to='leads.userprofile')),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='leadevent',
+            index=models.Index(fields=['lead', 'created_at', 'id'], name='lead_event_lead_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='leadevent',
+            index=models.Index(fields=['actor', 'created_at'], name='lead_event_actor_idx'),
+        ),
+        migrations.RunPython(partition_lead_events, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 3.1.4 on 2026-10-17 23:42
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('leads', '0014_lead_events'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='lead',
+            name='version',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+    ]
@@ -0,0 +1,48 @@
+# Generated by Django 3.1.4 on 2026-10-17 23:47
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('leads', '0015_lead_version'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='lead',
+            name='lead_org_assigned_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='lead',
+            name='lead_org_unassigned_idx',
+        ),
+        migrations.AddField(
+            model_name='agent',
+            name='deleted_at',
+            field=models.DateTimeField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='lead',
+            name='deleted_at',
+            field=models.DateTimeField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='userprofile',
+            name='deleted_at',
+            field=models.DateTimeField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='lead',
+            index=models.Index(condition=models.Q(('agent__isnull', False), ('deleted_at__isnull', True)), fields=['organization', 'date_added', 'id'], name='lead_org_assigned_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='lead',
+            index=models.Index(condition=models.Q(('agent__isnull', True), ('deleted_at__isnull', True)), fields=['organization', 'date_added', 'id'], name='lead_org_unassigned_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='lead',
+            index=models.Index(condition=models.Q(deleted_at__isnull=False), fields=['deleted_at'], name='lead_deleted_idx'),
+        ),
+    ]
@@ -0,0 +1,50 @@
+# Generated by Django 3.1.4 on 2026-10-18 00:09
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+from leads.dedup import blocking_keys
+
+
+def build_dedup_keys(apps, schema_editor):
+    Lead = apps.get_model('leads', 'Lead')
+    LeadDedupKey = apps.get_model('leads', 'LeadDedupKey')
+    leads = Lead.objects.filter(deleted_at__isnull=True).order_by('pk').values_list(
+        'pk', 'organization', 'first_name', 'last_name', 'email', 'phone_number'
+    )
+    last = 0
+    while True:
+        batch = list(leads.filter(pk__gt=last)[:1000])
+        LeadDedupKey.objects.bulk_create([
+            LeadDedupKey(organization_id=organization_id, lead_id=lead_id, kind=kind, key=key)
+            for lead_id, organization_id, *fields in batch
+            for kind, key in blocking_keys(*fields)
+        ], batch_size=1000)
+        if len(batch) < 1000:
+            return
+        last = batch[-1][0]
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('leads', '0017_updated_at'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LeadDedupKey',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('email', 'Email'), ('phone', 'Phone number'), ('name', 'Name')], max_length=5)),
+                ('key', models.CharField(max_length=40)),
+                ('lead', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='dedup_keys', to='leads.lead')),
+                ('organization', models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='leads.userprofile')),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='leaddedupkey',
+            index=models.Index(fields=['organization', 'kind', 'key'], name='lead_dedup_key_idx'),
+        ),
+        migrations.RunPython(build_dedup_keys, migrations.RunPython.noop),
+    ]
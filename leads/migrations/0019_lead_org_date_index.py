@@ -0,0 +1,17 @@
+# Generated by Django 3.1.4 on 2026-10-18 00:34
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('leads', '0018_dedup_keys'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='lead',
+            index=models.Index(condition=models.Q(deleted_at__isnull=True), fields=['organization', 'date_added', 'id'], name='lead_org_date_idx'),
+        ),
+    ]
@@ -1,19 +1,67 @@
-from django.db import models
-from django.db.models.signals import post_save
+from collections import Counter
+
+from django.db import IntegrityError, models, transaction
+from django.db.models import Case, Count, Exists, F, OuterRef, Q, Subquery, Value, When
+from django.db.models.functions import Coalesce, TruncDate
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import Signal
 from django.contrib.auth.models import AbstractUser
+from django.core.serializers.json import DjangoJSONEncoder
+from django.utils import timezone
+
+from . import dedup
+from .cache import bump_tenant_version
+from .events import current_actor_id, record_events
+from .search import normalize_phone
 
 # Create your models here.
 
+# Sent with organization_id after leads were written in bulk (bulk_create,
+# queryset.update()), which bypasses the per-instance signals below.
+leads_bulk_changed = Signal()
+
 class User(AbstractUser):
     is_organizer = models.BooleanField(default=True)
     is_agent = models.BooleanField(default=False)
 
+class SoftDeleteManager(models.Manager):
+    """
+    The default manager of soft deleted models: hides the rows marked as
+    deleted, which the purge_deleted command removes later. ``all_objects``
+    still sees them.
+    """
+    
+    def get_queryset(self):
+        return super().get_queryset().filter(deleted_at__isnull=True)
+    
 class UserProfile(models.Model):
     user = models.OneToOneField(User, on_delete=models.CASCADE)
+    #set when the organization is offboarded, see soft_delete
+    deleted_at = models.DateTimeField(null=True, blank=True, editable=False)
+    
+    objects = SoftDeleteManager()
+    all_objects = models.Manager()
     
     def __str__(self):
         return self.user.username
     
+    def soft_delete(self):
+        """
+        Offboard the organization: hide it and its agents and log out all
+        of its users, with a few UPDATEs however big it is. The leads,
+        agents and categories are deleted in batches by purge_deleted.
+        """
+        now = timezone.now()
+        with transaction.atomic():
+            UserProfile.all_objects.filter(pk=self.pk).update(deleted_at=now)
+            Agent.objects.filter(organization=self).update(deleted_at=now, updated_at=now)
+            User.objects.filter(Q(pk=self.user_id) | Q(agent__organization=self)).update(is_active=False)
+        self.deleted_at = now
+        bump_tenant_version(self.pk)
+    
+class StaleLeadError(Exception):
+    """The lead was changed by someone else, or left the caller's scope, since it was loaded."""
+    
 class Lead(models.Model):       
     first_name = models.CharField(max_length=20)
     last_name = models.CharField(max_length=20)
@@ -24,28 +72,681 @@ class Lead(models.Model):
     description = models.TextField()
     date_added = models.DateTimeField(auto_now_add=True)
     phone_number= models.CharField(max_length=20)
+    #phone_number without formatting, for exact lookups from search
+    phone_digits = models.CharField(max_length=20, blank=True, default="", editable=False)
     email = models.EmailField()
+    #bumped by every write, for optimistic concurrency (see save_changes)
+    version = models.PositiveIntegerField(default=0, editable=False)
+    #every write sets it, queryset updates included
+    updated_at = models.DateTimeField(auto_now=True)
+    deleted_at = models.DateTimeField(null=True, blank=True, editable=False)
+    
+    objects = SoftDeleteManager()
+    all_objects = models.Manager()
+    
+    class Meta:
+        indexes = [
+            #lead list for organizers and the unassigned block, in keyset order
+            models.Index(
+                fields=["organization", "date_added", "id"],
+                condition=models.Q(agent__isnull=False, deleted_at__isnull=True),
+                name="lead_org_assigned_idx",
+            ),
+            models.Index(
+                fields=["organization", "date_added", "id"],
+                condition=models.Q(agent__isnull=True, deleted_at__isnull=True),
+                name="lead_org_unassigned_idx",
+            ),
+            #the JSON API's lead list for organizers, assigned or not
+            models.Index(
+                fields=["organization", "date_added", "id"],
+                condition=models.Q(deleted_at__isnull=True),
+                name="lead_org_date_idx",
+            ),
+            #lead list for agents
+            models.Index(fields=["agent", "date_added", "id"], name="lead_agent_date_idx"),
+            #per category counts, including category IS NULL
+            models.Index(fields=["organization", "category"], name="lead_org_category_idx"),
+            #phone number search
+            models.Index(fields=["organization", "phone_digits"], name="lead_org_phone_idx"),
+            #what purge_deleted has left to do
+            models.Index(fields=["deleted_at"], condition=models.Q(deleted_at__isnull=False), name="lead_deleted_idx"),
+        ]
     
     def __str__(self):
         return f"{self.first_name} {self.last_name}"   
     
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        #remember what was loaded so signal handlers can tell what changed
+        instance._loaded_values = dict(zip(field_names, values))
+        return instance
+    
+    def save(self, *args, **kwargs):
+        #a deferred phone_number is not being written, don't load it
+        if "phone_number" in self.__dict__:
+            self.phone_digits = normalize_phone(self.phone_number)
+        update_fields = kwargs.get("update_fields")
+        if update_fields is not None:
+            update_fields = set(update_fields)
+            if "phone_number" in update_fields:
+                update_fields.add("phone_digits")
+            update_fields.add("updated_at")
+            kwargs["update_fields"] = update_fields
+        if self._state.adding or "version" not in self.__dict__:
+            super().save(*args, **kwargs)
+            return
+        #UPDATE ... SET version = version + 1 WHERE id = %s AND version = %s
+        self._expected_version = self.version
+        self.version += 1
+        if update_fields is not None:
+            update_fields.add("version")
+        try:
+            super().save(*args, **kwargs)
+        except StaleLeadError:
+            self.version = self._expected_version
+            raise
+        finally:
+            del self._expected_version
+    
+    def save_changes(self, fields, version=None, scope=None):
+        """
+        Write only ``fields`` in one conditional UPDATE. It matches only if
+        the row still has ``version`` (by default the one loaded) and, if
+        given, the ``scope`` Q object, e.g. the tenant's leads; otherwise
+        StaleLeadError is raised and nothing is written.
+        """
+        if version is not None:
+            self.version = version
+        self._update_scope = scope
+        try:
+            self.save(update_fields=fields)
+        finally:
+            del self._update_scope
+    
+    def _do_update(self, base_qs, using, pk_val, values, update_fields, forced_update):
+        expected = getattr(self, "_expected_version", None)
+        if expected is None:
+            return super()._do_update(base_qs, using, pk_val, values, update_fields, forced_update)
+        base_qs = base_qs.filter(version=expected)
+        scope = getattr(self, "_update_scope", None)
+        if scope is not None:
+            base_qs = base_qs.filter(scope)
+        if not super()._do_update(base_qs, using, pk_val, values, update_fields, forced_update):
+            raise StaleLeadError(f"Lead {pk_val} changed since version {expected} was loaded.")
+        return True
+    
+    def soft_delete(self):
+        """
+        Hide the lead with one UPDATE. Counters, statistics and history
+        change right away (see post_lead_saved_signal); purge_deleted
+        removes the row later.
+        """
+        self.deleted_at = timezone.now()
+        try:
+            self.save_changes(["deleted_at"])
+        except StaleLeadError:
+            self.deleted_at = None
+            raise
+    
+    def merge(self, duplicates):
+        """
+        Fill the blank fields of this lead from ``duplicates``, first one
+        first, and soft delete them, in one transaction. Raises
+        StaleLeadError if any of them changed since it was loaded.
+        """
+        changed = []
+        for name in MERGE_FIELDS:
+            attname = self._meta.get_field(name).attname
+            if getattr(self, attname):
+                continue
+            for duplicate in duplicates:
+                value = getattr(duplicate, attname)
+                if value:
+                    setattr(self, attname, value)
+                    changed.append(name)
+                    break
+        with transaction.atomic():
+            if changed:
+                self.save_changes(changed)
+            for duplicate in duplicates:
+                duplicate.soft_delete()
+    
+#what a merged lead takes from its duplicates when it has none
+MERGE_FIELDS = ("last_name", "age", "agent", "category", "description", "email", "phone_number")
+    
 class Agent(models.Model):
     user = models.OneToOneField(User, on_delete=models.CASCADE)
     organization = models.ForeignKey(UserProfile, on_delete=models.CASCADE)
+    updated_at = models.DateTimeField(auto_now=True)
+    deleted_at = models.DateTimeField(null=True, blank=True, editable=False)
+    
+    objects = SoftDeleteManager()
+    all_objects = models.Manager()
     
     def __str__(self):
         return self.user.email
     
+    def soft_delete(self):
+        """
+        Hide the agent, which also takes away its access. Its leads stay
+        assigned to it until purge_deleted unassigns them in batches.
+        """
+        self.deleted_at = timezone.now()
+        self.save(update_fields=["deleted_at", "updated_at"])
+    
+class CategoryQuerySet(models.QuerySet):
+    
+    def recount_leads(self):
+        """Recompute lead_count for every category in one UPDATE."""
+        leads = Lead.objects.filter(category=OuterRef("pk")).order_by().values("category")
+        return self.update(lead_count=Coalesce(
+            Subquery(leads.annotate(count=Count("pk")).values("count")), 0
+        ))
+    
 class Category(models.Model):
     name = models.CharField(max_length=30)
     organization = models.ForeignKey(UserProfile, on_delete=models.CASCADE, blank=True, null=True)
+    #denormalized, kept in sync by the Lead signals below
+    lead_count = models.PositiveIntegerField(default=0, editable=False)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    objects = CategoryQuerySet.as_manager()
     
     def __str__(self):
         return self.name 
     
+class OrganizationStatQuerySet(models.QuerySet):
+    
+    def adjust(self, deltas):
+        """
+        Apply {(organization_id, kind, key): delta} with one UPDATE per
+        distinct delta, creating the rows that do not exist yet. A negative
+        delta for a missing row is dropped: the row is gone, e.g. because
+        the organization is being deleted.
+        """
+        by_delta = {}
+        for stat, delta in deltas.items():
+            if delta:
+                by_delta.setdefault(delta, []).append(stat)
+        for delta, stats in by_delta.items():
+            condition = Q()
+            for organization_id, kind, key in stats:
+                condition |= Q(organization_id=organization_id, kind=kind, key=key)
+            updated = self.filter(condition).update(count=F("count") + delta)
+            if updated == len(stats) or delta < 0:
+                continue
+            existing = set(self.filter(condition).values_list("organization_id", "kind", "key"))
+            for organization_id, kind, key in stats:
+                if (organization_id, kind, key) in existing:
+                    continue
+                try:
+                    with transaction.atomic():
+                        self.create(organization_id=organization_id, kind=kind, key=key, count=delta)
+                except IntegrityError:
+                    #created concurrently, add to it instead
+                    self.filter(organization_id=organization_id, kind=kind, key=key).update(
+                        count=F("count") + delta
+                    )
+    
+    def reconcile(self, organization_id):
+        """
+        Recompute one organization's statistics from its leads and fix the
+        rows that drifted. Returns the number of rows corrected.
+        """
+        with transaction.atomic():
+            #lock first: increments that wait on the lock land on top of the fresh counts
+            current = {
+                (stat.kind, stat.key): stat
+                for stat in self.select_for_update().filter(organization_id=organization_id)
+            }
+            expected = Counter()
+            leads = Lead.objects.filter(organization_id=organization_id).order_by()
+            for agent_id, category_id, count in leads.values_list("agent", "category").annotate(count=Count("pk")):
+                for stat in _lead_stat_keys({
+                    "organization_id": organization_id, "agent_id": agent_id, "category_id": category_id,
+                }):
+                    expected[stat[1:]] += count
+            for day, count in leads.annotate(day=TruncDate("date_added")).values_list("day").annotate(count=Count("pk")):
+                expected[(OrganizationStat.DAY, day.isoformat())] += count
+            stale = [stat.pk for key, stat in current.items() if not expected.get(key)]
+            self.filter(pk__in=stale).delete()
+            corrected = len(stale)
+            missing = []
+            for (kind, key), count in expected.items():
+                stat = current.get((kind, key))
+                if stat is None:
+                    missing.append(OrganizationStat(organization_id=organization_id, kind=kind, key=key, count=count))
+                elif stat.count != count:
+                    self.filter(pk=stat.pk).update(count=count)
+                    corrected += 1
+            self.bulk_create(missing)
+            return corrected + len(missing)
+    
+class OrganizationStat(models.Model):
+    """
+    Lead counts per organization, kept up to date by the Lead signals below
+    so the dashboard never aggregates the leads table. ``key`` is the agent
+    or category id ("" for none) or the ISO date of a day.
+    """
+    TOTAL = "total"
+    UNASSIGNED = "unassigned"
+    AGENT = "agent"
+    CATEGORY = "category"
+    DAY = "day"
+    KIND_CHOICES = (
+        (TOTAL, "Total"),
+        (UNASSIGNED, "Unassigned"),
+        (AGENT, "Per agent"),
+        (CATEGORY, "Per category"),
+        (DAY, "Per day"),
+    )
+    
+    organization = models.ForeignKey(UserProfile, on_delete=models.CASCADE)
+    kind = models.CharField(max_length=10, choices=KIND_CHOICES)
+    key = models.CharField(max_length=20, blank=True, default="")
+    count = models.IntegerField(default=0)
+    
+    objects = OrganizationStatQuerySet.as_manager()
+    
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["organization", "kind", "key"], name="organization_stat_unique"),
+        ]
+    
+    def __str__(self):
+        return f"{self.kind} {self.key}: {self.count}"
+    
+def _lead_stat_keys(values):
+    """The (organization_id, kind, key) statistics one lead counts towards."""
+    organization_id = values["organization_id"]
+    agent_id = values["agent_id"]
+    category_id = values["category_id"]
+    keys = [
+        (organization_id, OrganizationStat.TOTAL, ""),
+        (organization_id, OrganizationStat.CATEGORY, "" if category_id is None else str(category_id)),
+    ]
+    if agent_id is None:
+        keys.append((organization_id, OrganizationStat.UNASSIGNED, ""))
+    else:
+        keys.append((organization_id, OrganizationStat.AGENT, str(agent_id)))
+    if values.get("date_added") is not None:
+        keys.append((organization_id, OrganizationStat.DAY, timezone.localdate(values["date_added"]).isoformat()))
+    return keys
+
+#the Lead columns the statistics depend on
+LEAD_STAT_FIELDS = ("organization_id", "agent_id", "category_id", "date_added")
+
 def post_user_created_signal(sender, instance, created, **kwargs):
     print(instance, created)
     if created:
         UserProfile.objects.create(user=instance)
 
-post_save.connect(post_user_created_signal, sender=User)
\ No newline at end of file
+post_save.connect(post_user_created_signal, sender=User)
+
+class OutboundEmail(models.Model):
+    QUEUED = "queued"
+    SENT = "sent"
+    FAILED = "failed"
+    STATUS_CHOICES = (
+        (QUEUED, "Queued"),
+        (SENT, "Sent"),
+        (FAILED, "Failed"),
+    )
+    
+    subject = models.CharField(max_length=255)
+    message = models.TextField()
+    from_email = models.CharField(max_length=254)
+    recipients = models.JSONField(default=list)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=QUEUED)
+    attempts = models.PositiveIntegerField(default=0)
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    sent_at = models.DateTimeField(null=True, blank=True)
+    
+    class Meta:
+        indexes = [
+            #the worker's "what is due" lookup
+            models.Index(fields=["status", "next_attempt_at"], name="outbound_email_due_idx"),
+        ]
+    
+    def __str__(self):
+        return f"{self.subject} ({self.status})"
+    
+class LeadDedupKeyQuerySet(models.QuerySet):
+    
+    def matching(self, organization_id, keys):
+        """The organization's keys equal to any of ``keys``, (kind, key) pairs."""
+        by_kind = {}
+        for kind, key in keys:
+            by_kind.setdefault(kind, set()).add(key)
+        if not by_kind:
+            return self.none()
+        match = Q()
+        for kind, values in by_kind.items():
+            match |= Q(kind=kind, key__in=values)
+        return self.filter(match, organization_id=organization_id)
+    
+    def index(self, leads):
+        """
+        File ``leads`` under their blocking keys. Leads without a primary
+        key, after SQLite's bulk_create, are skipped: see index_missing().
+        """
+        self.bulk_create([
+            LeadDedupKey(organization_id=lead.organization_id, lead_id=lead.pk, kind=kind, key=key)
+            for lead in leads if lead.pk is not None
+            for kind, key in dedup.blocking_keys(lead.first_name, lead.last_name, lead.email, lead.phone_number)
+        ], batch_size=1000)
+    
+    def reindex(self, lead, previous):
+        """
+        Move ``lead`` from its ``previous`` (kind, key) pairs to the ones it
+        has now, touching only the kinds that changed: editing one contact
+        field is a single UPDATE, and an edit that keeps the keys is free.
+        """
+        previous = dict(previous)
+        current = dict(dedup.blocking_keys(lead.first_name, lead.last_name, lead.email, lead.phone_number))
+        keys = self.filter(lead_id=lead.pk)
+        changed = {kind: key for kind, key in current.items() if previous.get(kind, key) != key}
+        if changed:
+            keys.filter(kind__in=changed).update(key=Case(
+                *[When(kind=kind, then=Value(key)) for kind, key in changed.items()],
+                output_field=models.CharField(),
+            ))
+        removed = previous.keys() - current.keys()
+        if removed:
+            keys.filter(kind__in=removed).delete()
+        self.bulk_create([
+            LeadDedupKey(organization_id=lead.organization_id, lead_id=lead.pk, kind=kind, key=key)
+            for kind, key in current.items() if kind not in previous
+        ])
+    
+    def index_missing(self, organization_id=None, batch_size=1000):
+        """
+        File the leads that have no keys yet: leads inserted without their
+        primary keys coming back, or from before the table existed. Reads
+        them in primary key order, ``batch_size`` at a time. Returns how
+        many leads were looked at.
+        """
+        leads = Lead.objects.exclude(Exists(LeadDedupKey.objects.filter(lead=OuterRef("pk"))))
+        if organization_id is not None:
+            leads = leads.filter(organization_id=organization_id)
+        leads = leads.only("organization", "first_name", "last_name", "email", "phone_number").order_by("pk")
+        last, count = 0, 0
+        while True:
+            batch = list(leads.filter(pk__gt=last)[:batch_size])
+            self.index(batch)
+            count += len(batch)
+            if len(batch) < batch_size:
+                return count
+            last = batch[-1].pk
+    
+    def clusters(self, kinds=dedup.DUPLICATE_KINDS, organization_id=None, chunk_size=2000):
+        """
+        Yield (organization_id, [lead ids]) for every group of leads that
+        share a key of ``kinds``, directly or through other leads. One pass
+        over lead_dedup_key_idx in key order; only leads that share a key
+        are kept in memory.
+        """
+        rows = self.filter(kind__in=kinds)
+        if organization_id is not None:
+            rows = rows.filter(organization_id=organization_id)
+        rows = rows.order_by("organization", "kind", "key").values_list("organization", "kind", "key", "lead")
+        parent, organizations = {}, {}
+        def find(lead_id):
+            while parent[lead_id] != lead_id:
+                parent[lead_id] = parent[parent[lead_id]]
+                lead_id = parent[lead_id]
+            return lead_id
+        def join(organization_id, block):
+            for lead_id in block:
+                parent.setdefault(lead_id, lead_id)
+                organizations[lead_id] = organization_id
+            root = find(block[0])
+            for lead_id in block[1:]:
+                parent[find(lead_id)] = root
+        current, block = None, []
+        for organization_id, kind, key, lead_id in rows.iterator(chunk_size=chunk_size):
+            if (organization_id, kind, key) != current:
+                if len(block) > 1:
+                    join(current[0], block)
+                current, block = (organization_id, kind, key), []
+            block.append(lead_id)
+        if len(block) > 1:
+            join(current[0], block)
+        groups = {}
+        for lead_id in parent:
+            groups.setdefault(find(lead_id), []).append(lead_id)
+        for lead_ids in groups.values():
+            yield organizations[lead_ids[0]], sorted(lead_ids)
+    
+class LeadDedupKey(models.Model):
+    """
+    Blocking keys of the live leads (see leads.dedup), so a lead's likely
+    duplicates are one indexed lookup away. Kept in sync by the Lead
+    signals below; bulk inserts call LeadDedupKey.objects.index().
+    """
+    organization = models.ForeignKey(UserProfile, on_delete=models.CASCADE, db_index=False, related_name="+")
+    lead = models.ForeignKey(Lead, on_delete=models.CASCADE, related_name="dedup_keys")
+    kind = models.CharField(max_length=5, choices=dedup.KIND_CHOICES)
+    key = models.CharField(max_length=40)
+    
+    objects = LeadDedupKeyQuerySet.as_manager()
+    
+    class Meta:
+        indexes = [
+            models.Index(fields=["organization", "kind", "key"], name="lead_dedup_key_idx"),
+        ]
+    
+    def __str__(self):
+        return f"{self.kind} {self.key}"
+    
+class LeadEventQuerySet(models.QuerySet):
+    
+    def by_actor(self, user, since, until=None):
+        """
+        Events made by ``user`` from ``since``. Always bounded in time, so
+        PostgreSQL only scans the matching monthly partitions.
+        """
+        queryset = self.filter(actor=user, created_at__gte=since)
+        if until is not None:
+            queryset = queryset.filter(created_at__lt=until)
+        return queryset
+    
+    def activity(self, user, since, until=None):
+        """{kind: number of events} for one user, from lead_event_actor_idx alone."""
+        return dict(
+            self.by_actor(user, since, until).order_by().values_list("kind").annotate(count=Count("pk"))
+        )
+    
+class LeadEvent(models.Model):
+    """
+    Append-only history of a lead. ``changes`` maps field names to
+    [old, new] values (ids for foreign keys); the old value is null for
+    creations and for fields that were not loaded before the save.
+    Written in batches by leads.events, partitioned by month on PostgreSQL.
+    """
+    CREATED = "created"
+    UPDATED = "updated"
+    ASSIGNED = "assigned"
+    CATEGORIZED = "categorized"
+    DELETED = "deleted"
+    KIND_CHOICES = (
+        (CREATED, "Created"),
+        (UPDATED, "Updated"),
+        (ASSIGNED, "Assigned"),
+        (CATEGORIZED, "Categorized"),
+        (DELETED, "Deleted"),
+    )
+    
+    id = models.BigAutoField(primary_key=True)
+    #no database constraints: the log outlives leads and users, and
+    #PostgreSQL partitions are dropped without touching other tables
+    organization = models.ForeignKey(
+        UserProfile, on_delete=models.DO_NOTHING, db_constraint=False, db_index=False, related_name="+",
+    )
+    lead = models.ForeignKey(
+        Lead, on_delete=models.DO_NOTHING, db_constraint=False, db_index=False, related_name="events",
+    )
+    actor = models.ForeignKey(
+        User, on_delete=models.DO_NOTHING, db_constraint=False, db_index=False,
+        null=True, blank=True, related_name="+",
+    )
+    kind = models.CharField(max_length=12, choices=KIND_CHOICES)
+    changes = models.JSONField(default=dict, encoder=DjangoJSONEncoder)
+    created_at = models.DateTimeField(default=timezone.now)
+    
+    objects = LeadEventQuerySet.as_manager()
+    
+    class Meta:
+        indexes = [
+            #a lead's timeline, in keyset order
+            models.Index(fields=["lead", "created_at", "id"], name="lead_event_lead_idx"),
+            #per agent activity over a time range
+            models.Index(fields=["actor", "created_at"], name="lead_event_actor_idx"),
+        ]
+    
+    def __str__(self):
+        return f"{self.kind} lead {self.lead_id}"
+    
+def lead_events(instance, created, update_fields):
+    """The LeadEvent rows describing one save of ``instance``."""
+    loaded = getattr(instance, "_loaded_values", {})
+    changes = {}
+    for field in instance._meta.concrete_fields:
+        if field.primary_key or not field.editable or field.attname not in instance.__dict__:
+            continue
+        if not created and update_fields is not None and not {field.name, field.attname} & set(update_fields):
+            continue
+        old = None if created else loaded.get(field.attname)
+        new = getattr(instance, field.attname)
+        if created or old != new:
+            changes[field.name] = [old, new]
+    if not changes:
+        return []
+    actor_id = current_actor_id()
+    def event(kind, changes):
+        return LeadEvent(
+            organization_id=instance.organization_id, lead_id=instance.pk,
+            actor_id=actor_id, kind=kind, changes=changes,
+        )
+    if created:
+        return [event(LeadEvent.CREATED, changes)]
+    events = []
+    #assignments and category changes get their own events, for activity reports
+    for name, kind in (("agent", LeadEvent.ASSIGNED), ("category", LeadEvent.CATEGORIZED)):
+        if name in changes:
+            events.append(event(kind, {name: changes.pop(name)}))
+    if changes:
+        events.append(event(LeadEvent.UPDATED, changes))
+    return events
+
+def _adjust_category_lead_count(category_id, delta):
+    if category_id is not None:
+        Category.objects.filter(pk=category_id).update(lead_count=F("lead_count") + delta)
+
+def _update_lead_stats(instance, created, update_fields):
+    new = {field: getattr(instance, field) for field in LEAD_STAT_FIELDS}
+    deltas = Counter()
+    if created:
+        deltas.update(_lead_stat_keys(new))
+    else:
+        changed = [
+            field for field in LEAD_STAT_FIELDS
+            if update_fields is None or field in update_fields or field.rsplit("_id", 1)[0] in update_fields
+        ]
+        loaded = getattr(instance, "_loaded_values", {})
+        if any(field not in loaded for field in changed):
+            #the old values were never loaded, nothing to diff against
+            OrganizationStat.objects.reconcile(instance.organization_id)
+            return
+        old = dict(new, **{field: loaded[field] for field in changed})
+        if old == new:
+            return
+        deltas.subtract(_lead_stat_keys(old))
+        deltas.update(_lead_stat_keys(new))
+    OrganizationStat.objects.adjust(deltas)
+
+def _lead_removed(instance):
+    _adjust_category_lead_count(instance.category_id, -1)
+    OrganizationStat.objects.adjust(Counter({
+        stat: -1 for stat in _lead_stat_keys({field: getattr(instance, field) for field in LEAD_STAT_FIELDS})
+    }))
+    record_events([LeadEvent(
+        organization_id=instance.organization_id, lead_id=instance.pk,
+        actor_id=current_actor_id(), kind=LeadEvent.DELETED,
+    )])
+
+def _update_dedup_keys(instance, created, update_fields):
+    if not created:
+        if update_fields is not None and not set(DEDUP_FIELDS) & set(update_fields):
+            return
+        loaded = getattr(instance, "_loaded_values", {})
+        if all(field in loaded for field in DEDUP_FIELDS):
+            previous = dedup.blocking_keys(*(loaded[field] for field in DEDUP_FIELDS))
+            LeadDedupKey.objects.reindex(instance, previous)
+            return
+        #the keys it was filed under aren't known, start over
+        LeadDedupKey.objects.filter(lead_id=instance.pk).delete()
+    LeadDedupKey.objects.index([instance])
+
+#the fields leads.dedup.blocking_keys() reads, in its argument order
+DEDUP_FIELDS = ("first_name", "last_name", "email", "phone_number")
+
+def post_lead_saved_signal(sender, instance, created, update_fields=None, **kwargs):
+    loaded = getattr(instance, "_loaded_values", {})
+    if not created and instance.__dict__.get("deleted_at") is not None and loaded.get("deleted_at") is None:
+        #soft deleted: the lead is gone as far as anyone can see
+        _lead_removed(instance)
+        LeadDedupKey.objects.filter(lead_id=instance.pk).delete()
+    else:
+        if created:
+            _adjust_category_lead_count(instance.category_id, 1)
+        elif update_fields is None or "category" in update_fields:
+            if "category_id" in loaded and loaded["category_id"] != instance.category_id:
+                _adjust_category_lead_count(loaded["category_id"], -1)
+                _adjust_category_lead_count(instance.category_id, 1)
+        _update_dedup_keys(instance, created, update_fields)
+    _update_lead_stats(instance, created, update_fields)
+    record_events(lead_events(instance, created, update_fields))
+    instance._loaded_values = {
+        field.attname: getattr(instance, field.attname)
+        for field in instance._meta.concrete_fields
+        if field.attname in instance.__dict__
+    }
+
+def post_lead_deleted_signal(sender, instance, **kwargs):
+    #a soft deleted lead was accounted for when it was soft deleted
+    if instance.__dict__.get("deleted_at") is None:
+        _lead_removed(instance)
+
+post_save.connect(post_lead_saved_signal, sender=Lead)
+post_delete.connect(post_lead_deleted_signal, sender=Lead)
+
+def leads_bulk_changed_signal(sender, organization_id, **kwargs):
+    Category.objects.filter(organization_id=organization_id).recount_leads()
+    OrganizationStat.objects.reconcile(organization_id)
+    bump_tenant_version(organization_id)
+
+leads_bulk_changed.connect(leads_bulk_changed_signal)
+
+def lead_owner_deleted_signal(sender, instance, **kwargs):
+    #deleting an agent or category sets Lead.agent/category to NULL with a
+    #queryset update, which sends no Lead signals. Reconcile once the delete
+    #has committed, a cascade from the organization may still be running now.
+    #purge_deleted unassigns a soft deleted agent's leads itself.
+    organization_id = instance.organization_id
+    if organization_id is not None and getattr(instance, "deleted_at", None) is None:
+        transaction.on_commit(lambda: OrganizationStat.objects.reconcile(organization_id))
+
+for model in (Agent, Category):
+    post_delete.connect(lead_owner_deleted_signal, sender=model, dispatch_uid=f"lead_owner_deleted_{model.__name__}")
+
+def tenant_changed_signal(sender, instance, **kwargs):
+    bump_tenant_version(instance.organization_id)
+
+for model in (Lead, Category, Agent):
+    post_save.connect(tenant_changed_signal, sender=model, dispatch_uid=f"tenant_changed_{model.__name__}_save")
+    post_delete.connect(tenant_changed_signal, sender=model, dispatch_uid=f"tenant_changed_{model.__name__}_delete")
@@ -0,0 +1,141 @@
+import base64
+import json
+from types import SimpleNamespace
+
+from django.core.exceptions import FieldDoesNotExist, ValidationError
+from django.db.models import Q
+from django.http import Http404
+
+
+class InvalidCursor(Exception):
+    pass
+
+
+class KeysetPage:
+    """A single page of a keyset (cursor) paginated queryset."""
+
+    def __init__(self, object_list, next_cursor, cursor):
+        self.object_list = object_list
+        self.next_cursor = next_cursor
+        self.cursor = cursor
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def has_next(self):
+        return self.next_cursor is not None
+
+    def has_previous(self):
+        return self.cursor is not None
+
+    def has_other_pages(self):
+        return self.has_next() or self.has_previous()
+
+
+class KeysetPaginator:
+    """
+    Paginate a queryset by seeking past the last row of the previous page
+    instead of using OFFSET, so every page costs the same index range scan
+    no matter how deep the user goes.
+
+    ``ordering`` is a tuple of field names that together are unique (end it
+    with the primary key), optionally prefixed with "-" for descending order.
+    Names that are not model fields are read as annotations and stored in
+    the cursor as plain JSON values. A .values() queryset works too, if
+    its rows include the ordering fields.
+    """
+
+    def __init__(self, queryset, per_page, ordering=("date_added", "id")):
+        self.queryset = queryset
+        self.per_page = int(per_page)
+        self.ordering = tuple(ordering)
+        self.model = queryset.model
+
+    def _fields(self):
+        return [
+            (name.lstrip("-"), name.startswith("-"))
+            for name in self.ordering
+        ]
+
+    def _model_field(self, name):
+        try:
+            return self.model._meta.get_field(name)
+        except FieldDoesNotExist:
+            return None
+
+    def encode_cursor(self, obj):
+        if isinstance(obj, dict):
+            #a row of a .values() queryset
+            obj = SimpleNamespace(**obj)
+        values = []
+        for name, _ in self._fields():
+            field = self._model_field(name)
+            if field is None:
+                values.append(getattr(obj, name))
+            else:
+                values.append(field.value_to_string(obj))
+        raw = json.dumps(values, separators=(",", ":")).encode()
+        return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+    def decode_cursor(self, cursor):
+        try:
+            padded = cursor + "=" * (-len(cursor) % 4)
+            values = json.loads(base64.urlsafe_b64decode(padded.encode()))
+            fields = self._fields()
+            if not isinstance(values, list) or len(values) != len(fields):
+                raise InvalidCursor(cursor)
+            decoded = []
+            for (name, _), value in zip(fields, values):
+                field = self._model_field(name)
+                if field is not None:
+                    value = field.to_python(value)
+                elif not isinstance(value, (int, float, str)):
+                    raise InvalidCursor(cursor)
+                decoded.append(value)
+            return decoded
+        except (ValueError, TypeError, ValidationError) as e:
+            raise InvalidCursor(cursor) from e
+
+    def seek(self, queryset, values):
+        """Filter ``queryset`` to the rows strictly after ``values``."""
+        condition = Q()
+        equal = Q()
+        for (name, descending), value in zip(self._fields(), values):
+            lookup = "%s__%s" % (name, "lt" if descending else "gt")
+            condition |= equal & Q(**{lookup: value})
+            equal &= Q(**{name: value})
+        return queryset.filter(condition)
+
+    def page(self, cursor=None):
+        queryset = self.queryset.order_by(*self.ordering)
+        if cursor:
+            queryset = self.seek(queryset, self.decode_cursor(cursor))
+        # fetch one extra row to find out whether there is a next page
+        object_list = list(queryset[:self.per_page + 1])
+        next_cursor = None
+        if len(object_list) > self.per_page:
+            object_list = object_list[:self.per_page]
+            next_cursor = self.encode_cursor(object_list[-1])
+        return KeysetPage(object_list, next_cursor, cursor)
+
+
+class KeysetPaginationMixin:
+    """
+    Drop-in replacement for ``MultipleObjectMixin`` offset pagination.
+    The cursor is read from the ``cursor`` query parameter.
+    """
+    paginate_by = 50
+    cursor_kwarg = "cursor"
+    keyset_ordering = ("date_added", "id")
+
+    def paginate_queryset(self, queryset, page_size):
+        paginator = KeysetPaginator(queryset, page_size, ordering=self.keyset_ordering)
+        cursor = self.request.GET.get(self.cursor_kwarg) or None
+        try:
+            page = paginator.page(cursor)
+        except InvalidCursor:
+            raise Http404("Invalid cursor.")
+        return (paginator, page, page.object_list, page.has_other_pages())
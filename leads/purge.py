@@ -0,0 +1,91 @@
+import time
+
+from django.conf import settings
+from django.db.models import F
+from django.utils import timezone
+
+from .models import User, UserProfile, Agent, Lead, LeadDedupKey, leads_bulk_changed
+
+
+def _batches(queryset, batch_size, pause):
+    """
+    Primary keys of ``queryset``, ``batch_size`` at a time, until it is
+    empty. The caller must make each batch stop matching; the next batch
+    is fetched after sleeping ``pause`` seconds, so other writers get the
+    locks in between.
+    """
+    while True:
+        ids = list(queryset.order_by().values_list("pk", flat=True)[:batch_size])
+        if not ids:
+            return
+        yield ids
+        if len(ids) < batch_size:
+            return
+        time.sleep(pause)
+
+
+def _delete_leads(queryset, batch_size, pause):
+    """
+    Hard delete the leads of ``queryset`` in batches. Their counters,
+    statistics and history were updated when they were soft deleted (or
+    their organization is going away), and nothing but their dedup keys,
+    removed on soft delete, references a lead with a database constraint,
+    so this skips the collector, which would load every row just to send
+    their delete signals.
+    """
+    deleted = 0
+    for ids in _batches(queryset, batch_size, pause):
+        deleted += Lead.all_objects.filter(pk__in=ids)._raw_delete(queryset.db)
+    return deleted
+
+
+def purge_leads(batch_size=None, pause=None):
+    """Hard delete soft deleted leads. Returns how many were deleted."""
+    batch_size = batch_size or settings.PURGE_BATCH_SIZE
+    pause = settings.PURGE_BATCH_PAUSE if pause is None else pause
+    return _delete_leads(Lead.all_objects.filter(deleted_at__isnull=False), batch_size, pause)
+
+
+def purge_agents(batch_size=None, pause=None):
+    """
+    Unassign the leads of soft deleted agents in batches, then delete the
+    agents. Agents of offboarded organizations are left to
+    purge_organizations. Returns the number of agents deleted.
+    """
+    batch_size = batch_size or settings.PURGE_BATCH_SIZE
+    pause = settings.PURGE_BATCH_PAUSE if pause is None else pause
+    agents = Agent.all_objects.filter(deleted_at__isnull=False, organization__deleted_at__isnull=True)
+    purged = 0
+    for agent in agents:
+        for ids in _batches(Lead.all_objects.filter(agent=agent), batch_size, pause):
+            Lead.all_objects.filter(pk__in=ids).update(
+                agent=None, version=F("version") + 1, updated_at=timezone.now(),
+            )
+        leads_bulk_changed.send(sender=Lead, organization_id=agent.organization_id)
+        #no leads left to set to NULL, a single DELETE
+        agent.delete()
+        purged += 1
+    return purged
+
+
+def purge_organizations(batch_size=None, pause=None):
+    """
+    Delete offboarded organizations: their leads and agent users in
+    batches, then the organization, its categories and statistics, and
+    its organizer. Returns the number of organizations deleted.
+    """
+    batch_size = batch_size or settings.PURGE_BATCH_SIZE
+    pause = settings.PURGE_BATCH_PAUSE if pause is None else pause
+    purged = 0
+    for organization in UserProfile.all_objects.filter(deleted_at__isnull=False):
+        #its leads were never soft deleted one by one, so they still have keys
+        for ids in _batches(LeadDedupKey.objects.filter(organization=organization), batch_size, pause):
+            LeadDedupKey.objects.filter(pk__in=ids)._raw_delete(LeadDedupKey.objects.db)
+        _delete_leads(Lead.all_objects.filter(organization=organization), batch_size, pause)
+        #deleting the user deletes its agent
+        agent_users = User.objects.filter(agent__organization=organization)
+        for ids in _batches(agent_users, batch_size, pause):
+            User.objects.filter(pk__in=ids).delete()
+        User.objects.filter(pk=organization.user_id).delete()
+        purged += 1
+    return purged
@@ -0,0 +1,49 @@
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+
+_read_from_replica = ContextVar("read_from_replica", default=False)
+
+
+@contextmanager
+def use_replica():
+    """Send the reads made inside this block to the replica, if there is one."""
+    token = _read_from_replica.set(True)
+    try:
+        yield
+    finally:
+        _read_from_replica.reset(token)
+
+
+def replica_in_use():
+    """Whether reads in this context go to the replica."""
+    alias = settings.DATABASE_REPLICA_ALIAS
+    return alias is not None and _read_from_replica.get()
+
+
+class ReplicaRouter:
+    """
+    Route reads to the replica only while use_replica() is active, which
+    ReadReplicaMiddleware does for safe requests to views that opt in with
+    ``read_from_replica = True``. Everything else, writes included, stays on
+    the primary.
+    """
+
+    def db_for_read(self, model, **hints):
+        if replica_in_use():
+            return settings.DATABASE_REPLICA_ALIAS
+        return None
+
+    def db_for_write(self, model, **hints):
+        return "default"
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # the replica holds the same rows as the primary
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # replicas are migrated through replication, not by Django
+        if db == settings.DATABASE_REPLICA_ALIAS:
+            return False
+        return None
@@ -0,0 +1,204 @@
+import re
+
+from django.db import connections
+from django.db.models import BooleanField, FloatField, Q, Value
+from django.db.models.expressions import RawSQL
+
+# a query with at least this many digits is also looked up as a phone number
+PHONE_MIN_DIGITS = 4
+
+POSTGRES_SEARCH_SQL = [
+    "CREATE EXTENSION IF NOT EXISTS pg_trgm",
+    "CREATE EXTENSION IF NOT EXISTS btree_gin",
+    # a generated column is kept up to date by PostgreSQL itself, including
+    # for bulk_create() and queryset.update()
+    """
+    ALTER TABLE leads_lead ADD COLUMN search_vector tsvector GENERATED ALWAYS AS (
+        setweight(to_tsvector('simple', coalesce(first_name, '') || ' ' || coalesce(last_name, '')), 'A') ||
+        setweight(to_tsvector('simple', coalesce(email, '') || ' ' || coalesce(phone_number, '')), 'B') ||
+        setweight(to_tsvector('simple', coalesce(description, '')), 'C')
+    ) STORED
+    """,
+    # organization first so one index scan stays inside a single tenant
+    "CREATE INDEX lead_org_search_idx ON leads_lead USING gin (organization_id, search_vector)",
+    "CREATE INDEX lead_name_trgm_idx ON leads_lead USING gin ((first_name || ' ' || last_name) gin_trgm_ops)",
+]
+POSTGRES_DROP_SQL = [
+    "DROP INDEX IF EXISTS lead_name_trgm_idx",
+    "DROP INDEX IF EXISTS lead_org_search_idx",
+    "ALTER TABLE leads_lead DROP COLUMN IF EXISTS search_vector",
+]
+
+SQLITE_SEARCH_TABLE_SQL = """
+    CREATE VIRTUAL TABLE IF NOT EXISTS leads_lead_search USING fts5(
+        first_name, last_name, email, phone_number, description,
+        content='leads_lead', content_rowid='id', prefix='2 3'
+    )
+"""
+SQLITE_TRIGGER_SQL = [
+    """
+    CREATE TRIGGER IF NOT EXISTS leads_lead_search_insert AFTER INSERT ON leads_lead BEGIN
+        INSERT INTO leads_lead_search(rowid, first_name, last_name, email, phone_number, description)
+        VALUES (new.id, new.first_name, new.last_name, new.email, new.phone_number, new.description);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS leads_lead_search_delete AFTER DELETE ON leads_lead BEGIN
+        INSERT INTO leads_lead_search(leads_lead_search, rowid, first_name, last_name, email, phone_number, description)
+        VALUES ('delete', old.id, old.first_name, old.last_name, old.email, old.phone_number, old.description);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS leads_lead_search_update
+    AFTER UPDATE OF first_name, last_name, email, phone_number, description ON leads_lead BEGIN
+        INSERT INTO leads_lead_search(leads_lead_search, rowid, first_name, last_name, email, phone_number, description)
+        VALUES ('delete', old.id, old.first_name, old.last_name, old.email, old.phone_number, old.description);
+        INSERT INTO leads_lead_search(rowid, first_name, last_name, email, phone_number, description)
+        VALUES (new.id, new.first_name, new.last_name, new.email, new.phone_number, new.description);
+    END
+    """,
+]
+SQLITE_DROP_SQL = [
+    "DROP TRIGGER IF EXISTS leads_lead_search_update",
+    "DROP TRIGGER IF EXISTS leads_lead_search_delete",
+    "DROP TRIGGER IF EXISTS leads_lead_search_insert",
+    "DROP TABLE IF EXISTS leads_lead_search",
+]
+
+
+def normalize_phone(value):
+    """Digits only, so "+1 (555) 010-2030" and "15550102030" compare equal."""
+    return re.sub(r"\D", "", value or "")
+
+
+def _terms(query):
+    return re.findall(r"\w+", query.lower())
+
+
+def install_search(connection):
+    """Create the full-text search objects for this database, if supported."""
+    with connection.cursor() as cursor:
+        if connection.vendor == "postgresql":
+            for sql in POSTGRES_SEARCH_SQL:
+                cursor.execute(sql)
+        elif connection.vendor == "sqlite":
+            cursor.execute(
+                "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'leads_lead_search'"
+            )
+            created = cursor.fetchone() is None
+            cursor.execute(SQLITE_SEARCH_TABLE_SQL)
+            if created:
+                cursor.execute("INSERT INTO leads_lead_search(leads_lead_search) VALUES ('rebuild')")
+            install_sqlite_triggers(connection)
+
+
+def install_sqlite_triggers(connection):
+    """
+    SQLite drops a table's triggers whenever a migration rebuilds it, so
+    this runs again after every migrate (see LeadsConfig.ready).
+    """
+    if connection.vendor != "sqlite":
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'leads_lead_search'"
+        )
+        if cursor.fetchone() is None:
+            return
+        for sql in SQLITE_TRIGGER_SQL:
+            cursor.execute(sql)
+
+
+def uninstall_search(connection):
+    if connection.vendor == "postgresql":
+        statements = POSTGRES_DROP_SQL
+    elif connection.vendor == "sqlite":
+        statements = SQLITE_DROP_SQL
+    else:
+        return
+    with connection.cursor() as cursor:
+        for sql in statements:
+            cursor.execute(sql)
+
+
+def _postgres_search(queryset, query, terms, digits):
+    table = queryset.model._meta.db_table
+    # prefix matching on every term, "ann smi" finds "Anna Smith"
+    tsquery = " & ".join(f"{term}:*" for term in terms)
+    name = f"({table}.first_name || ' ' || {table}.last_name)"
+    conditions = [
+        (f"{table}.search_vector @@ to_tsquery('simple', %s)", [tsquery]),
+        # misspelled names, above pg_trgm.similarity_threshold (0.3 by default)
+        (f"{name} %% %s", [query]),
+    ]
+    ranks = [
+        (f"ts_rank({table}.search_vector, to_tsquery('simple', %s))", [tsquery]),
+        (f"similarity({name}, %s)", [query]),
+    ]
+    if digits:
+        conditions.append((f"{table}.phone_digits = %s", [digits]))
+        ranks.append((f"CASE WHEN {table}.phone_digits = %s THEN 1 ELSE 0 END", [digits]))
+    match = RawSQL(
+        "(%s)" % " OR ".join(sql for sql, _ in conditions),
+        [param for _, params in conditions for param in params],
+        output_field=BooleanField(),
+    )
+    # GREATEST of ts_rank and similarity is a float4; the cursor brings it
+    # back as a float8 that never equals it, so tied rows would be skipped
+    # or repeated between pages
+    rank = RawSQL(
+        "GREATEST(%s)::double precision" % ", ".join(sql for sql, _ in ranks),
+        [param for _, params in ranks for param in params],
+        output_field=FloatField(),
+    )
+    return queryset.filter(match).annotate(search_rank=rank)
+
+
+def _sqlite_search(queryset, query, terms, digits):
+    table = queryset.model._meta.db_table
+    # quoted prefix queries, so FTS5 operators typed by users are inert
+    match = " ".join('"%s"*' % term for term in terms)
+    matching = RawSQL(
+        "SELECT rowid FROM leads_lead_search WHERE leads_lead_search MATCH %s", [match]
+    )
+    condition = Q(pk__in=matching)
+    if digits:
+        condition |= Q(phone_digits=digits)
+    # bm25() is lower for better matches
+    rank = RawSQL(
+        "COALESCE((SELECT -bm25(leads_lead_search) FROM leads_lead_search "
+        f"WHERE leads_lead_search MATCH %s AND rowid = {table}.id), 0)"
+        + (f" + CASE WHEN {table}.phone_digits = %s THEN 1000.0 ELSE 0.0 END" if digits else ""),
+        [match, digits] if digits else [match],
+        output_field=FloatField(),
+    )
+    return queryset.filter(condition).annotate(search_rank=rank)
+
+
+def search_leads(queryset, query):
+    """
+    Filter a lead queryset to the matches for ``query`` and annotate them
+    with ``search_rank`` (higher is better). Order by ("-search_rank", "id")
+    for stable keyset pagination.
+    """
+    terms = _terms(query)
+    if not terms:
+        return queryset.none().annotate(search_rank=Value(0.0, output_field=FloatField()))
+    digits = normalize_phone(query)
+    if len(digits) < PHONE_MIN_DIGITS:
+        digits = ""
+    vendor = connections[queryset.db].vendor
+    if vendor == "postgresql":
+        return _postgres_search(queryset, query, terms, digits)
+    if vendor == "sqlite":
+        return _sqlite_search(queryset, query, terms, digits)
+    # no full-text index on other backends, fall back to a plain scan
+    condition = Q()
+    for term in terms:
+        condition &= (
+            Q(first_name__icontains=term) | Q(last_name__icontains=term)
+            | Q(email__icontains=term) | Q(description__icontains=term)
+        )
+    if digits:
+        condition |= Q(phone_digits=digits)
+    return queryset.filter(condition).annotate(search_rank=Value(0.0, output_field=FloatField()))
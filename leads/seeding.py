@@ -0,0 +1,211 @@
+import io
+import random
+
+from django.contrib.auth.hashers import make_password
+from django.db import connection, transaction
+
+from .models import User, UserProfile, Agent, Category, Lead, LeadDedupKey, OrganizationStat
+from .search import normalize_phone
+
+FIRST_NAMES = (
+    "Anna", "Ben", "Chloe", "David", "Emma", "Farid", "Grace", "Hiro", "Isla", "Jamal",
+    "Kara", "Liam", "Maya", "Noah", "Olga", "Priya", "Quinn", "Ravi", "Sara", "Tom",
+)
+LAST_NAMES = (
+    "Smith", "Jones", "Garcia", "Kim", "Nguyen", "Patel", "Brown", "Silva", "Muller", "Rossi",
+    "Khan", "Tanaka", "Lopez", "Wilson", "Ali", "Novak", "Cohen", "Dubois", "Olsen", "Park",
+)
+CATEGORY_NAMES = ("New", "Contacted", "Converted", "Unconverted", "Follow up")
+DESCRIPTIONS = (
+    "Asked for a demo.",
+    "Wants a quote for the annual plan.",
+    "Met at the trade fair.",
+    "Referred by an existing customer.",
+    "Downloaded the pricing sheet.",
+)
+
+
+def _copy_value(value):
+    """Format one value for COPY ... FROM STDIN in PostgreSQL's text format."""
+    if value is None:
+        return "\\N"
+    if value is True or value is False:
+        return "t" if value else "f"
+    return str(value).replace("\\", "\\\\").replace("\t", "\\t").replace("\n", "\\n").replace("\r", "\\r")
+
+
+class Seeder:
+    """
+    Generate organizations, agents, categories and leads in bulk.
+
+    User rows are inserted with bulk_create, so post_user_created_signal
+    never runs; the UserProfile rows it would create are inserted in bulk
+    as well. All users share one password hash, computed once. Leads go in
+    with COPY on PostgreSQL and executemany() elsewhere. The same ``seed``
+    always produces the same data.
+    """
+
+    def __init__(self, prefix="seed", password="password", seed=0, batch_size=2000, use_copy=None):
+        self.prefix = prefix
+        self.password_hash = make_password(password)
+        self.random = random.Random(seed)
+        self.batch_size = batch_size
+        if use_copy is None:
+            use_copy = connection.vendor == "postgresql"
+        self.use_copy = use_copy
+        self.created = {"users": 0, "agents": 0, "categories": 0, "leads": 0}
+
+    def organizer_username(self, org):
+        return f"{self.prefix}-org{org}"
+
+    def agent_username(self, org, agent):
+        return f"{self.prefix}-org{org}-agent{agent}"
+
+    def _users(self, usernames, is_organizer):
+        """Insert users in bulk and return {username: pk}."""
+        User.objects.bulk_create(
+            [
+                User(
+                    username=username, email=f"{username}@example.com",
+                    password=self.password_hash,
+                    is_organizer=is_organizer, is_agent=not is_organizer,
+                )
+                for username in usernames
+            ],
+            batch_size=self.batch_size,
+        )
+        self.created["users"] += len(usernames)
+        # SQLite's bulk_create does not return primary keys
+        pks = {}
+        for start in range(0, len(usernames), self.batch_size):
+            pks.update(User.objects.filter(
+                username__in=usernames[start:start + self.batch_size]
+            ).values_list("username", "pk"))
+        return pks
+
+    def lead(self, organization_id, agent_ids, category_ids):
+        """Column values of one lead, keyed by attname."""
+        first_name = self.random.choice(FIRST_NAMES)
+        last_name = self.random.choice(LAST_NAMES)
+        phone_number = "+1 555 %03d %04d" % (self.random.randrange(1000), self.random.randrange(10000))
+        # roughly one lead in five is waiting for an agent or a category
+        return {
+            "first_name": first_name,
+            "last_name": last_name,
+            "age": self.random.randint(18, 80),
+            "organization_id": organization_id,
+            "agent_id": self.random.choice(agent_ids) if agent_ids and self.random.random() > 0.2 else None,
+            "category_id": self.random.choice(category_ids) if category_ids and self.random.random() > 0.2 else None,
+            "description": self.random.choice(DESCRIPTIONS),
+            "phone_number": phone_number,
+            "phone_digits": normalize_phone(phone_number),
+            "email": f"{first_name}.{last_name}{self.random.randrange(10000)}@example.com".lower(),
+        }
+
+    def _lead_defaults(self, fields):
+        """
+        Database values for the columns lead() leaves out, computed once per
+        batch: "now" for auto_now(_add) fields, the field default otherwise.
+        """
+        defaults = {}
+        instance = Lead()
+        for field in fields:
+            value = field.pre_save(instance, add=True)
+            defaults[field.attname] = field.get_db_prep_save(value, connection)
+        return defaults
+
+    def _insert_leads(self, organization_id, count, agent_ids, category_ids):
+        """
+        Insert leads without building model instances, which is where
+        bulk_create spends most of its time: one executemany() per batch,
+        or one COPY on PostgreSQL.
+        """
+        fields = [f for f in Lead._meta.concrete_fields if not f.primary_key]
+        table = connection.ops.quote_name(Lead._meta.db_table)
+        columns = ", ".join(connection.ops.quote_name(f.column) for f in fields)
+        for start in range(0, count, self.batch_size):
+            defaults = self._lead_defaults(fields)
+            rows = []
+            for _ in range(min(self.batch_size, count - start)):
+                values = self.lead(organization_id, agent_ids, category_ids)
+                rows.append([values.get(f.attname, defaults[f.attname]) for f in fields])
+            with connection.cursor() as cursor:
+                if self.use_copy:
+                    buffer = io.StringIO()
+                    for row in rows:
+                        buffer.write("\t".join(_copy_value(value) for value in row))
+                        buffer.write("\n")
+                    buffer.seek(0)
+                    cursor.copy_expert(f"COPY {table} ({columns}) FROM STDIN", buffer)
+                else:
+                    placeholders = ", ".join(["%s"] * len(fields))
+                    cursor.executemany(f"INSERT INTO {table} ({columns}) VALUES ({placeholders})", rows)
+            self.created["leads"] += len(rows)
+
+    def seed_batch(self, orgs, agents, leads):
+        """Create the organizations numbered ``orgs`` in one transaction."""
+        with transaction.atomic():
+            organizers = self._users([self.organizer_username(org) for org in orgs], is_organizer=True)
+            UserProfile.objects.bulk_create(
+                [UserProfile(user_id=pk) for pk in organizers.values()], batch_size=self.batch_size,
+            )
+            organizations = dict(
+                UserProfile.objects.filter(user_id__in=organizers.values()).values_list("user_id", "pk")
+            )
+            organization_ids = [organizations[organizers[self.organizer_username(org)]] for org in orgs]
+            agent_users = self._users(
+                [self.agent_username(org, i) for org in orgs for i in range(agents)], is_organizer=False,
+            )
+            Agent.objects.bulk_create(
+                [
+                    Agent(user_id=agent_users[self.agent_username(org, i)], organization_id=organization_id)
+                    for org, organization_id in zip(orgs, organization_ids)
+                    for i in range(agents)
+                ],
+                batch_size=self.batch_size,
+            )
+            Category.objects.bulk_create(
+                [
+                    Category(name=name, organization_id=organization_id)
+                    for organization_id in organization_ids
+                    for name in CATEGORY_NAMES
+                ],
+                batch_size=self.batch_size,
+            )
+            self.created["agents"] += len(orgs) * agents
+            self.created["categories"] += len(orgs) * len(CATEGORY_NAMES)
+            agent_ids = {}
+            for pk, organization_id in Agent.objects.filter(
+                organization_id__in=organization_ids
+            ).order_by("pk").values_list("pk", "organization_id"):
+                agent_ids.setdefault(organization_id, []).append(pk)
+            category_ids = {}
+            for pk, organization_id in Category.objects.filter(
+                organization_id__in=organization_ids
+            ).order_by("pk").values_list("pk", "organization_id"):
+                category_ids.setdefault(organization_id, []).append(pk)
+            for organization_id in organization_ids:
+                self._insert_leads(
+                    organization_id, leads,
+                    agent_ids.get(organization_id, []), category_ids.get(organization_id, []),
+                )
+            Category.objects.filter(organization_id__in=organization_ids).recount_leads()
+            for organization_id in organization_ids:
+                OrganizationStat.objects.reconcile(organization_id)
+                #the raw inserts return no primary keys to index them by
+                LeadDedupKey.objects.index_missing(organization_id, self.batch_size)
+        return organization_ids
+
+    def seed(self, organizations, agents, leads, organizations_per_batch=100, progress=None):
+        """
+        Create ``organizations`` organizations, each with ``agents`` agents and
+        ``leads`` leads, and return their ids. ``progress`` is called with the
+        running totals after every batch.
+        """
+        organization_ids = []
+        for start in range(0, organizations, organizations_per_batch):
+            orgs = range(start, min(start + organizations_per_batch, organizations))
+            organization_ids += self.seed_batch(orgs, agents, leads)
+            if progress is not None:
+                progress(dict(self.created))
+        return organization_ids
@@ -0,0 +1,217 @@
+import json
+
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from leads.models import User, Agent, Category, Lead, OutboundEmail
+
+
+class ApiTest(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.organizer = User.objects.create_user(username="organizer", password="pass")
+        cls.organization = cls.organizer.userprofile
+        cls.agent_user = User.objects.create_user(
+            username="agent", email="agent@example.com", is_organizer=False, is_agent=True,
+        )
+        cls.agent = Agent.objects.create(user=cls.agent_user, organization=cls.organization)
+        cls.category = Category.objects.create(name="New", organization=cls.organization)
+        Lead.objects.bulk_create([
+            Lead(
+                first_name="Lead", last_name=str(i), organization=cls.organization,
+                agent=cls.agent if i % 2 else None, email="lead@example.com", phone_number="555", description="",
+            )
+            for i in range(7)
+        ])
+        cls.lead = Lead.objects.filter(agent=cls.agent).first()
+        other = User.objects.create_user(username="other").userprofile
+        cls.other_lead = Lead.objects.create(
+            first_name="Other", last_name="", organization=other, email="o@example.com",
+            phone_number="555", description="",
+        )
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(self.organizer)
+
+    def send(self, method, name, data, **kwargs):
+        return getattr(self.client, method)(
+            reverse(f"api-v1:{name}", kwargs=kwargs), json.dumps(data), content_type="application/json",
+        )
+
+    def test_requires_login(self):
+        self.client.logout()
+        response = self.client.get(reverse("api-v1:lead-list"))
+        self.assertEqual(response.status_code, 401)
+        self.assertEqual(response.json(), {"error": "Authentication required."})
+
+    def test_list_pages_with_cursors(self):
+        url = reverse("api-v1:lead-list")
+        seen = []
+        response = self.client.get(url, {"limit": 3, "fields": "id,last_name"})
+        while True:
+            data = response.json()
+            self.assertTrue(all(set(row) == {"id", "last_name"} for row in data["results"]))
+            seen += [row["last_name"] for row in data["results"]]
+            if data["next"] is None:
+                break
+            response = self.client.get(data["next"])
+        self.assertEqual(seen, [str(i) for i in range(7)])
+
+    def test_list_query_count(self):
+        url = reverse("api-v1:lead-list")
+        #session, the user with its tenant, one page of leads with the joined agent email
+        with self.assertNumQueries(3):
+            response = self.client.get(url, {"fields": "id,agent_email,category_name"})
+        self.assertEqual(response.json()["results"][1]["agent_email"], "agent@example.com")
+
+    def test_unknown_field(self):
+        response = self.client.get(reverse("api-v1:lead-list"), {"fields": "id,password"})
+        self.assertEqual(response.status_code, 400)
+
+    def test_agent_sees_own_leads(self):
+        self.client.force_login(self.agent_user)
+        ids = [row["id"] for row in self.client.get(reverse("api-v1:lead-list")).json()["results"]]
+        self.assertEqual(ids, list(Lead.objects.filter(agent=self.agent).order_by("date_added", "id").values_list("id", flat=True)))
+        self.assertEqual(self.client.get(reverse("api-v1:agent-list")).status_code, 403)
+
+    def test_detail_is_scoped(self):
+        response = self.client.get(reverse("api-v1:lead-detail", kwargs={"pk": self.other_lead.pk}))
+        self.assertEqual(response.status_code, 404)
+        self.assertEqual(response.json(), {"error": "Not found."})
+
+    @override_settings(SHARED_CACHE=True)
+    def test_etag(self):
+        url = reverse("api-v1:lead-detail", kwargs={"pk": self.lead.pk})
+        etag = self.client.get(url)["ETag"]
+        #session and the user with its tenant only
+        with self.assertNumQueries(2):
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.send("patch", "lead-detail", {"age": 40}, pk=self.lead.pk)
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["age"], 40)
+
+    def test_bulk_create(self):
+        response = self.send("post", "lead-list", [
+            {"first_name": "New", "last_name": str(i), "email": f"new{i}@example.com", "phone_number": "+1 555",
+             "description": "Notes", "category": self.category.pk}
+            for i in range(3)
+        ])
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.json()["created"], 3)
+        self.assertEqual(Lead.objects.filter(first_name="New", phone_digits="1555").count(), 3)
+        self.category.refresh_from_db()
+        self.assertEqual(self.category.lead_count, 3)
+        self.assertEqual(OutboundEmail.objects.count(), 1)
+
+    def test_bulk_create_is_all_or_nothing(self):
+        response = self.send("post", "lead-list", [
+            {"first_name": "New", "last_name": "Lead", "email": "new@example.com", "phone_number": "555", "description": "Notes"},
+            {"first_name": "Bad", "email": "not an email", "organization": 1},
+        ])
+        self.assertEqual(response.status_code, 400)
+        errors = response.json()["errors"]
+        self.assertEqual(set(errors), {"1"})
+        self.assertIn("email", errors["1"])
+        self.assertEqual(errors["1"]["organization"], ["This field cannot be written."])
+        self.assertFalse(Lead.objects.filter(first_name="New").exists())
+
+    def test_create_refuses_duplicates(self):
+        Lead.objects.create(
+            first_name="Ada", last_name="Lovelace", organization=self.organization,
+            email="ada@example.com", phone_number="555-0100", description="",
+        )
+        items = [
+            {"first_name": "Augusta", "last_name": "King", "email": "ADA@example.com", "phone_number": "555",
+             "description": "Notes"},
+            {"first_name": "Grace", "last_name": "Hopper", "email": "o@example.com", "phone_number": "555",
+             "description": "Notes"},
+            {"first_name": "Grace", "last_name": "Brewster", "email": "o@example.com", "phone_number": "555",
+             "description": "Notes"},
+        ]
+        response = self.send("post", "lead-list", items)
+        self.assertEqual(response.status_code, 400)
+        # other organizations' leads don't count, earlier items do
+        self.assertEqual(response.json()["errors"], {
+            "0": {"__all__": [f"Duplicate of lead {Lead.objects.get(first_name='Ada').pk}."]},
+            "2": {"__all__": ["Duplicate of item 1."]},
+        })
+        response = self.client.post(
+            reverse("api-v1:lead-list") + "?allow_duplicates=1", json.dumps(items), content_type="application/json",
+        )
+        self.assertEqual(response.json()["created"], 3)
+
+    def test_create_one(self):
+        response = self.send("post", "lead-list", {
+            "first_name": "One", "last_name": "Lead", "email": "one@example.com", "phone_number": "555",
+            "description": "Notes", "agent": self.agent.pk,
+        })
+        self.assertEqual(response.status_code, 201)
+        lead = Lead.objects.get(pk=response.json()["id"])
+        self.assertEqual((lead.organization, lead.agent), (self.organization, self.agent))
+
+    def test_bulk_update(self):
+        leads = list(Lead.objects.filter(organization=self.organization, agent__isnull=True)[:2])
+        response = self.send("patch", "lead-list", [
+            {"id": leads[0].pk, "agent": self.agent.pk, "version": 0},
+            {"id": leads[1].pk, "category": self.category.pk},
+        ])
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([row["version"] for row in response.json()["results"]], [1, 1])
+        self.assertEqual(Lead.objects.get(pk=leads[0].pk).agent, self.agent)
+        self.assertEqual(Lead.objects.get(pk=leads[1].pk).category, self.category)
+
+    def test_update_conflict(self):
+        other = Lead.objects.filter(organization=self.organization).exclude(pk=self.lead.pk).first()
+        Lead.objects.filter(pk=self.lead.pk).update(version=3)
+        response = self.send("patch", "lead-list", [
+            {"id": other.pk, "age": 50, "version": 0},
+            {"id": self.lead.pk, "age": 50, "version": 2},
+        ])
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(response.json()["index"], 1)
+        #all or nothing
+        self.assertEqual(Lead.objects.filter(age=50).count(), 0)
+
+    def test_agent_can_only_recategorize(self):
+        self.client.force_login(self.agent_user)
+        response = self.send("patch", "lead-detail", {"first_name": "Renamed"}, pk=self.lead.pk)
+        self.assertEqual(response.status_code, 400)
+        response = self.send("patch", "lead-detail", {"category": self.category.pk}, pk=self.lead.pk)
+        self.assertEqual(response.json()["category"], self.category.pk)
+        self.assertEqual(self.send("delete", "lead-detail", {}, pk=self.lead.pk).status_code, 403)
+
+    def test_delete_lead(self):
+        response = self.client.delete(reverse("api-v1:lead-detail", kwargs={"pk": self.lead.pk}))
+        self.assertEqual(response.status_code, 204)
+        self.assertFalse(Lead.objects.filter(pk=self.lead.pk).exists())
+        response = self.client.delete(reverse("api-v1:lead-detail", kwargs={"pk": self.other_lead.pk}))
+        self.assertEqual(response.status_code, 404)
+
+    def test_agents(self):
+        response = self.send("post", "agent-list", [
+            {"username": "new1", "email": "new1@example.com"},
+            {"username": "new2", "email": "new2@example.com", "first_name": "New"},
+        ])
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual([row["username"] for row in response.json()["results"]], ["new1", "new2"])
+        user = User.objects.get(username="new1")
+        self.assertTrue(user.is_agent and not user.has_usable_password())
+        self.assertEqual(OutboundEmail.objects.count(), 2)
+
+        agent_id = response.json()["results"][0]["id"]
+        response = self.send("patch", "agent-detail", {"last_name": "Renamed"}, pk=agent_id)
+        self.assertEqual(response.json()["last_name"], "Renamed")
+        response = self.send("post", "agent-list", {"username": "new1"})
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(self.client.delete(reverse("api-v1:agent-detail", kwargs={"pk": agent_id})).status_code, 204)
+        self.assertFalse(Agent.objects.filter(pk=agent_id).exists())
+
+    def test_categories(self):
+        response = self.client.get(reverse("api-v1:category-list") + "?fields=id,name,lead_count")
+        self.assertEqual(response.json()["results"], [{"id": self.category.pk, "name": "New", "lead_count": 0}])
+        self.assertEqual(self.send("post", "category-list", {"name": "x"}).status_code, 405)
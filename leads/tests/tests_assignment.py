@@ -0,0 +1,116 @@
+from django.shortcuts import reverse
+from django.test import TestCase
+
+from leads.assignment import (
+    CATEGORY_AFFINITY, LEAST_LOADED, ROUND_ROBIN, auto_assign, bulk_assign, plan_assignment,
+)
+from leads.models import User, Agent, Category, Lead
+
+
+class PlanAssignmentTest(TestCase):
+
+    def test_round_robin(self):
+        plan = plan_assignment([(i, None) for i in range(5)], {1: 10, 2: 0}, ROUND_ROBIN)
+        self.assertEqual(dict(plan), {1: [0, 2, 4], 2: [1, 3]})
+
+    def test_least_loaded_evens_out(self):
+        loads = {1: 3, 2: 0, 3: 1}
+        plan = plan_assignment([(i, None) for i in range(5)], loads, LEAST_LOADED)
+        self.assertEqual(loads, {1: 3, 2: 3, 3: 3})
+        self.assertEqual(len(plan[2]), 3)
+
+    def test_category_affinity_prefers_experienced_agents(self):
+        loads = {1: 5, 2: 0, 3: 4}
+        leads = [(10, 7), (11, 7), (12, None)]
+        plan = plan_assignment(leads, loads, CATEGORY_AFFINITY, {7: {1, 3}})
+        self.assertEqual(dict(plan), {3: [10], 1: [11], 2: [12]})
+
+
+class AssignmentTest(TestCase):
+
+    def setUp(self):
+        self.organizer = User.objects.create_user(username="organizer", password="pass")
+        self.organization = self.organizer.userprofile
+        self.agents = [
+            Agent.objects.create(
+                user=User.objects.create_user(username=f"agent{i}", is_organizer=False, is_agent=True),
+                organization=self.organization,
+            )
+            for i in range(3)
+        ]
+        self.category = Category.objects.create(name="New", organization=self.organization)
+        Lead.objects.bulk_create([
+            Lead(
+                first_name="Lead", last_name=str(i), organization=self.organization,
+                category=self.category, email="lead@example.com", phone_number="555",
+                description="",
+            )
+            for i in range(30)
+        ])
+        # another tenant's unassigned leads must not be touched
+        other = User.objects.create_user(username="other").userprofile
+        Lead.objects.create(
+            first_name="Other", last_name="", organization=other, email="o@example.com",
+            phone_number="555", description="",
+        )
+
+    def test_bulk_assign_is_one_update(self):
+        ids = list(Lead.objects.filter(organization=self.organization).values_list("pk", flat=True)[:20])
+        # the previous agents for the history, one UPDATE, then the category
+        # recount and the dashboard statistics reconcile (savepoint, lock,
+        # 2 aggregates, 1 insert, release) for the bulk change signal
+        with self.assertNumQueries(9):
+            self.assertEqual(bulk_assign(self.organization, ids, self.agents[0]), 20)
+        self.assertEqual(Lead.objects.filter(agent=self.agents[0]).count(), 20)
+
+    def test_auto_assign_least_loaded(self):
+        bulk_assign(self.organization, Lead.objects.filter(
+            organization=self.organization
+        ).values_list("pk", flat=True)[:6], self.agents[0])
+        # loads, unassigned ids, one UPDATE per agent, category recount,
+        # statistics reconcile (savepoint, lock, 2 aggregates, 3 writes, release)
+        with self.assertNumQueries(14):
+            assigned = auto_assign(self.organization, LEAST_LOADED)
+        self.assertEqual(assigned, {self.agents[0].pk: 4, self.agents[1].pk: 10, self.agents[2].pk: 10})
+        self.assertFalse(Lead.objects.filter(organization=self.organization, agent__isnull=True).exists())
+        self.assertTrue(Lead.objects.filter(first_name="Other", agent__isnull=True).exists())
+
+    def test_deleted_leads_are_no_load(self):
+        ids = Lead.objects.filter(organization=self.organization).order_by("pk").values_list("pk", flat=True)
+        bulk_assign(self.organization, ids[:6], self.agents[0])
+        for lead in Lead.objects.filter(pk__in=list(ids[:3])):
+            lead.soft_delete()
+        assigned = auto_assign(self.organization, LEAST_LOADED)
+        self.assertEqual(assigned, {self.agents[0].pk: 6, self.agents[1].pk: 9, self.agents[2].pk: 9})
+
+    def test_auto_assign_limit(self):
+        assigned = auto_assign(self.organization, ROUND_ROBIN, limit=4)
+        self.assertEqual(sum(assigned.values()), 4)
+
+    def test_bulk_assign_view(self):
+        self.client.force_login(self.organizer)
+        response = self.client.get(reverse("leads:bulk-assign"))
+        self.assertEqual(len(response.context["unassigned_leads"]), 30)
+        ids = [lead.pk for lead in response.context["unassigned_leads"][:5]]
+        response = self.client.post(reverse("leads:bulk-assign"), {
+            "agent": self.agents[1].pk, "leads": ids,
+        })
+        self.assertRedirects(response, reverse("leads:bulk-assign"))
+        self.assertEqual(Lead.objects.filter(agent=self.agents[1]).count(), 5)
+
+    def test_bulk_assign_view_rejects_other_tenants_leads(self):
+        self.client.force_login(self.organizer)
+        other_lead = Lead.objects.get(first_name="Other")
+        response = self.client.post(reverse("leads:bulk-assign"), {
+            "agent": self.agents[1].pk, "leads": [other_lead.pk],
+        })
+        self.assertEqual(response.status_code, 200)
+        self.assertIn("leads", response.context["form"].errors)
+
+    def test_auto_assign_view(self):
+        self.client.force_login(self.organizer)
+        response = self.client.post(reverse("leads:auto-assign"), {"strategy": ROUND_ROBIN})
+        self.assertRedirects(response, reverse("leads:bulk-assign"))
+        self.assertEqual(Lead.objects.filter(agent__isnull=False).count(), 30)
+        response = self.client.post(reverse("leads:auto-assign"), {"strategy": "bogus"})
+        self.assertIn("strategy", response.context["auto_assign_form"].errors)
@@ -0,0 +1,98 @@
+from functools import partial
+from unittest import mock
+
+from asgiref.sync import sync_to_async
+from django.core.cache import cache
+from django.test import AsyncClient, TransactionTestCase
+from django.urls import reverse
+
+from leads.models import User, Agent, Category, Lead
+
+
+class AsyncViewsTest(TransactionTestCase):
+    # committed rows, parts of the async request cycle run outside the
+    # test's thread and transaction
+
+    def setUp(self):
+        cache.clear()
+        # database_sync_to_async queries from pool threads, whose connections
+        # outlive the test and can still hold SQLite locks when the tables are
+        # flushed; run them on the test's own thread and connection instead
+        patcher = mock.patch(
+            "leads.async_views.database_sync_to_async", partial(sync_to_async, thread_sensitive=True)
+        )
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.organizer = User.objects.create_user(username="organizer", password="pass")
+        organization = self.organizer.userprofile
+        self.agent_user = User.objects.create_user(username="agent", is_organizer=False, is_agent=True)
+        self.agent = Agent.objects.create(user=self.agent_user, organization=organization)
+        category = Category.objects.create(name="New", organization=organization)
+        Lead.objects.bulk_create([
+            Lead(
+                first_name="Lead", last_name=str(i), organization=organization,
+                agent=self.agent if i % 2 else None, category=category if i % 3 else None,
+                email="lead@example.com", phone_number="555", description="",
+            )
+            for i in range(60)
+        ])
+        other = User.objects.create_user(username="other").userprofile
+        self.other_lead = Lead.objects.create(
+            first_name="Other", last_name="", organization=other, email="o@example.com",
+            phone_number="555", description="",
+        )
+        # force_login() is synchronous, log in before the async tests run
+        self.organizer_client = AsyncClient()
+        self.organizer_client.force_login(self.organizer)
+        self.agent_client = AsyncClient()
+        self.agent_client.force_login(self.agent_user)
+
+    async def test_lead_list_matches_the_sync_view(self):
+        client = self.organizer_client
+        response = await client.get(reverse("leads:lead-list-async"))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.context["leads"]), 30)
+        self.assertEqual(len(response.context["unassigned_leads"]), 30)
+        sync = await client.get(reverse("leads:lead-list"))
+        self.assertEqual(
+            [lead.pk for lead in response.context["leads"]],
+            [lead.pk for lead in sync.context["leads"]],
+        )
+
+    async def test_lead_list_for_agents(self):
+        response = await self.agent_client.get(reverse("leads:lead-list-async"))
+        self.assertEqual(len(response.context["leads"]), 30)
+        self.assertIsNone(response.context["unassigned_leads"])
+
+    async def test_invalid_cursor(self):
+        # Django 3.1's AsyncClient drops the data argument of get()
+        response = await self.organizer_client.get(reverse("leads:lead-list-async") + "?cursor=garbage")
+        self.assertEqual(response.status_code, 404)
+
+    async def test_anonymous_users_are_sent_to_login(self):
+        response = await AsyncClient().get(reverse("leads:lead-list-async"))
+        self.assertEqual(response.status_code, 302)
+        self.assertIn(reverse("login"), response.url)
+
+    async def test_lead_detail(self):
+        lead = await sync_to_async(Lead.objects.filter(agent__isnull=True).first)()
+        response = await self.organizer_client.get(reverse("leads:lead-detail-async", kwargs={"pk": lead.pk}))
+        self.assertEqual(response.context["lead"], lead)
+        # other organizations' leads, and for agents unassigned ones, are not found
+        response = await self.organizer_client.get(
+            reverse("leads:lead-detail-async", kwargs={"pk": self.other_lead.pk})
+        )
+        self.assertEqual(response.status_code, 404)
+        response = await self.agent_client.get(reverse("leads:lead-detail-async", kwargs={"pk": lead.pk}))
+        self.assertEqual(response.status_code, 404)
+
+    async def test_category_list(self):
+        response = await self.organizer_client.get(reverse("leads:category-list-async"))
+        self.assertEqual(response.context["unassigned_lead_count"], 20)
+        self.assertEqual(response.context["category_list"][0].lead_count, 40)
+
+    async def test_agent_list(self):
+        response = await self.organizer_client.get(reverse("agents:agent-list-async"))
+        self.assertEqual([agent.pk for agent in response.context["agents"]], [self.agent.pk])
+        response = await self.agent_client.get(reverse("agents:agent-list-async"))
+        self.assertRedirects(response, reverse("leads:lead-list"), fetch_redirect_response=False)
@@ -0,0 +1,65 @@
+import re
+from io import StringIO
+
+from django.core.management import call_command
+from django.shortcuts import reverse
+from django.test import TestCase
+
+from leads.backends import TenantModelBackend
+from leads.middleware import get_tenant
+from leads.models import User, Agent, OutboundEmail
+
+
+class TenantModelBackendTest(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.organizer = User.objects.create_user(username="organizer", password="pass")
+        cls.agent_user = User.objects.create_user(
+            username="agent", is_organizer=False, is_agent=True
+        )
+        cls.agent = Agent.objects.create(user=cls.agent_user, organization=cls.organizer.userprofile)
+
+    def test_tenant_comes_with_the_user(self):
+        backend = TenantModelBackend()
+        for user_id, role in ((self.organizer.pk, "organizer"), (self.agent_user.pk, "agent")):
+            user = backend.get_user(user_id)
+            with self.assertNumQueries(0):
+                tenant = get_tenant(user)
+                self.assertEqual(tenant.role, role)
+                self.assertEqual(tenant.organization, self.organizer.userprofile)
+
+    def test_deleted_agent_has_no_tenant(self):
+        self.agent.soft_delete()
+        user = TenantModelBackend().get_user(self.agent_user.pk)
+        with self.assertNumQueries(0):
+            self.assertFalse(get_tenant(user))
+
+    def test_inactive_users_are_not_loaded(self):
+        User.objects.filter(pk=self.agent_user.pk).update(is_active=False)
+        self.assertIsNone(TenantModelBackend().get_user(self.agent_user.pk))
+
+    def test_invitation_link_sets_the_password(self):
+        self.client.force_login(self.organizer)
+        self.client.post(reverse("agents:agent-create"), {
+            "email": "new@example.com", "username": "new", "first_name": "New", "last_name": "Agent",
+        })
+        user = User.objects.get(username="new")
+        self.assertFalse(user.has_usable_password())
+        self.client.logout()
+
+        message = OutboundEmail.objects.get(recipients=["new@example.com"]).message
+        link = re.search(r"http://testserver(/\S+)", message).group(1)
+        response = self.client.get(link, follow=True)
+        self.assertEqual(response.status_code, 200)
+        response = self.client.post(response.redirect_chain[-1][0], {
+            "new_password1": "a-long-new-password", "new_password2": "a-long-new-password",
+        })
+        self.assertEqual(response.status_code, 302)
+        self.assertTrue(self.client.login(username="new", password="a-long-new-password"))
+
+    def test_benchmark(self):
+        out = StringIO()
+        call_command("benchmark_auth", "organizer", "--requests", "2", stdout=out)
+        self.assertIn("cached sessions, user with tenant", out.getvalue())
+        self.assertIn("making an invitation token", out.getvalue())
@@ -0,0 +1,83 @@
+from io import StringIO
+
+from django.contrib.auth.hashers import check_password
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from leads.benchmarks import FlowBenchmark
+from leads.models import User, UserProfile, Agent, Category, Lead
+from leads.seeding import Seeder, _copy_value
+
+
+class SeederTest(TestCase):
+
+    def test_seed(self):
+        organization_ids = Seeder(prefix="t", seed=1, batch_size=7).seed(3, 3, 20, organizations_per_batch=2)
+        self.assertEqual(len(organization_ids), 3)
+        self.assertEqual(UserProfile.objects.count(), 3)
+        self.assertEqual(Agent.objects.filter(organization=organization_ids[0]).count(), 3)
+        self.assertEqual(Lead.objects.filter(organization=organization_ids[2]).count(), 20)
+        # agents never get a profile of their own
+        self.assertFalse(UserProfile.objects.filter(user__is_agent=True).exists())
+        organizer = User.objects.get(username="t-org0")
+        self.assertTrue(check_password("password", organizer.password))
+        for category in Category.objects.all():
+            self.assertEqual(category.lead_count, category.leads.count())
+        # every lead is filed for duplicate detection
+        self.assertFalse(Lead.objects.exclude(dedup_keys__isnull=False).exists())
+
+    def test_same_seed_same_data(self):
+        def leads(prefix):
+            organization_id, = Seeder(prefix=prefix, seed=5).seed(1, 2, 10)
+            return list(
+                Lead.objects.filter(organization=organization_id)
+                .order_by("pk").values_list("first_name", "last_name", "phone_number", "age")
+            )
+        self.assertEqual(leads("a"), leads("b"))
+
+
+class FlowBenchmarkTest(TestCase):
+
+    def test_every_step_is_reported(self):
+        organization_ids = Seeder(prefix="t").seed(1, 2, 10)
+        organizations = UserProfile.objects.filter(pk__in=organization_ids).select_related("user")
+        results = FlowBenchmark(organizations).run(iterations=2)
+        self.assertEqual(set(results), {
+            "login", "leads:lead-list", "leads:lead-detail", "leads:lead-create",
+            "leads:assign-agent", "leads:lead-category-update",
+        })
+        for row in results.values():
+            self.assertEqual(row["requests"], 2)
+            self.assertGreater(row["max_queries"], 0)
+            self.assertLessEqual(row["p50_ms"], row["p99_ms"])
+        # one new lead per flow, warmup included
+        self.assertEqual(Lead.objects.filter(first_name="Bench").count(), 3)
+
+    def test_failed_posts_stop_the_benchmark(self):
+        organization_id, = Seeder(prefix="t").seed(1, 2, 10)
+        organizer = UserProfile.objects.select_related("user").get(pk=organization_id).user
+        benchmark = FlowBenchmark([])
+        benchmark.client = Client()
+        benchmark.client.force_login(organizer)
+        # re-rendered with its errors, a 200
+        with self.assertRaisesMessage(AssertionError, "returned 200, not 302"):
+            benchmark.request("leads:lead-create", "post", reverse("leads:lead-create"), {"first_name": "x"})
+
+
+class SeedCrmCommandTest(TestCase):
+
+    def test_seed_crm(self):
+        out = StringIO()
+        call_command("seed_crm", "--organizations", "2", "--agents", "2", "--leads", "5", stdout=out)
+        self.assertIn("Seeded 2 organizations", out.getvalue())
+        self.assertEqual(Lead.objects.count(), 10)
+        with self.assertRaises(CommandError):
+            call_command("seed_crm", "--organizations", "1", stdout=out)
+
+    def test_copy_values(self):
+        self.assertEqual(_copy_value(None), "\\N")
+        self.assertEqual(_copy_value(True), "t")
+        self.assertEqual(_copy_value("a\tb\\c\nd"), "a\\tb\\\\c\\nd")
+        self.assertEqual(_copy_value(42), "42")
@@ -0,0 +1,117 @@
+from unittest import mock
+
+from django.core.cache import cache
+from django.db import connection
+from django.middleware.csrf import get_token
+from django.shortcuts import reverse
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.views.generic import ListView
+
+from leads.cache import get_tenant_version
+from leads.models import User, Agent, Category, Lead, leads_bulk_changed
+
+
+@override_settings(TENANT_VIEW_CACHE_TIMEOUT=300)
+class TenantCacheTest(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.organizer = User.objects.create_user(username="organizer", password="pass")
+        cls.other = User.objects.create_user(username="other", password="pass")
+        cls.agent_user = User.objects.create_user(
+            username="agent", is_organizer=False, is_agent=True
+        )
+        cls.agent = Agent.objects.create(user=cls.agent_user, organization=cls.organizer.userprofile)
+
+    def setUp(self):
+        cache.clear()
+
+    def create_lead(self, organization, **kwargs):
+        return Lead.objects.create(
+            first_name="Lead", last_name="", organization=organization, email="lead@example.com",
+            phone_number="555", description="", **kwargs
+        )
+
+    def get(self, user, name="leads:lead-list"):
+        self.client.force_login(user)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse(name))
+        return response, len(queries)
+
+    def test_second_hit_skips_view_queries(self):
+        self.create_lead(self.organizer.userprofile, agent=self.agent)
+        response, misses = self.get(self.organizer)
+        self.assertContains(response, "Lead")
+        response, hits = self.get(self.organizer)
+        self.assertContains(response, "Lead")
+        # only the session and user lookups remain, the tenant comes with the user
+        self.assertEqual(hits, 2)
+        self.assertLess(hits, misses)
+
+    def test_writes_invalidate_only_their_tenant(self):
+        organization = self.organizer.userprofile
+        other_organization = self.other.userprofile
+        self.get(self.organizer)
+        self.get(self.other)
+        other_version = get_tenant_version(other_organization.pk)
+
+        lead = self.create_lead(organization, agent=self.agent)
+        self.assertEqual(get_tenant_version(other_organization.pk), other_version)
+        response, _ = self.get(self.organizer)
+        # re-rendered, not served from the cache
+        self.assertIn(lead, response.context["leads"])
+        _, queries = self.get(self.other)
+        self.assertEqual(queries, 2)
+
+    def test_category_agent_and_bulk_writes_bump_version(self):
+        organization = self.organizer.userprofile
+        for write in (
+            lambda: Category.objects.create(name="New", organization=organization),
+            lambda: self.agent.save(),
+            lambda: leads_bulk_changed.send(sender=Lead, organization_id=organization.pk),
+            lambda: Category.objects.get(name="New").delete(),
+        ):
+            version = get_tenant_version(organization.pk)
+            write()
+            self.assertGreater(get_tenant_version(organization.pk), version)
+
+    def test_roles_are_cached_separately(self):
+        self.create_lead(self.organizer.userprofile, agent=None)
+        response, _ = self.get(self.organizer)
+        self.assertContains(response, "Unassigned leads")
+        response, _ = self.get(self.agent_user)
+        self.assertNotContains(response, "Unassigned leads")
+
+    def test_hits_keep_the_response_headers(self):
+        list_get = ListView.get
+
+        def get(view, request, *args, **kwargs):
+            response = list_get(view, request, *args, **kwargs)
+            response["Content-Language"] = "en"
+            return response
+
+        with mock.patch.object(ListView, "get", get):
+            self.get(self.organizer, "leads:category-list")
+        response, queries = self.get(self.organizer, "leads:category-list")
+        self.assertEqual(queries, 2)
+        self.assertEqual(response["Content-Language"], "en")
+        self.assertEqual(response["Content-Type"], "text/html; charset=utf-8")
+
+    def test_pages_with_a_csrf_token_are_not_cached(self):
+        list_get = ListView.get
+
+        def get(view, request, *args, **kwargs):
+            get_token(request)
+            return list_get(view, request, *args, **kwargs)
+
+        with mock.patch.object(ListView, "get", get):
+            _, first = self.get(self.organizer, "leads:category-list")
+            _, second = self.get(self.organizer, "leads:category-list")
+        self.assertEqual(first, second)
+
+    @override_settings(TENANT_VIEW_CACHE_TIMEOUT=0)
+    def test_can_be_disabled(self):
+        _, first = self.get(self.organizer, "leads:category-list")
+        _, second = self.get(self.organizer, "leads:category-list")
+        self.assertEqual(first, second)
@@ -0,0 +1,73 @@
+from datetime import timedelta
+
+from django.core.cache import cache
+from django.db import connection
+from django.shortcuts import reverse
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from leads.assignment import bulk_assign
+from leads.models import User, Agent, Lead
+
+
+@override_settings(SHARED_CACHE=True)
+class ConditionalGetTest(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.organizer = User.objects.create_user(username="organizer", password="pass")
+        cls.agent_user = User.objects.create_user(
+            username="agent", is_organizer=False, is_agent=True
+        )
+        cls.agent = Agent.objects.create(user=cls.agent_user, organization=cls.organizer.userprofile)
+        cls.lead = Lead.objects.create(
+            first_name="Lead", last_name="", organization=cls.organizer.userprofile,
+            email="lead@example.com", phone_number="555", description="",
+        )
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(self.organizer)
+
+    def test_matching_etag_returns_304_without_view_queries(self):
+        url = reverse("leads:lead-list")
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        etag = response["ETag"]
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response["ETag"], etag)
+        # only the session and the user lookup, which brings the tenant
+        self.assertEqual(len(queries), 2)
+
+    def test_writes_change_the_etag(self):
+        url = reverse("leads:lead-detail", kwargs={"pk": self.lead.pk})
+        etag = self.client.get(url)["ETag"]
+        self.lead.first_name = "Renamed"
+        self.lead.save()
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, "Renamed")
+        self.assertNotEqual(response["ETag"], etag)
+
+    def test_etag_differs_per_user(self):
+        url = reverse("leads:category-list")
+        etag = self.client.get(url)["ETag"]
+        self.client.force_login(self.agent_user)
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_headers(self):
+        response = self.client.get(reverse("agents:agent-detail", kwargs={"pk": self.agent.pk}))
+        self.assertIn("private", response["Cache-Control"])
+        self.assertIn("no-cache", response["Cache-Control"])
+        self.assertIn("Cookie", response["Vary"])
+        self.assertIn("Last-Modified", response)
+        self.assertNotIn("Last-Modified", self.client.get(reverse("agents:agent-list")))
+
+    def test_queryset_updates_maintain_updated_at(self):
+        Lead.objects.filter(pk=self.lead.pk).update(updated_at=timezone.now() - timedelta(days=1))
+        before = Lead.objects.get(pk=self.lead.pk).updated_at
+        bulk_assign(self.organizer.userprofile, [self.lead.pk], self.agent)
+        self.assertGreater(Lead.objects.get(pk=self.lead.pk).updated_at, before)
@@ -0,0 +1,48 @@
+from io import StringIO
+from unittest import mock
+
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, TransactionTestCase, override_settings
+
+from leads.db import check_connections
+from leads.models import User
+
+
+class CheckConnectionsTest(TestCase):
+
+    def test_unusable_connection_is_closed(self):
+        with mock.patch.object(connection, "in_atomic_block", False), \
+                mock.patch.object(connection, "is_usable", return_value=False), \
+                mock.patch.object(connection, "close") as close:
+            check_connections()
+        close.assert_called_once_with()
+
+    def test_healthy_connection_is_kept(self):
+        with mock.patch.object(connection, "in_atomic_block", False), \
+                mock.patch.object(connection, "is_usable", return_value=True), \
+                mock.patch.object(connection, "close") as close:
+            check_connections()
+        close.assert_not_called()
+
+    def test_connections_in_a_transaction_are_left_alone(self):
+        with mock.patch.object(connection, "is_usable") as is_usable:
+            check_connections()
+        is_usable.assert_not_called()
+
+    @override_settings(DB_CONN_HEALTH_CHECKS=False)
+    def test_disabled(self):
+        with mock.patch.object(connection, "in_atomic_block", False), \
+                mock.patch.object(connection, "is_usable") as is_usable:
+            check_connections()
+        is_usable.assert_not_called()
+
+
+class BenchmarkConnectionsCommandTest(TransactionTestCase):
+
+    def test_reports_both_runs(self):
+        User.objects.create_user(username="organizer", password="pass")
+        out = StringIO()
+        call_command("benchmark_connections", "organizer", "--requests", "3", stdout=out)
+        self.assertIn("new connection per request", out.getvalue())
+        self.assertIn("persistent connections", out.getvalue())
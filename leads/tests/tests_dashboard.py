@@ -0,0 +1,148 @@
+from io import StringIO
+
+from django.core.management import call_command
+from django.test import TestCase, TransactionTestCase
+from django.urls import reverse
+from django.utils import timezone
+
+from leads.assignment import bulk_assign
+from leads.models import User, Agent, Category, Lead, OrganizationStat
+
+
+def lead_stats(organization):
+    return {
+        (kind, key): count
+        for kind, key, count in OrganizationStat.objects.filter(
+            organization=organization
+        ).exclude(count=0).values_list("kind", "key", "count")
+    }
+
+
+class OrganizationStatTest(TestCase):
+
+    def setUp(self):
+        self.organizer = User.objects.create_user(username="organizer", password="pass")
+        self.organization = self.organizer.userprofile
+        agent_user = User.objects.create_user(username="agent", is_organizer=False, is_agent=True)
+        self.agent = Agent.objects.create(user=agent_user, organization=self.organization)
+        self.new = Category.objects.create(name="New", organization=self.organization)
+        self.contacted = Category.objects.create(name="Contacted", organization=self.organization)
+        self.today = timezone.localdate().isoformat()
+
+    def create_lead(self, **kwargs):
+        return Lead.objects.create(
+            first_name="Lead", last_name="", organization=self.organization,
+            email="lead@example.com", phone_number="555", description="", **kwargs
+        )
+
+    def expected(self, **stats):
+        return {
+            (kind, key): count
+            for (kind, key), count in {
+                ("total", ""): stats.get("total", 0),
+                ("unassigned", ""): stats.get("unassigned", 0),
+                ("agent", str(self.agent.pk)): stats.get("agent", 0),
+                ("category", str(self.new.pk)): stats.get("new", 0),
+                ("category", str(self.contacted.pk)): stats.get("contacted", 0),
+                ("category", ""): stats.get("uncategorized", 0),
+                ("day", self.today): stats.get("total", 0),
+            }.items()
+            if count
+        }
+
+    def test_create_assign_recategorize_delete(self):
+        lead = self.create_lead(category=self.new)
+        self.create_lead()
+        self.assertEqual(lead_stats(self.organization), self.expected(
+            total=2, unassigned=2, new=1, uncategorized=1,
+        ))
+        lead = Lead.objects.get(pk=lead.pk)
+        lead.agent = self.agent
+        lead.category = self.contacted
+        lead.save()
+        self.assertEqual(lead_stats(self.organization), self.expected(
+            total=2, unassigned=1, agent=1, contacted=1, uncategorized=1,
+        ))
+        lead.delete()
+        self.assertEqual(lead_stats(self.organization), self.expected(
+            total=1, unassigned=1, uncategorized=1,
+        ))
+
+    def test_save_with_update_fields(self):
+        lead = Lead.objects.get(pk=self.create_lead().pk)
+        lead.first_name = "Renamed"
+        lead.save(update_fields=["first_name"])
+        lead.category = self.new
+        lead.save(update_fields=["category"])
+        self.assertEqual(lead_stats(self.organization), self.expected(total=1, unassigned=1, new=1))
+
+    def test_save_of_deferred_lead_reconciles(self):
+        lead = Lead.objects.only("id", "organization").get(pk=self.create_lead().pk)
+        lead.agent = self.agent
+        lead.save(update_fields=["agent"])
+        self.assertEqual(lead_stats(self.organization), self.expected(total=1, agent=1, uncategorized=1))
+
+    def test_bulk_changes_reconcile(self):
+        leads = [self.create_lead() for _ in range(3)]
+        bulk_assign(self.organization, [lead.pk for lead in leads], self.agent)
+        self.assertEqual(lead_stats(self.organization), self.expected(total=3, agent=3, uncategorized=3))
+
+    def test_reconcile_fixes_drift(self):
+        self.create_lead(category=self.new)
+        OrganizationStat.objects.filter(kind="total").update(count=42)
+        OrganizationStat.objects.create(organization=self.organization, kind="agent", key="999", count=3)
+        OrganizationStat.objects.filter(kind="day").delete()
+        out = StringIO()
+        call_command("reconcile_dashboard_stats", stdout=out)
+        self.assertIn("Corrected 3 statistics.", out.getvalue())
+        self.assertEqual(lead_stats(self.organization), self.expected(total=1, unassigned=1, new=1))
+        self.assertEqual(OrganizationStat.objects.reconcile(self.organization.pk), 0)
+
+    def test_dashboard(self):
+        self.create_lead(category=self.new, agent=self.agent)
+        self.create_lead()
+        self.client.force_login(self.organizer)
+        response = self.client.get(reverse("leads:dashboard"))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context["total_leads"], 2)
+        self.assertEqual(response.context["unassigned_leads"], 1)
+        self.assertEqual(response.context["agent_rows"], [(self.agent, 1)])
+        self.assertEqual(response.context["category_rows"], [
+            ("Contacted", 0, 0), ("New", 1, 50.0), ("Uncategorized", 1, 50.0),
+        ])
+        self.assertEqual(response.context["day_rows"][-1], (timezone.localdate(), 2))
+
+    def test_dashboard_is_for_organizers(self):
+        self.client.force_login(self.agent.user)
+        response = self.client.get(reverse("leads:dashboard"))
+        self.assertRedirects(response, reverse("leads:lead-list"))
+
+
+class OrganizationStatDeleteTest(TransactionTestCase):
+
+    def test_deleting_an_agent_unassigns_its_leads(self):
+        organization = User.objects.create_user(username="organizer").userprofile
+        agent_user = User.objects.create_user(username="agent", is_organizer=False, is_agent=True)
+        agent = Agent.objects.create(user=agent_user, organization=organization)
+        Lead.objects.create(
+            first_name="Lead", last_name="", organization=organization, agent=agent,
+            email="lead@example.com", phone_number="555", description="",
+        )
+        agent_key = ("agent", str(agent.pk))
+        self.assertEqual(lead_stats(organization)[agent_key], 1)
+        agent.delete()
+        stats = lead_stats(organization)
+        self.assertEqual(stats[("unassigned", "")], 1)
+        self.assertNotIn(agent_key, stats)
+
+    def test_deleting_the_organization(self):
+        organizer = User.objects.create_user(username="organizer")
+        organization = organizer.userprofile
+        agent_user = User.objects.create_user(username="agent", is_organizer=False, is_agent=True)
+        Agent.objects.create(user=agent_user, organization=organization)
+        Lead.objects.create(
+            first_name="Lead", last_name="", organization=organization,
+            email="lead@example.com", phone_number="555", description="",
+        )
+        organizer.delete()
+        self.assertFalse(OrganizationStat.objects.exists())
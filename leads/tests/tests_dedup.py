@@ -0,0 +1,95 @@
+from io import StringIO
+
+from django.core.management import call_command
+from django.shortcuts import reverse
+from django.test import TestCase
+
+from leads.dedup import EMAIL, NAME, PHONE, blocking_keys, normalize_email, soundex
+from leads.models import User, Lead, LeadDedupKey
+
+
+class BlockingKeysTest(TestCase):
+
+    def test_normalization(self):
+        self.assertEqual(normalize_email(" Ada+crm@Example.COM "), "ada@example.com")
+        self.assertEqual([soundex(name) for name in ("Robert", "Rupert", "Ashcraft", "Lee", "")],
+                         ["R163", "R163", "A261", "L000", ""])
+        keys = dict(blocking_keys("Ada", "Lovelace", "ada@example.com", "+1 (555) 010-2030"))
+        self.assertEqual(keys[PHONE], "5550102030")
+        self.assertEqual(keys[NAME], "A300L142")
+        self.assertEqual(keys[EMAIL], dict(blocking_keys("", "", "ADA+x@example.com", ""))[EMAIL])
+        # nothing to file a lead under
+        self.assertEqual(blocking_keys("Ada", "", "not-an-email", "555"), [])
+
+
+class DedupTest(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.organizer = User.objects.create_user(username="organizer", password="pass")
+        cls.organization = cls.organizer.userprofile
+        cls.other = User.objects.create_user(username="other", password="pass").userprofile
+
+    def create_lead(self, first_name="Ada", email="ada@example.com", phone_number="555-0100", **kwargs):
+        kwargs.setdefault("organization", self.organization)
+        return Lead.objects.create(
+            first_name=first_name, last_name="Lovelace", email=email,
+            phone_number=phone_number, description="", **kwargs
+        )
+
+    def keys(self, lead):
+        return dict(LeadDedupKey.objects.filter(lead=lead).values_list("kind", "key"))
+
+    def test_keys_follow_the_lead(self):
+        lead = self.create_lead()
+        self.assertEqual(set(self.keys(lead)), {EMAIL, PHONE, NAME})
+        lead = Lead.objects.get(pk=lead.pk)
+        lead.phone_number = "555-0199"
+        lead.save_changes(["phone_number"])
+        self.assertEqual(self.keys(lead)[PHONE], "5550199")
+        lead.soft_delete()
+        self.assertEqual(self.keys(lead), {})
+
+    def test_create_view_refuses_duplicates(self):
+        self.create_lead(email="ada@example.com", phone_number="555-0100")
+        self.create_lead(organization=self.other, email="grace@example.com", phone_number="555-0102")
+        self.client.force_login(self.organizer)
+        data = {
+            "first_name": "Augusta", "last_name": "King", "age": 36, "description": "Maths",
+            "email": "ADA@example.com", "phone_number": "555 0101",
+        }
+        response = self.client.post(reverse("leads:lead-create"), data)
+        self.assertContains(response, "already exists")
+        # other organizations' leads don't count
+        response = self.client.post(reverse("leads:lead-create"), dict(
+            data, email="grace@example.com", phone_number="555-0102",
+        ))
+        self.assertEqual(response.status_code, 302)
+        response = self.client.post(reverse("leads:lead-create"), dict(data, allow_duplicate="on"))
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(Lead.objects.filter(organization=self.organization).count(), 3)
+
+    def test_find_and_merge_duplicates(self):
+        ada = self.create_lead(age=0)
+        # same email as ada, same phone as the next one
+        same_email = self.create_lead(first_name="Adah", phone_number="555-0200", age=36)
+        same_phone = self.create_lead(first_name="Countess", email="countess@example.com", phone_number="555-0200")
+        unrelated = self.create_lead(first_name="Grace", email="grace@example.com", phone_number="555-0300")
+        LeadDedupKey.objects.all().delete()
+
+        out = StringIO()
+        call_command("find_duplicate_leads", stdout=out)
+        self.assertIn(f"leads {ada.pk}, {same_email.pk}, {same_phone.pk}\n", out.getvalue())
+        self.assertIn("1 groups, 2 duplicate leads.", out.getvalue())
+        # rebuilt from the leads, nothing merged yet
+        self.assertEqual(Lead.objects.count(), 4)
+
+        out = StringIO()
+        call_command("find_duplicate_leads", "--by", "name", stdout=out)
+        self.assertIn("1 groups, 1 duplicate leads.", out.getvalue())
+
+        call_command("find_duplicate_leads", "--merge", stdout=StringIO())
+        self.assertEqual(set(Lead.objects.values_list("pk", flat=True)), {ada.pk, unrelated.pk})
+        ada.refresh_from_db()
+        self.assertEqual(ada.age, 36)
+        self.assertEqual(LeadDedupKey.objects.filter(lead__in=[same_email, same_phone]).count(), 0)
@@ -0,0 +1,153 @@
+import unittest
+from datetime import date, datetime, timedelta
+from io import StringIO
+from types import SimpleNamespace
+from unittest import mock
+
+from django.core.management import call_command
+from django.core.signals import request_finished, request_started
+from django.db import connection, transaction
+from django.test import TransactionTestCase
+from django.urls import reverse
+from django.utils import timezone
+
+from leads.assignment import bulk_assign
+from leads.events import month_start, partition_name, reset_request, set_request
+from leads.models import User, Agent, Category, Lead, LeadEvent
+from leads.views import LeadTimelineView
+
+
+class LeadEventTest(TransactionTestCase):
+
+    def setUp(self):
+        self.organizer = User.objects.create_user(username="organizer", password="pass")
+        self.organization = self.organizer.userprofile
+        self.agent_user = User.objects.create_user(username="agent", is_organizer=False, is_agent=True)
+        self.agent = Agent.objects.create(user=self.agent_user, organization=self.organization)
+        self.category = Category.objects.create(name="New", organization=self.organization)
+        self.lead = Lead.objects.create(
+            first_name="Lead", last_name="One", organization=self.organization,
+            email="lead@example.com", phone_number="555", description="",
+        )
+
+    def kinds(self, lead=None):
+        return list(LeadEvent.objects.filter(lead=lead or self.lead).order_by("id").values_list("kind", flat=True))
+
+    def test_views_record_history_with_the_actor(self):
+        self.client.force_login(self.organizer)
+        self.client.post(reverse("leads:assign-agent", kwargs={"pk": self.lead.pk}), {"agent": self.agent.pk})
+        self.client.post(reverse("leads:lead-category-update", kwargs={"pk": self.lead.pk}), {
+            "category": self.category.pk,
+        })
+        self.assertEqual(self.kinds(), ["created", "assigned", "categorized"])
+        assigned = LeadEvent.objects.get(kind="assigned")
+        self.assertEqual(assigned.actor, self.organizer)
+        self.assertEqual(assigned.changes, {"agent": [None, self.agent.pk]})
+        self.assertEqual(
+            LeadEvent.objects.get(kind="categorized").changes, {"category": [None, self.category.pk]}
+        )
+
+    def test_field_changes(self):
+        lead = Lead.objects.get(pk=self.lead.pk)
+        lead.first_name = "Renamed"
+        lead.age = 40
+        lead.save()
+        lead.save()
+        event = LeadEvent.objects.get(kind="updated")
+        self.assertEqual(event.changes, {"first_name": ["Lead", "Renamed"], "age": [0, 40]})
+        self.assertIsNone(event.actor)
+        lead.delete()
+        self.assertEqual(self.kinds(), ["created", "updated", "deleted"])
+
+    def test_bulk_assign(self):
+        bulk_assign(self.organization, [self.lead.pk], self.agent)
+        self.assertEqual(LeadEvent.objects.get(kind="assigned").changes, {"agent": [None, self.agent.pk]})
+
+    def test_buffered_until_the_request_finishes(self):
+        request_started.send(sender=self.__class__)
+        try:
+            Lead.objects.filter(pk=self.lead.pk).first().delete()
+            self.assertEqual(self.kinds(), ["created"])
+        finally:
+            request_finished.send(sender=self.__class__)
+        self.assertEqual(self.kinds(), ["created", "deleted"])
+
+    def test_rolled_back_changes_are_not_logged(self):
+        with self.assertRaises(RuntimeError):
+            with transaction.atomic():
+                Lead.objects.get(pk=self.lead.pk).delete()
+                raise RuntimeError
+        self.assertEqual(self.kinds(), ["created"])
+
+    def test_timeline(self):
+        lead = Lead.objects.get(pk=self.lead.pk)
+        for age in range(1, 4):
+            lead.age = age
+            lead.save()
+        self.client.force_login(self.organizer)
+        url = reverse("leads:lead-timeline", kwargs={"pk": self.lead.pk})
+        with mock.patch.object(LeadTimelineView, "paginate_by", 3):
+            response = self.client.get(url)
+            self.assertEqual([event.changes.get("age") for event in response.context["events"]], [
+                [2, 3], [1, 2], [0, 1],
+            ])
+            response = self.client.get(url, {"cursor": response.context["page_obj"].next_cursor})
+        self.assertEqual([event.kind for event in response.context["events"]], ["created"])
+        self.assertFalse(response.context["page_obj"].has_next())
+
+    def test_timeline_is_scoped_to_the_tenant(self):
+        other = User.objects.create_user(username="other")
+        self.client.force_login(other)
+        response = self.client.get(reverse("leads:lead-timeline", kwargs={"pk": self.lead.pk}))
+        self.assertEqual(response.status_code, 404)
+        # agents only see the history of their own leads
+        self.client.force_login(self.agent_user)
+        response = self.client.get(reverse("leads:lead-timeline", kwargs={"pk": self.lead.pk}))
+        self.assertEqual(response.status_code, 404)
+
+    def test_activity(self):
+        token = set_request(SimpleNamespace(user=self.agent_user))
+        try:
+            lead = Lead.objects.get(pk=self.lead.pk)
+            lead.category = self.category
+            lead.save()
+        finally:
+            reset_request(token)
+        since = timezone.now() - timedelta(days=1)
+        self.assertEqual(LeadEvent.objects.activity(self.agent_user, since), {"categorized": 1})
+        self.assertEqual(LeadEvent.objects.activity(self.agent_user, since, until=since), {})
+
+    def test_retention(self):
+        LeadEvent.objects.filter(lead=self.lead).update(created_at=timezone.now() - timedelta(days=800))
+        out = StringIO()
+        call_command("manage_event_partitions", "--retain-months", "24", stdout=out)
+        self.assertFalse(LeadEvent.objects.exists())
+
+    @unittest.skipUnless(connection.vendor == "postgresql", "events are only partitioned on PostgreSQL")
+    def test_events_after_the_last_partition_get_one(self):
+        month = month_start(timezone.localdate(), 12)
+        LeadEvent.objects.filter(lead=self.lead).update(
+            created_at=timezone.make_aware(datetime(month.year, month.month, 15))
+        )
+        self.addCleanup(self.drop_partition, partition_name(month))
+
+        def partitions():
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    "SELECT DISTINCT tableoid::regclass::text FROM leads_leadevent WHERE lead_id = %s",
+                    [self.lead.pk],
+                )
+                return {row[0] for row in cursor.fetchall()}
+
+        self.assertEqual(partitions(), {"leads_leadevent_default"})
+        call_command("manage_event_partitions", stdout=StringIO())
+        self.assertEqual(partitions(), {partition_name(month)})
+        self.assertTrue(LeadEvent.objects.filter(lead=self.lead).exists())
+
+    def drop_partition(self, name):
+        with connection.cursor() as cursor:
+            cursor.execute(f"DROP TABLE IF EXISTS {name}")
+
+    def test_month_start(self):
+        self.assertEqual(month_start(date(2026, 12, 31), 1), date(2027, 1, 1))
+        self.assertEqual(month_start(date(2026, 1, 15), -1), date(2025, 12, 1))
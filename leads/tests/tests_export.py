@@ -0,0 +1,62 @@
+import csv
+from io import StringIO
+
+from django.core.management import call_command
+from django.shortcuts import reverse
+from django.test import TestCase
+
+from leads.models import User, Agent, Category, Lead
+
+
+class LeadExportTest(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.organizer = User.objects.create_user(username="organizer", password="pass")
+        organization = cls.organizer.userprofile
+        cls.agent_user = User.objects.create_user(
+            username="agent", email="agent@example.com", is_organizer=False, is_agent=True
+        )
+        agent = Agent.objects.create(user=cls.agent_user, organization=organization)
+        category = Category.objects.create(name="New", organization=organization)
+        other = User.objects.create_user(username="other").userprofile
+        def lead(organization, agent=None, category=None):
+            return Lead(
+                first_name="Lead", last_name="", organization=organization, agent=agent,
+                category=category, email="lead@example.com", phone_number="555",
+                description="Line one\nline two, with a comma",
+            )
+        Lead.objects.bulk_create(
+            [lead(organization, agent, category)] * 7
+            + [lead(organization)] * 3
+            + [lead(other)] * 4
+        )
+
+    def read_csv(self, response):
+        self.assertEqual(response["Content-Type"], "text/csv")
+        return list(csv.DictReader(StringIO(b"".join(response.streaming_content).decode())))
+
+    def test_organizer_exports_whole_organization(self):
+        self.client.force_login(self.organizer)
+        rows = self.read_csv(self.client.get(reverse("leads:lead-export")))
+        self.assertEqual(len(rows), 10)
+        self.assertEqual(rows[0]["description"], "Line one\nline two, with a comma")
+        self.assertEqual(sum(row["category"] == "New" for row in rows), 7)
+        self.assertEqual(sum(row["agent"] == "agent@example.com" for row in rows), 7)
+
+    def test_agent_exports_own_leads(self):
+        self.client.force_login(self.agent_user)
+        rows = self.read_csv(self.client.get(reverse("leads:lead-export")))
+        self.assertEqual(len(rows), 7)
+
+    def test_rows_are_fetched_in_chunks(self):
+        self.client.force_login(self.organizer)
+        response = self.client.get(reverse("leads:lead-export"))
+        # nothing is read from the leads table until the body is consumed
+        with self.assertNumQueries(1):
+            self.assertEqual(len(list(response.streaming_content)), 11)
+
+    def test_command(self):
+        stdout = StringIO()
+        call_command("export_leads", "organizer", stdout=stdout)
+        self.assertEqual(len(list(csv.DictReader(StringIO(stdout.getvalue())))), 10)
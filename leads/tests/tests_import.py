@@ -0,0 +1,100 @@
+import io
+import os
+import tempfile
+from io import StringIO
+
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.shortcuts import reverse
+from django.test import TestCase
+
+from leads.importers import import_leads
+from leads.models import User, Agent, Category, Lead, OutboundEmail
+
+CSV = (
+    "First Name,Last Name,Age,Description,Email,Phone Number,Agent,Category\n"
+    "Ada,Lovelace,36,Maths,ada@example.com,555-0100,agent,New\n"
+    "Alan,Turing,41,Codes,alan@example.com,555-0101,agent@example.com,\n"
+    "Grace,Hopper,,Compilers,grace@example.com,555-0102,,new\n"
+    "Bad,Email,30,Oops,not-an-email,555-0103,,\n"
+    "Who,Knows,30,Unknown agent,who@example.com,555-0104,nobody,\n"
+)
+
+
+class LeadImportTest(TestCase):
+
+    def setUp(self):
+        self.organizer = User.objects.create_user(
+            username="organizer", password="pass", email="organizer@example.com"
+        )
+        self.organization = self.organizer.userprofile
+        agent_user = User.objects.create_user(
+            username="agent", email="agent@example.com", is_organizer=False, is_agent=True
+        )
+        self.agent = Agent.objects.create(user=agent_user, organization=self.organization)
+        self.category = Category.objects.create(name="New", organization=self.organization)
+
+    def test_import_validates_resolves_and_batches(self):
+        upload = SimpleUploadedFile("leads.csv", CSV.encode())
+        # 2 lookup queries, a duplicate check and an insert per batch, 2 for
+        # the dedup keys, 1 category recount, 6 for the statistics
+        # reconcile, 1 summary email
+        with self.assertNumQueries(16):
+            result = import_leads(self.organization, upload, "leads.csv", batch_size=1)
+        self.assertEqual((result.created, result.rejected), (2, 3))
+        self.assertEqual([line for line, _ in result.errors], [4, 5, 6])
+        upload = SimpleUploadedFile("leads.csv", CSV.replace("Hopper,,", "Hopper,85,").encode())
+        result = import_leads(self.organization, upload, "leads.csv", batch_size=2)
+        # Ada and Alan are already there
+        self.assertEqual((result.created, result.rejected), (1, 4))
+        self.assertEqual(result.errors[0], (2, {"__all__": [f"Duplicate of lead {Lead.objects.get(first_name='Ada').pk}."]}))
+
+        ada = Lead.objects.filter(first_name="Ada").first()
+        self.assertEqual((ada.agent, ada.category), (self.agent, self.category))
+        self.assertEqual(Lead.objects.filter(first_name="Alan").first().agent, self.agent)
+        self.category.refresh_from_db()
+        self.assertEqual(self.category.lead_count, 2)
+        self.assertEqual(OutboundEmail.objects.count(), 2)
+
+    def test_import_xlsx(self):
+        try:
+            import openpyxl
+        except ImportError:
+            self.skipTest("openpyxl is not installed")
+        workbook = openpyxl.Workbook()
+        for line in CSV.splitlines():
+            workbook.active.append(line.split(","))
+        fileobj = io.BytesIO()
+        workbook.save(fileobj)
+        fileobj.seek(0)
+        result = import_leads(self.organization, fileobj, "leads.xlsx", notify=False)
+        self.assertEqual((result.created, result.rejected), (2, 3))
+
+    def test_import_view(self):
+        self.client.force_login(self.organizer)
+        response = self.client.post(reverse("leads:lead-import"), {
+            "file": SimpleUploadedFile("leads.csv", CSV.encode()),
+        })
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context["result"].created, 2)
+        self.assertEqual(Lead.objects.filter(organization=self.organization).count(), 2)
+
+    def test_import_view_rejects_unknown_file_type(self):
+        self.client.force_login(self.organizer)
+        response = self.client.post(reverse("leads:lead-import"), {
+            "file": SimpleUploadedFile("leads.txt", CSV.encode()),
+        })
+        self.assertFormError(response, "form", "file", "Unsupported file type '.txt', expected .csv or .xlsx.")
+
+    def test_command(self):
+        with tempfile.NamedTemporaryFile("w", suffix=".csv", delete=False) as f:
+            f.write(CSV)
+        self.addCleanup(os.remove, f.name)
+        stdout, stderr = StringIO(), StringIO()
+        call_command(
+            "import_leads", f.name, organizer="organizer", no_notify=True,
+            stdout=stdout, stderr=stderr,
+        )
+        self.assertIn("2 leads imported, 3 rows rejected", stdout.getvalue())
+        self.assertIn("Row 6: agent: Unknown agent 'nobody'.", stderr.getvalue())
+        self.assertEqual(OutboundEmail.objects.count(), 0)
@@ -0,0 +1,56 @@
+from django.core.cache import cache
+from django.shortcuts import reverse
+from django.test import TestCase, override_settings
+
+from leads.instrumentation import QueryBudgetExceeded, RequestStats, request_stats
+from leads.models import User
+
+
+class RequestStatsTest(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        request_stats.reset()
+        self.organizer = User.objects.create_user(username="organizer", password="pass")
+        self.client.force_login(self.organizer)
+
+    def test_records_per_view_samples(self):
+        for _ in range(3):
+            self.client.get(reverse("leads:lead-list"))
+        self.client.get(reverse("leads:category-list"))
+        stats = request_stats.snapshot()
+        self.assertEqual(set(stats), {"leads:lead-list", "leads:category-list"})
+        lead_list = stats["leads:lead-list"]
+        self.assertEqual(lead_list["requests"], 3)
+        self.assertGreater(lead_list["queries"]["p50"], 0)
+        self.assertGreater(lead_list["template_time"]["max"], 0)
+        self.assertGreaterEqual(lead_list["wall_time"]["p99"], lead_list["template_time"]["p99"])
+
+    @override_settings(QUERY_BUDGETS={"leads:lead-list": 1}, QUERY_BUDGET_ACTION="raise")
+    def test_budget_raises(self):
+        with self.assertRaises(QueryBudgetExceeded):
+            self.client.get(reverse("leads:lead-list"))
+
+    @override_settings(QUERY_BUDGETS={"leads:lead-list": 1}, QUERY_BUDGET_ACTION="log")
+    def test_budget_logs(self):
+        with self.assertLogs("leads.middleware", "WARNING"):
+            response = self.client.get(reverse("leads:lead-list"))
+        self.assertEqual(response.status_code, 200)
+
+    def test_stats_endpoint_is_staff_only(self):
+        self.client.get(reverse("leads:lead-list"))
+        response = self.client.get(reverse("request-stats"))
+        self.assertEqual(response.status_code, 302)
+        User.objects.filter(pk=self.organizer.pk).update(is_staff=True)
+        response = self.client.get(reverse("request-stats"))
+        self.assertEqual(response.status_code, 200)
+        self.assertIn("leads:lead-list", response.json())
+
+    def test_window_is_bounded(self):
+        stats = RequestStats(window=10)
+        for i in range(100):
+            stats.record("view", queries=i, db_time=0, template_time=0, wall_time=0)
+        view = stats.snapshot()["view"]
+        self.assertEqual((view["requests"], view["window"]), (100, 10))
+        self.assertEqual(view["queries"]["p50"], 94)
+        self.assertEqual(view["queries"]["max"], 99)
@@ -0,0 +1,117 @@
+import smtplib
+from io import StringIO
+from datetime import timedelta
+
+from django.core import mail
+from django.core.mail.backends.locmem import EmailBackend
+from django.core.management import call_command
+from django.shortcuts import reverse
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from leads.mail import claim_due_mail, enqueue_mail, send_queued_mail
+from leads.models import User, OutboundEmail
+
+
+class FlakyBackend(EmailBackend):
+    """locmem backend that refuses every message."""
+
+    def send_messages(self, messages):
+        raise smtplib.SMTPRecipientsRefused({})
+
+
+class UnreachableBackend(EmailBackend):
+    """locmem backend whose server can't be reached."""
+
+    def open(self):
+        raise ConnectionRefusedError("Connection refused")
+
+
+class CrashingBackend(EmailBackend):
+    """locmem backend whose worker dies on the second message."""
+
+    def send_messages(self, messages):
+        if mail.outbox:
+            raise RuntimeError("worker killed")
+        return super().send_messages(messages)
+
+
+class OutboxTest(TestCase):
+
+    def test_enqueue_does_not_send(self):
+        enqueue_mail("Subject", "Body", "from@example.com", ["to@example.com"])
+        self.assertEqual(len(mail.outbox), 0)
+        self.assertEqual(OutboundEmail.objects.filter(status=OutboundEmail.QUEUED).count(), 1)
+
+    def test_send_queued_mail_delivers_batch(self):
+        for i in range(3):
+            enqueue_mail("Subject %s" % i, "Body", "from@example.com", ["to@example.com"])
+        self.assertEqual(send_queued_mail(batch_size=2), (2, 0))
+        self.assertEqual(send_queued_mail(batch_size=2), (1, 0))
+        self.assertEqual(send_queued_mail(batch_size=2), (0, 0))
+        self.assertEqual([m.subject for m in mail.outbox], ["Subject 0", "Subject 1", "Subject 2"])
+        self.assertFalse(OutboundEmail.objects.exclude(status=OutboundEmail.SENT).exists())
+
+    @override_settings(OUTBOX_MAX_ATTEMPTS=2, OUTBOX_RETRY_BACKOFF=60)
+    def test_failures_back_off_then_give_up(self):
+        email = enqueue_mail("Subject", "Body", "from@example.com", ["to@example.com"])
+        self.assertEqual(send_queued_mail(connection=FlakyBackend()), (0, 1))
+        email.refresh_from_db()
+        self.assertEqual((email.status, email.attempts), (OutboundEmail.QUEUED, 1))
+        self.assertGreater(email.next_attempt_at, timezone.now() + timedelta(seconds=50))
+        #not due yet
+        self.assertEqual(send_queued_mail(connection=FlakyBackend()), (0, 0))
+        OutboundEmail.objects.update(next_attempt_at=timezone.now())
+        self.assertEqual(send_queued_mail(connection=FlakyBackend()), (0, 1))
+        email.refresh_from_db()
+        self.assertEqual((email.status, email.attempts), (OutboundEmail.FAILED, 2))
+
+    @override_settings(OUTBOX_CLAIM_TIMEOUT=60)
+    def test_claimed_mail_is_left_to_its_worker(self):
+        for i in range(2):
+            enqueue_mail("Subject %s" % i, "Body", "from@example.com", ["to@example.com"])
+        self.assertEqual(len(claim_due_mail(10)), 2)
+        #another worker finds nothing due until the claim runs out
+        self.assertEqual(send_queued_mail(), (0, 0))
+        OutboundEmail.objects.update(next_attempt_at=timezone.now())
+        self.assertEqual(send_queued_mail(), (2, 0))
+
+    def test_unreachable_server_gives_the_batch_back(self):
+        email = enqueue_mail("Subject", "Body", "from@example.com", ["to@example.com"])
+        due = OutboundEmail.objects.get(pk=email.pk).next_attempt_at
+        with self.assertRaises(OSError):
+            send_queued_mail(connection=UnreachableBackend())
+        email.refresh_from_db()
+        self.assertEqual((email.status, email.attempts, email.next_attempt_at), (OutboundEmail.QUEUED, 0, due))
+        self.assertIn("Connection refused", email.last_error)
+        self.assertEqual(send_queued_mail(), (1, 0))
+
+    def test_sent_mail_is_recorded_one_by_one(self):
+        for i in range(2):
+            enqueue_mail("Subject %s" % i, "Body", "from@example.com", ["to@example.com"])
+        with self.assertRaises(RuntimeError):
+            send_queued_mail(connection=CrashingBackend())
+        self.assertEqual(
+            list(OutboundEmail.objects.order_by("id").values_list("status", "attempts")),
+            [(OutboundEmail.SENT, 1), (OutboundEmail.QUEUED, 1)],
+        )
+        #the first email is not sent again
+        OutboundEmail.objects.update(next_attempt_at=timezone.now())
+        self.assertEqual(send_queued_mail(), (1, 0))
+        self.assertEqual([m.subject for m in mail.outbox], ["Subject 0", "Subject 1"])
+
+    def test_command_drains_outbox(self):
+        enqueue_mail("Subject", "Body", "from@example.com", ["to@example.com"])
+        call_command("send_queued_mail", stdout=StringIO())
+        self.assertEqual(len(mail.outbox), 1)
+
+    def test_lead_create_only_enqueues(self):
+        organizer = User.objects.create_user(username="organizer", password="pass")
+        self.client.force_login(organizer)
+        response = self.client.post(reverse("leads:lead-create"), {
+            "first_name": "Lead", "last_name": "One", "age": 30,
+            "description": "New lead", "email": "lead@example.com", "phone_number": "555",
+        })
+        self.assertRedirects(response, reverse("leads:lead-list"))
+        self.assertEqual(len(mail.outbox), 0)
+        self.assertEqual(OutboundEmail.objects.count(), 1)
@@ -0,0 +1,47 @@
+from django.test import TestCase
+
+from leads.models import User, Category, Lead
+
+
+class CategoryLeadCountTest(TestCase):
+
+    def setUp(self):
+        organization = User.objects.create_user(username="organizer").userprofile
+        self.new = Category.objects.create(name="New", organization=organization)
+        self.contacted = Category.objects.create(name="Contacted", organization=organization)
+        self.lead = Lead.objects.create(
+            first_name="Lead", last_name="", organization=organization, category=self.new,
+            email="lead@example.com", phone_number="555", description="",
+        )
+
+    def assertCounts(self, new, contacted):
+        self.new.refresh_from_db()
+        self.contacted.refresh_from_db()
+        self.assertEqual((self.new.lead_count, self.contacted.lead_count), (new, contacted))
+
+    def test_create(self):
+        self.assertCounts(1, 0)
+
+    def test_recategorize(self):
+        lead = Lead.objects.get(pk=self.lead.pk)
+        lead.category = self.contacted
+        lead.save()
+        self.assertCounts(0, 1)
+        lead.category = None
+        lead.save(update_fields=["category"])
+        self.assertCounts(0, 0)
+
+    def test_save_without_category_change(self):
+        lead = Lead.objects.get(pk=self.lead.pk)
+        lead.first_name = "Renamed"
+        lead.save()
+        self.assertCounts(1, 0)
+
+    def test_delete(self):
+        Lead.objects.get(pk=self.lead.pk).delete()
+        self.assertCounts(0, 0)
+
+    def test_recount_leads(self):
+        Category.objects.update(lead_count=42)
+        Category.objects.all().recount_leads()
+        self.assertCounts(1, 0)
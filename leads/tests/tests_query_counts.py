@@ -0,0 +1,128 @@
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from agents import urls as agent_urls
+from leads import urls as lead_urls
+from leads.models import User, Agent, Category, Lead
+
+# Maximum number of queries a GET may run, per URL and role. This includes
+# the session and user lookups done by the auth middleware. None marks URLs
+# not measured here: POST-only ones, and async views, whose queries run on
+# other threads' connections (see tests_async_views).
+ORGANIZER_BUDGETS = {
+    "leads:lead-list": 5,
+    "leads:lead-list-async": None,
+    #the tenant lookup scopes the lead to the organization (and agent)
+    "leads:lead-detail": 4,
+    "leads:lead-detail-async": None,
+    #lead, one page of events, then agent and category names if they changed
+    "leads:lead-timeline": 7,
+    "leads:lead-update": 6,
+    "leads:lead-delete": 4,
+    "leads:assign-agent": 5,
+    "leads:bulk-assign": 6,
+    "leads:auto-assign": None,
+    "leads:lead-create": 5,
+    "leads:lead-import": 3,
+    "leads:lead-export": 4,
+    "leads:lead-search": 4,
+    "leads:category-list": 5,
+    "leads:category-list-async": None,
+    "leads:category-detail": 5,
+    "leads:lead-category-update": 6,
+    #reads the summary table, however many leads there are
+    "leads:dashboard": 6,
+    "agents:agent-list": 4,
+    "agents:agent-list-async": None,
+    "agents:agent-create": 3,
+    "agents:agent-detail": 5,
+    "agents:agent-update": 4,
+    "agents:agent-delete": 4,
+}
+AGENT_BUDGETS = {
+    "leads:lead-list": 4,
+    #the tenant lookup scopes the lead to the organization (and agent)
+    "leads:lead-detail": 4,
+    "leads:lead-timeline": 7,
+    "leads:lead-export": 4,
+    "leads:lead-search": 4,
+    "leads:category-list": 5,
+    "leads:category-detail": 5,
+}
+
+
+class QueryCountTest(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.organizer = User.objects.create_user(username="organizer", password="pass")
+        organization = cls.organizer.userprofile
+        cls.agent_user = User.objects.create_user(
+            username="agent", email="agent@example.com", is_organizer=False, is_agent=True
+        )
+        cls.agent = Agent.objects.create(user=cls.agent_user, organization=organization)
+        cls.category = Category.objects.create(name="New", organization=organization)
+        leads = [
+            Lead(
+                first_name="Lead", last_name=str(i), organization=organization,
+                agent=cls.agent if i % 2 else None, category=cls.category if i % 3 else None,
+                email="lead@example.com", phone_number="555", description="",
+            )
+            for i in range(30)
+        ]
+        Lead.objects.bulk_create(leads)
+        cls.lead = Lead.objects.filter(agent=cls.agent).first()
+
+    def url_kwargs(self, name):
+        return {
+            "leads:lead-detail": {"pk": self.lead.pk},
+            "leads:lead-timeline": {"pk": self.lead.pk},
+            "leads:lead-update": {"pk": self.lead.pk},
+            "leads:lead-delete": {"pk": self.lead.pk},
+            "leads:assign-agent": {"pk": self.lead.pk},
+            "leads:lead-category-update": {"pk": self.lead.pk},
+            "leads:category-detail": {"pk": self.category.pk},
+            "agents:agent-detail": {"pk": self.agent.pk},
+            "agents:agent-update": {"pk": self.agent.pk},
+            "agents:agent-delete": {"pk": self.agent.pk},
+        }.get(name, {})
+
+    def url_query(self, name):
+        return {
+            "leads:lead-search": {"q": "lead"},
+        }.get(name, {})
+
+    def test_every_url_has_a_budget(self):
+        names = {"leads:" + p.name for p in lead_urls.urlpatterns}
+        names |= {"agents:" + p.name for p in agent_urls.urlpatterns}
+        self.assertEqual(names - set(ORGANIZER_BUDGETS), set())
+
+    def setUp(self):
+        cache.clear()
+
+    def assertWithinBudgets(self, user, budgets):
+        self.client.force_login(user)
+        for name, budget in budgets.items():
+            if budget is None:
+                continue
+            with self.subTest(url=name):
+                with CaptureQueriesContext(connection) as queries:
+                    response = self.client.get(
+                        reverse(name, kwargs=self.url_kwargs(name)), self.url_query(name)
+                    )
+                    if hasattr(response, "streaming_content"):
+                        b"".join(response.streaming_content)
+                self.assertEqual(response.status_code, 200)
+                self.assertLessEqual(
+                    len(queries), budget,
+                    "\n".join(q["sql"] for q in queries.captured_queries),
+                )
+
+    def test_organizer_budgets(self):
+        self.assertWithinBudgets(self.organizer, ORGANIZER_BUDGETS)
+
+    def test_agent_budgets(self):
+        self.assertWithinBudgets(self.agent_user, AGENT_BUDGETS)
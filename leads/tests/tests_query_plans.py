@@ -0,0 +1,185 @@
+import re
+
+from django.db import connection
+from django.test import RequestFactory, TestCase
+from django.utils import timezone
+
+from agents import views as agent_views
+from leads import api, dedup
+from leads import views as lead_views
+from leads.middleware import get_tenant
+from leads.models import User, UserProfile, Agent, Category, Lead, LeadDedupKey
+from leads.pagination import KeysetPaginator
+
+ORGANIZATIONS = 20
+AGENTS_PER_ORGANIZATION = 5
+LEADS_PER_ORGANIZATION = 500
+
+
+def sequential_scans(plan):
+    """Return the tables a query plan reads without using an index."""
+    if connection.vendor == "postgresql":
+        return re.findall(r"Seq Scan on (\w+)", plan)
+    # sqlite: "SCAN leads_lead" is a full table scan, "SEARCH ..." is not
+    return [
+        match.group(1)
+        for match in re.finditer(r"\bSCAN (?:TABLE )?(\w+)(.*)", plan)
+        if "INDEX" not in match.group(2)
+    ]
+
+
+def sorts(plan):
+    """Return the sort steps a plan needs because no index supplies the order."""
+    if connection.vendor == "postgresql":
+        return re.findall(r"\bSort\b.*", plan)
+    return re.findall(r"USE TEMP B-TREE FOR ORDER BY", plan)
+
+
+class QueryPlanTest(TestCase):
+    """
+    Seed a multi-tenant dataset large enough for the planner to prefer
+    indexes, then EXPLAIN the queryset behind every CRM view.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        User.objects.bulk_create([
+            User(username="organizer%s" % o) for o in range(ORGANIZATIONS)
+        ] + [
+            User(username="agent%s-%s" % (o, a), is_organizer=False, is_agent=True)
+            for o in range(ORGANIZATIONS)
+            for a in range(AGENTS_PER_ORGANIZATION)
+        ])
+        users = {user.username: user for user in User.objects.all()}
+        UserProfile.objects.bulk_create([
+            UserProfile(user=users["organizer%s" % o]) for o in range(ORGANIZATIONS)
+        ])
+        profiles = {p.user.username: p for p in UserProfile.objects.select_related("user")}
+        agents, categories, leads = [], [], []
+        for o in range(ORGANIZATIONS):
+            organization = profiles["organizer%s" % o]
+            for a in range(AGENTS_PER_ORGANIZATION):
+                agents.append(Agent(user=users["agent%s-%s" % (o, a)], organization=organization))
+            for name in ("New", "Contacted", "Converted"):
+                categories.append(Category(name=name, organization=organization))
+        Agent.objects.bulk_create(agents)
+        Category.objects.bulk_create(categories)
+        agents = list(Agent.objects.all())
+        categories = list(Category.objects.all())
+        for organization in profiles.values():
+            org_agents = [a for a in agents if a.organization_id == organization.pk]
+            org_categories = [c for c in categories if c.organization_id == organization.pk]
+            for i in range(LEADS_PER_ORGANIZATION):
+                leads.append(Lead(
+                    first_name="Lead", last_name=str(i), organization=organization,
+                    agent=org_agents[i % len(org_agents)] if i % 4 else None,
+                    category=org_categories[i % len(org_categories)] if i % 3 else None,
+                    email="lead%s@example.com" % i, phone_number="555", description="",
+                ))
+        Lead.objects.bulk_create(leads, batch_size=1000)
+        LeadDedupKey.objects.index_missing()
+        # a few soft deleted leads waiting for purge_deleted
+        Lead.objects.filter(pk__in=Lead.objects.order_by("pk").values("pk")[:50]).update(deleted_at=timezone.now())
+        with connection.cursor() as cursor:
+            cursor.execute("ANALYZE")
+
+        cls.organizer = User.objects.get(username="organizer0")
+        cls.agent_user = User.objects.get(username="agent0-0")
+        cls.lead = Lead.objects.filter(organization__user=cls.organizer).first()
+        cls.category = Category.objects.filter(organization__user=cls.organizer).first()
+        cls.agent = Agent.objects.get(user=cls.agent_user)
+
+    def get_view(self, view_class, user, **kwargs):
+        request = RequestFactory().get("/")
+        request.user = user
+        request.tenant = get_tenant(user)
+        view = view_class()
+        view.setup(request, **kwargs)
+        return view
+
+    def assertIndexed(self, queryset):
+        plan = queryset.explain()
+        self.assertEqual(sequential_scans(plan), [], msg="%s\n%s" % (queryset.query, plan))
+
+    def assertIndexOrdered(self, queryset):
+        """Keyset pages must be read in index order, not sorted after a range scan."""
+        self.assertIndexed(queryset)
+        plan = queryset.explain()
+        self.assertEqual(sorts(plan), [], msg="%s\n%s" % (queryset.query, plan))
+
+    def test_lead_list_for_organizer(self):
+        view = self.get_view(lead_views.LeadListView, self.organizer)
+        self.assertIndexOrdered(view.get_queryset().order_by(*view.keyset_ordering)[:view.paginate_by])
+
+    def test_lead_list_for_agent(self):
+        view = self.get_view(lead_views.LeadListView, self.agent_user)
+        self.assertIndexOrdered(view.get_queryset().order_by(*view.keyset_ordering)[:view.paginate_by])
+
+    def test_unassigned_leads(self):
+        view = self.get_view(lead_views.LeadListView, self.organizer)
+        view.object_list = view.get_queryset()
+        self.assertIndexOrdered(view.get_context_data()["unassigned_leads"])
+
+    def test_lead_object_views(self):
+        for view_class in (
+            lead_views.LeadDetailView,
+            lead_views.LeadUpdateView,
+            lead_views.LeadDeleteView,
+            lead_views.LeadCategoryUpdateView,
+        ):
+            with self.subTest(view=view_class.__name__):
+                view = self.get_view(view_class, self.organizer, pk=self.lead.pk)
+                self.assertIndexed(view.get_queryset().filter(pk=self.lead.pk))
+
+    def test_category_views(self):
+        view = self.get_view(lead_views.CategoryListView, self.organizer)
+        self.assertIndexed(view.get_queryset())
+        view = self.get_view(lead_views.CategoryDetailView, self.organizer, pk=self.category.pk)
+        self.assertIndexed(view.get_queryset().filter(pk=self.category.pk))
+        self.assertIndexed(self.category.leads.all())
+
+    def test_agent_views(self):
+        view = self.get_view(agent_views.AgentListView, self.organizer)
+        self.assertIndexed(view.get_queryset())
+        for view_class in (
+            agent_views.AgentDetailView,
+            agent_views.AgentUpdateView,
+            agent_views.AgentDeleteView,
+        ):
+            with self.subTest(view=view_class.__name__):
+                view = self.get_view(view_class, self.organizer, pk=self.agent.pk)
+                self.assertIndexed(view.get_queryset().filter(pk=self.agent.pk))
+
+    def test_api_lists(self):
+        for view_class, user, fields in (
+            (api.LeadListApiView, self.organizer, ""),
+            (api.LeadListApiView, self.agent_user, ""),
+            (api.LeadListApiView, self.organizer, "id,agent_email,category_name"),
+            (api.AgentListApiView, self.organizer, ""),
+            (api.CategoryListApiView, self.organizer, ""),
+        ):
+            with self.subTest(view=view_class.__name__, user=user.username, fields=fields):
+                view = self.get_view(view_class, user)
+                view.request.GET = view.request.GET.copy()
+                view.request.GET["fields"] = fields
+                paginator = KeysetPaginator(
+                    view.values(view.get_queryset(), view.get_fields()), view.page_size, ordering=view.ordering,
+                )
+                first = paginator.queryset.order_by(*view.ordering)
+                self.assertIndexOrdered(first[:view.page_size + 1])
+                # a later page seeks past the cursor instead of sorting again
+                after = paginator.decode_cursor(paginator.encode_cursor(first[0]))
+                self.assertIndexOrdered(paginator.seek(first, after)[:view.page_size + 1])
+
+    def test_soft_deleted_leads(self):
+        # what purge_deleted reads, batch by batch
+        self.assertIndexed(Lead.all_objects.filter(deleted_at__isnull=False).order_by().values_list("pk")[:1000])
+        self.assertIndexed(Lead.all_objects.filter(agent=self.agent).order_by().values_list("pk")[:1000])
+        self.assertIndexed(
+            Lead.all_objects.filter(organization=self.lead.organization_id).order_by().values_list("pk")[:1000]
+        )
+
+    def test_duplicate_lookup(self):
+        keys = [key for key in dedup.blocking_keys("Lead", "1", "lead1@example.com", "555-0100")
+                if key[0] in dedup.DUPLICATE_KINDS]
+        self.assertIndexed(LeadDedupKey.objects.matching(self.lead.organization_id, keys).values_list("kind", "key", "lead"))
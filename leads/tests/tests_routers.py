@@ -0,0 +1,114 @@
+import unittest
+
+from django.conf import settings
+from django.db import connections
+from django.test import SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from leads.models import User, Agent, Lead
+from leads.routers import ReplicaRouter, use_replica
+
+# a second database aliased "replica", e.g. another SQLite file with
+# TEST = {"MIRROR": "default"}
+HAS_REPLICA = "replica" in settings.DATABASES
+
+
+@override_settings(DATABASE_REPLICA_ALIAS="replica")
+class ReplicaRouterTest(SimpleTestCase):
+
+    def test_reads_default_to_the_primary(self):
+        router = ReplicaRouter()
+        self.assertIsNone(router.db_for_read(Lead))
+        with use_replica():
+            self.assertEqual(router.db_for_read(Lead), "replica")
+        self.assertIsNone(router.db_for_read(Lead))
+
+    def test_writes_and_migrations_stay_on_the_primary(self):
+        router = ReplicaRouter()
+        with use_replica():
+            self.assertEqual(router.db_for_write(Lead), "default")
+        self.assertFalse(router.allow_migrate("replica", "leads"))
+        self.assertIsNone(router.allow_migrate("default", "leads"))
+
+    @override_settings(DATABASE_REPLICA_ALIAS=None)
+    def test_no_replica_configured(self):
+        with use_replica():
+            self.assertIsNone(ReplicaRouter().db_for_read(Lead))
+
+
+# the primary stands in for the replica, the point is the ASGI handler
+@override_settings(DATABASE_REPLICA_ALIAS="default")
+class ReadReplicaAsyncTest(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.organizer = User.objects.create_user(username="organizer", password="pass")
+        cls.lead = Lead.objects.create(
+            first_name="Anna", last_name="Smith", organization=cls.organizer.userprofile,
+            email="anna@example.com", phone_number="555", description="",
+        )
+
+    def setUp(self):
+        self.async_client.force_login(self.organizer)
+
+    async def test_replica_views_under_asgi(self):
+        url = reverse("leads:lead-detail", kwargs={"pk": self.lead.pk})
+        for _ in range(2):
+            response = await self.async_client.get(url)
+            self.assertContains(response, "Anna")
+        self.assertIsNone(ReplicaRouter().db_for_read(Lead))
+
+
+@unittest.skipUnless(HAS_REPLICA, "no replica database configured")
+@override_settings(DATABASE_REPLICA_ALIAS="replica")
+class ReadReplicaMiddlewareTest(TransactionTestCase):
+    # committed rows, so the replica connection can see them
+    databases = {"default", "replica"} if HAS_REPLICA else {"default"}
+
+    def setUp(self):
+        self.organizer = User.objects.create_user(username="organizer", password="pass")
+        agent = Agent.objects.create(
+            user=User.objects.create_user(username="agent", is_organizer=False, is_agent=True),
+            organization=self.organizer.userprofile,
+        )
+        self.lead = Lead.objects.create(
+            first_name="Anna", last_name="Smith", organization=self.organizer.userprofile,
+            agent=agent, email="anna@example.com", phone_number="555", description="",
+        )
+        self.client.force_login(self.organizer)
+
+    def replica_queries(self, method, url, data=None):
+        with CaptureQueriesContext(connections["replica"]) as replica:
+            with CaptureQueriesContext(connections["default"]) as primary:
+                response = getattr(self.client, method)(url, data)
+        return response, len(replica), [q["sql"] for q in primary.captured_queries]
+
+    def test_safe_views_read_from_the_replica(self):
+        response, replica, primary = self.replica_queries(
+            "get", reverse("leads:lead-detail", kwargs={"pk": self.lead.pk})
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertGreater(replica, 0)
+        # only the session and user lookups hit the primary
+        self.assertEqual(len(primary), 2, primary)
+
+    def test_other_views_use_the_primary(self):
+        _, replica, _ = self.replica_queries(
+            "get", reverse("leads:lead-update", kwargs={"pk": self.lead.pk})
+        )
+        self.assertEqual(replica, 0)
+
+    def test_writes_pin_the_client_to_the_primary(self):
+        response, replica, _ = self.replica_queries(
+            "post", reverse("leads:lead-category-update", kwargs={"pk": self.lead.pk}), {"category": ""}
+        )
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(replica, 0)
+        self.assertIn("primary_pin", response.cookies)
+        _, replica, _ = self.replica_queries("get", reverse("leads:lead-detail", kwargs={"pk": self.lead.pk}))
+        self.assertEqual(replica, 0)
+        # once the window has passed the replica is used again
+        self.client.cookies["primary_pin"] = "0"
+        _, replica, _ = self.replica_queries("get", reverse("leads:lead-detail", kwargs={"pk": self.lead.pk}))
+        self.assertGreater(replica, 0)
@@ -0,0 +1,106 @@
+import unittest
+
+from django.db import connection
+from django.test import TestCase
+from django.urls import reverse
+
+from leads.models import User, Agent, Lead
+from leads.pagination import KeysetPaginator
+from leads.search import normalize_phone, search_leads
+
+
+class LeadSearchTest(TestCase):
+
+    def setUp(self):
+        self.organizer = User.objects.create_user(username="organizer", password="pass")
+        self.organization = self.organizer.userprofile
+        self.agent_user = User.objects.create_user(username="agent", is_organizer=False, is_agent=True)
+        self.agent = Agent.objects.create(user=self.agent_user, organization=self.organization)
+        self.anna = self.create_lead("Anna", "Smith", "+1 (555) 010-2030", "anna@example.com", agent=self.agent)
+        self.smithers = self.create_lead("Waylon", "Smithers", "555 999", "ws@example.com",
+                                         description="Asked about Anna's contract")
+        self.create_lead("Bob", "Jones", "555-777", "bob@example.com")
+        # another organization's lead with the same name must never show up
+        other = User.objects.create_user(username="other").userprofile
+        self.create_lead("Anna", "Smith", "+1 (555) 010-2030", "anna@other.com", organization=other)
+
+    def create_lead(self, first_name, last_name, phone_number, email, organization=None, **kwargs):
+        return Lead.objects.create(
+            first_name=first_name, last_name=last_name, phone_number=phone_number, email=email,
+            organization=organization or self.organization, description=kwargs.pop("description", ""),
+            **kwargs
+        )
+
+    def search(self, query):
+        queryset = Lead.objects.filter(organization=self.organization)
+        return list(search_leads(queryset, query).order_by("-search_rank", "id"))
+
+    def test_phone_digits_are_kept_in_sync(self):
+        self.assertEqual(self.anna.phone_digits, "15550102030")
+        self.anna.phone_number = "555 0000"
+        self.anna.save(update_fields=["phone_number"])
+        self.anna.refresh_from_db()
+        self.assertEqual(self.anna.phone_digits, "5550000")
+
+    def test_normalize_phone(self):
+        self.assertEqual(normalize_phone("+1 (555) 010-2030"), "15550102030")
+        self.assertEqual(normalize_phone(None), "")
+
+    def test_name_prefix_and_ranking(self):
+        # name matches outrank a mention in the description
+        self.assertEqual(self.search("anna"), [self.anna, self.smithers])
+        self.assertEqual(self.search("smi"), [self.anna, self.smithers])
+
+    def test_email_and_phone(self):
+        self.assertEqual(self.search("bob@example.com")[0].first_name, "Bob")
+        self.assertEqual(self.search("15550102030"), [self.anna])
+        self.assertEqual(self.search("1-555-010-2030"), [self.anna])
+
+    def test_index_follows_updates_and_deletes(self):
+        self.anna.first_name = "Hannah"
+        self.anna.save()
+        self.assertEqual(self.search("hannah"), [self.anna])
+        self.anna.delete()
+        self.assertEqual(self.search("hannah"), [])
+
+    def test_operators_are_not_interpreted(self):
+        self.assertEqual(self.search('"'), [])
+        self.assertEqual(self.search("anna OR bob NEAR"), [])
+
+    def test_view_is_scoped_to_the_tenant(self):
+        self.client.force_login(self.organizer)
+        response = self.client.get(reverse("leads:lead-search"), {"q": "anna"})
+        self.assertEqual(list(response.context["leads"]), [self.anna, self.smithers])
+        self.client.force_login(self.agent_user)
+        response = self.client.get(reverse("leads:lead-search"), {"q": "anna"})
+        self.assertEqual(list(response.context["leads"]), [self.anna])
+
+    def test_view_paginates_by_rank(self):
+        for i in range(30):
+            self.create_lead("Anna", "Clone%d" % i, "", "clone@example.com")
+        self.client.force_login(self.organizer)
+        response = self.client.get(reverse("leads:lead-search"), {"q": "anna"})
+        page = response.context["page_obj"]
+        self.assertEqual(len(page), 25)
+        response = self.client.get(reverse("leads:lead-search"), {"q": "anna", "cursor": page.next_cursor})
+        second = response.context["page_obj"]
+        self.assertEqual(len(second), 7)
+        self.assertFalse(second.has_next())
+        self.assertEqual(len({lead.pk for lead in list(page) + list(second)}), 32)
+
+    @unittest.skipUnless(connection.vendor == "postgresql", "float4 ranks are PostgreSQL's")
+    def test_pages_through_tied_ranks(self):
+        for i in range(12):
+            self.create_lead("Anna", "Smith", "", "anna%d@example.com" % i)
+        queryset = search_leads(Lead.objects.filter(organization=self.organization), "anna smith")
+        paginator = KeysetPaginator(queryset, 5, ordering=("-search_rank", "id"))
+        seen, cursor = [], None
+        while True:
+            page = paginator.page(cursor)
+            seen += [lead.pk for lead in page]
+            if not page.has_next():
+                break
+            cursor = page.next_cursor
+        # every match exactly once, the 12 ties and Anna Smith herself included
+        self.assertEqual(sorted(seen), sorted(queryset.values_list("pk", flat=True)))
+        self.assertGreaterEqual(len(seen), 13)
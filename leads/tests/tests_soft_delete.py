@@ -0,0 +1,103 @@
+from io import StringIO
+
+from django.core.management import call_command
+from django.test import TestCase
+from django.urls import reverse
+
+from leads.models import User, UserProfile, Agent, Category, Lead, OrganizationStat
+from leads.purge import purge_agents, purge_leads, purge_organizations
+
+
+class SoftDeleteTest(TestCase):
+
+    def setUp(self):
+        self.organizer = User.objects.create_user(username="organizer", password="pass")
+        self.organization = self.organizer.userprofile
+        self.agent_user = User.objects.create_user(username="agent", is_organizer=False, is_agent=True)
+        self.agent = Agent.objects.create(user=self.agent_user, organization=self.organization)
+        self.category = Category.objects.create(name="New", organization=self.organization)
+        self.leads = [
+            self.create_lead(self.organization, agent=self.agent, category=self.category) for _ in range(5)
+        ]
+        self.other = User.objects.create_user(username="other").userprofile
+        self.other_lead = self.create_lead(self.other)
+
+    def create_lead(self, organization, **kwargs):
+        return Lead.objects.create(
+            first_name="Lead", last_name="", organization=organization,
+            email="lead@example.com", phone_number="555", description="", **kwargs
+        )
+
+    def stat(self, kind, key=""):
+        stat = OrganizationStat.objects.filter(organization=self.organization, kind=kind, key=key).first()
+        return stat.count if stat else 0
+
+    def test_lead_delete_view_soft_deletes(self):
+        self.client.force_login(self.organizer)
+        lead = self.leads[0]
+        response = self.client.post(reverse("leads:lead-delete", kwargs={"pk": lead.pk}))
+        self.assertRedirects(response, reverse("leads:lead-list"), fetch_redirect_response=False)
+        self.assertFalse(Lead.objects.filter(pk=lead.pk).exists())
+        self.assertIsNotNone(Lead.all_objects.get(pk=lead.pk).deleted_at)
+        #gone from the counters right away
+        self.category.refresh_from_db()
+        self.assertEqual(self.category.lead_count, 4)
+        self.assertEqual((self.stat("total"), self.stat("agent", str(self.agent.pk))), (4, 4))
+        self.assertEqual(
+            self.client.get(reverse("leads:lead-detail", kwargs={"pk": lead.pk})).status_code, 404,
+        )
+        #purging it changes nothing else
+        self.assertEqual(purge_leads(pause=0), 1)
+        self.assertFalse(Lead.all_objects.filter(pk=lead.pk).exists())
+        self.category.refresh_from_db()
+        self.assertEqual((self.category.lead_count, self.stat("total")), (4, 4))
+
+    def test_purge_leads_in_batches(self):
+        for lead in self.leads:
+            Lead.objects.get(pk=lead.pk).soft_delete()
+        with self.assertNumQueries(6):
+            #three SELECT and DELETE pairs
+            self.assertEqual(purge_leads(batch_size=2, pause=0), 5)
+        self.assertTrue(Lead.objects.filter(pk=self.other_lead.pk).exists())
+
+    def test_agent_delete_view_soft_deletes(self):
+        self.client.force_login(self.organizer)
+        response = self.client.post(reverse("agents:agent-delete", kwargs={"pk": self.agent.pk}))
+        self.assertRedirects(response, reverse("agents:agent-list"), fetch_redirect_response=False)
+        self.assertFalse(Agent.objects.filter(pk=self.agent.pk).exists())
+        #the agent has lost access, its leads wait for the purge
+        self.client.force_login(self.agent_user)
+        self.assertEqual(self.client.get(reverse("leads:lead-list")).context["leads"], [])
+        self.assertEqual(Lead.objects.filter(agent=self.agent).count(), 5)
+
+        self.assertEqual(purge_agents(batch_size=2, pause=0), 1)
+        self.assertFalse(Agent.all_objects.filter(pk=self.agent.pk).exists())
+        self.assertTrue(User.objects.filter(pk=self.agent_user.pk).exists())
+        self.assertEqual(Lead.objects.filter(organization=self.organization, agent__isnull=True).count(), 5)
+        self.assertEqual(Lead.objects.get(pk=self.leads[0].pk).version, 1)
+        self.assertEqual((self.stat("unassigned"), self.stat("agent", str(self.agent.pk))), (5, 0))
+
+    def test_offboard_and_purge_organization(self):
+        self.organization.soft_delete()
+        self.assertFalse(UserProfile.objects.filter(pk=self.organization.pk).exists())
+        self.assertFalse(Agent.objects.filter(pk=self.agent.pk).exists())
+        self.assertEqual(
+            set(User.objects.filter(is_active=False).values_list("username", flat=True)), {"organizer", "agent"},
+        )
+        #agents of an offboarded organization are not unassigned one by one
+        self.assertEqual(purge_agents(pause=0), 0)
+
+        self.assertEqual(purge_organizations(batch_size=2, pause=0), 1)
+        self.assertFalse(User.objects.filter(username__in=["organizer", "agent"]).exists())
+        self.assertFalse(Lead.all_objects.filter(organization=self.organization).exists())
+        self.assertFalse(Category.objects.filter(pk=self.category.pk).exists())
+        self.assertFalse(OrganizationStat.objects.filter(organization=self.organization).exists())
+        self.assertTrue(Lead.objects.filter(pk=self.other_lead.pk).exists())
+
+    def test_command(self):
+        Lead.objects.get(pk=self.leads[0].pk).soft_delete()
+        self.agent.soft_delete()
+        out = StringIO()
+        call_command("purge_deleted", "--pause", "0", stdout=out)
+        self.assertIn("Purged 0 organizations, 1 agents and 1 leads.", out.getvalue())
+        self.assertEqual(Lead.all_objects.filter(organization=self.organization).count(), 4)
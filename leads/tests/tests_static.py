@@ -0,0 +1,94 @@
+import json
+import os
+import shutil
+import tempfile
+from io import StringIO
+
+from django.conf import settings
+from django.core.management import call_command
+from django.http import HttpResponse
+from django.shortcuts import reverse
+from django.test import RequestFactory, TestCase, override_settings
+from whitenoise.middleware import WhiteNoiseMiddleware
+
+from leads.models import User
+
+STORAGE = "whitenoise.storage.CompressedManifestStaticFilesStorage"
+
+
+class StaticPipelineTest(TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.source = tempfile.mkdtemp()
+        cls.root = tempfile.mkdtemp()
+        os.makedirs(os.path.join(cls.source, "css"))
+        with open(os.path.join(cls.source, "css", "styles.css"), "w") as f:
+            f.write(".p-4{padding:1rem}\n" * 200)
+        cls.settings = override_settings(
+            STATICFILES_STORAGE=STORAGE, STATICFILES_DIRS=[cls.source], STATIC_ROOT=cls.root,
+        )
+        cls.settings.enable()
+        call_command("collectstatic", interactive=False, verbosity=0)
+        super().setUpClass()
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        cls.settings.disable()
+        shutil.rmtree(cls.source)
+        shutil.rmtree(cls.root)
+
+    def hashed_name(self, name):
+        with open(os.path.join(self.root, "staticfiles.json")) as f:
+            return json.load(f)["paths"][name]
+
+    def test_collectstatic_hashes_and_compresses(self):
+        name = self.hashed_name("css/styles.css")
+        self.assertNotEqual(name, "css/styles.css")
+        for suffix in ("", ".gz", ".br"):
+            self.assertTrue(os.path.isfile(os.path.join(self.root, name + suffix)), suffix)
+
+    def test_hashed_files_are_cached_forever(self):
+        middleware = WhiteNoiseMiddleware(lambda request: HttpResponse(status=404))
+        url = settings.STATIC_URL + self.hashed_name("css/styles.css")
+        response = middleware(RequestFactory().get(url, HTTP_ACCEPT_ENCODING="gzip, br"))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response["Content-Encoding"], "br")
+        self.assertIn("immutable", response["Cache-Control"])
+        self.assertIn("max-age=315360000", response["Cache-Control"])
+
+    def test_page_weight(self):
+        User.objects.create_user(username="organizer", password="pass")
+        out = StringIO()
+        call_command("page_weight", "organizer", reverse("leads:lead-list"), stdout=out)
+        report = out.getvalue()
+        self.assertIn(self.hashed_name("css/styles.css"), report)
+        self.assertIn("served compressed", report)
+        self.assertNotIn("missing", report)
+        self.assertNotIn("@tailwindcss/browser", report)
+
+
+class StylesheetFallbackTest(TestCase):
+
+    def get_without_stylesheet(self, storage, debug):
+        empty = tempfile.mkdtemp()
+        try:
+            with override_settings(
+                STATICFILES_STORAGE=storage, STATICFILES_DIRS=[empty], STATIC_ROOT=empty, DEBUG=debug
+            ):
+                return self.client.get(reverse("leads:lead-list"))
+        finally:
+            shutil.rmtree(empty)
+
+    def test_tailwind_is_compiled_in_the_browser_until_built(self):
+        self.client.force_login(User.objects.create_user(username="organizer", password="pass"))
+        for storage in (STORAGE, "django.contrib.staticfiles.storage.StaticFilesStorage"):
+            response = self.get_without_stylesheet(storage, debug=True)
+            self.assertContains(response, f"@tailwindcss/browser@{settings.TAILWIND_VERSION}")
+            self.assertNotContains(response, "styles.css")
+
+    def test_only_in_debug(self):
+        self.client.force_login(User.objects.create_user(username="organizer", password="pass"))
+        response = self.get_without_stylesheet(STORAGE, debug=False)
+        self.assertNotContains(response, "@tailwindcss/browser")
@@ -1,4 +1,7 @@
-from django.test import TestCase
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
 from django.shortcuts import reverse
 
 # Create your tests here.
@@ -9,4 +12,108 @@ class LandingPageTest(TestCase):
         response = self.client.get(reverse("landing-page"))
         self.assertEqual(response.status_code, 200)
         self.assertTemplateUsed(response, "landing.html")
-        
\ No newline at end of file
+        
+class LeadListViewTest(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        from leads.models import User, Agent, Category, Lead
+        cls.organizer = User.objects.create_user(username="organizer", password="pass")
+        agent_user = User.objects.create_user(
+            username="agent", password="pass", is_organizer=False, is_agent=True
+        )
+        organization = cls.organizer.userprofile
+        agent = Agent.objects.create(user=agent_user, organization=organization)
+        category = Category.objects.create(name="Contacted", organization=organization)
+        Lead.objects.bulk_create([
+            Lead(
+                first_name="Lead", last_name=str(i), organization=organization,
+                agent=agent, category=category if i % 2 else None,
+                email="lead%s@example.com" % i, phone_number="555", description="",
+            )
+            for i in range(120)
+        ])
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(self.organizer)
+
+    def test_pages_walk_every_lead_once(self):
+        seen = []
+        url = reverse("leads:lead-list")
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            page = response.context["page_obj"]
+            seen.extend(lead.pk for lead in page)
+            url = None
+            if page.has_next():
+                url = reverse("leads:lead-list") + "?cursor=" + page.next_cursor
+        self.assertEqual(len(seen), 120)
+        self.assertEqual(len(set(seen)), 120)
+
+    def test_page_cost_does_not_grow_with_depth(self):
+        with CaptureQueriesContext(connection) as first_page:
+            response = self.client.get(reverse("leads:lead-list"))
+        first_page_queries = len(first_page)
+        cursor = response.context["page_obj"].next_cursor
+        response = self.client.get(reverse("leads:lead-list"), {"cursor": cursor})
+        cursor = response.context["page_obj"].next_cursor
+        with self.assertNumQueries(first_page_queries):
+            response = self.client.get(reverse("leads:lead-list"), {"cursor": cursor})
+        self.assertEqual(len(response.context["leads"]), 20)
+
+    def test_invalid_cursor_is_404(self):
+        response = self.client.get(reverse("leads:lead-list"), {"cursor": "not-a-cursor"})
+        self.assertEqual(response.status_code, 404)
+
+class CategoryListViewTest(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        from leads.models import User, Category, Lead
+        cls.organizer = User.objects.create_user(username="organizer", password="pass")
+        other = User.objects.create_user(username="other", password="pass")
+        organization = cls.organizer.userprofile
+        cls.new = Category.objects.create(name="New", organization=organization)
+        cls.contacted = Category.objects.create(name="Contacted", organization=organization)
+        Category.objects.create(name="Converted", organization=organization)
+        def lead(organization, category):
+            return Lead(
+                first_name="Lead", last_name="", organization=organization, category=category,
+                email="lead@example.com", phone_number="555", description="",
+            )
+        Lead.objects.bulk_create(
+            [lead(organization, cls.new)] * 3
+            + [lead(organization, cls.contacted)] * 2
+            + [lead(organization, None)] * 4
+            #another tenant's leads must not show up in the counts
+            + [lead(other.userprofile, None)] * 5
+        )
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(self.organizer)
+
+    def test_counts_are_scoped_to_the_organization(self):
+        response = self.client.get(reverse("leads:category-list"))
+        counts = {c.name: c.lead_count for c in response.context["category_list"]}
+        self.assertEqual(counts, {"New": 3, "Contacted": 2, "Converted": 0})
+        self.assertEqual(response.context["unassigned_lead_count"], 4)
+
+    def test_counts_take_one_aggregate_query(self):
+        from leads.models import Category
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(reverse("leads:category-list"))
+        Category.objects.create(name="Lost", organization=self.organizer.userprofile)
+        with self.assertNumQueries(len(queries)):
+            self.client.get(reverse("leads:category-list"))
+
+    @override_settings(CATEGORY_LEAD_COUNTERS=True)
+    def test_counts_from_denormalized_counters(self):
+        from leads.models import Category
+        Category.objects.all().recount_leads()
+        response = self.client.get(reverse("leads:category-list"))
+        counts = {c.name: c.lead_count for c in response.context["category_list"]}
+        self.assertEqual(counts, {"New": 3, "Contacted": 2, "Converted": 0})
+        self.assertEqual(response.context["unassigned_lead_count"], 4)
@@ -0,0 +1,154 @@
+from django.db import connection, transaction
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from leads.assignment import bulk_assign
+from leads.dedup import blocking_keys
+from leads.models import User, Agent, Category, Lead, LeadDedupKey, StaleLeadError
+
+
+class LeadWriteTest(TestCase):
+
+    def setUp(self):
+        self.organizer = User.objects.create_user(username="organizer", password="pass")
+        self.organization = self.organizer.userprofile
+        self.agent_user = User.objects.create_user(username="agent", is_organizer=False, is_agent=True)
+        self.agent = Agent.objects.create(user=self.agent_user, organization=self.organization)
+        self.category = Category.objects.create(name="New", organization=self.organization)
+        self.lead = Lead.objects.create(
+            first_name="Lead", last_name="One", age=30, organization=self.organization, agent=self.agent,
+            email="lead@example.com", phone_number="555", description="Notes",
+        )
+        other = User.objects.create_user(username="other").userprofile
+        self.other_lead = Lead.objects.create(
+            first_name="Other", last_name="", organization=other, email="o@example.com",
+            phone_number="555", description="",
+        )
+
+    def lead_updates(self, queries):
+        return [q["sql"] for q in queries.captured_queries if q["sql"].startswith('UPDATE "leads_lead"')]
+
+    def update_data(self, **data):
+        return dict({
+            "first_name": "Lead", "last_name": "One", "age": 30, "agent": self.agent.pk,
+            "description": "Notes", "email": "lead@example.com", "phone_number": "555", "version": 0,
+        }, **data)
+
+    def test_save_changes_is_one_conditional_update(self):
+        lead = Lead.objects.get(pk=self.lead.pk)
+        lead.first_name = "Renamed"
+        with CaptureQueriesContext(connection) as queries:
+            lead.save_changes(["first_name"])
+        self.assertEqual(len(self.lead_updates(queries)), 1)
+        # and the UPDATE of its name key, see test_dedup_key_cost
+        self.assertEqual(len(queries), 2)
+        lead.refresh_from_db()
+        self.assertEqual((lead.first_name, lead.version), ("Renamed", 1))
+
+    def test_dedup_key_cost(self):
+        # what a contact field edit adds to the lead's UPDATE: one statement
+        # per way its keys change, nothing if they stay the same
+        lead = Lead.objects.get(pk=self.lead.pk)
+        for field, value, queries in (
+            ("description", "Changed", 1),
+            ("first_name", "Leed", 1),  # same Soundex
+            ("phone_number", "555-0100", 2),
+            ("email", "", 2),  # its email key is deleted
+            ("email", "lead@example.com", 2),  # and inserted again
+        ):
+            setattr(lead, field, value)
+            with self.assertNumQueries(queries):
+                lead.save_changes([field])
+        self.assertEqual(
+            set(LeadDedupKey.objects.filter(lead=lead).values_list("kind", "key")),
+            set(blocking_keys(lead.first_name, lead.last_name, lead.email, lead.phone_number)),
+        )
+
+    def test_concurrent_edits_conflict(self):
+        first = Lead.objects.get(pk=self.lead.pk)
+        second = Lead.objects.get(pk=self.lead.pk)
+        first.age = 31
+        first.save_changes(["age"])
+        second.description = "Overwritten"
+        with self.assertRaises(StaleLeadError), transaction.atomic():
+            second.save_changes(["description"])
+        self.assertEqual(second.version, 0)
+        self.lead.refresh_from_db()
+        self.assertEqual((self.lead.age, self.lead.description, self.lead.version), (31, "Notes", 1))
+
+    def test_update_view_writes_only_changed_columns(self):
+        self.client.force_login(self.organizer)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post(
+                reverse("leads:lead-update", kwargs={"pk": self.lead.pk}), self.update_data(first_name="Renamed"),
+            )
+        self.assertRedirects(response, reverse("leads:lead-list"), fetch_redirect_response=False)
+        [update] = self.lead_updates(queries)
+        set_clause, where_clause = update.split(" WHERE ")
+        self.assertIn('"first_name" = ', set_clause)
+        self.assertIn('"version" = ', set_clause)
+        self.assertNotIn('"description"', set_clause)
+        self.assertIn('"organization_id" = ', where_clause)
+        self.assertIn('"version" = 0', where_clause)
+
+    def test_update_view_without_changes_writes_nothing(self):
+        self.client.force_login(self.organizer)
+        with CaptureQueriesContext(connection) as queries:
+            self.client.post(reverse("leads:lead-update", kwargs={"pk": self.lead.pk}), self.update_data())
+        self.assertEqual(self.lead_updates(queries), [])
+
+    def test_update_view_reports_a_stale_version(self):
+        Lead.objects.filter(pk=self.lead.pk).update(version=1, description="Changed meanwhile")
+        self.client.force_login(self.organizer)
+        response = self.client.post(
+            reverse("leads:lead-update", kwargs={"pk": self.lead.pk}), self.update_data(description="Mine"),
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertIn("changed by someone else", str(response.context["form"].non_field_errors()))
+        self.lead.refresh_from_db()
+        self.assertEqual(self.lead.description, "Changed meanwhile")
+
+    def test_update_view_is_scoped_to_the_organization(self):
+        self.client.force_login(self.organizer)
+        response = self.client.post(
+            reverse("leads:lead-update", kwargs={"pk": self.other_lead.pk}), self.update_data(),
+        )
+        self.assertEqual(response.status_code, 404)
+
+    def test_assign_agent_is_one_update(self):
+        Lead.objects.filter(pk=self.lead.pk).update(agent=None)
+        self.client.force_login(self.organizer)
+        with CaptureQueriesContext(connection) as queries:
+            self.client.post(reverse("leads:assign-agent", kwargs={"pk": self.lead.pk}), {"agent": self.agent.pk})
+        [update] = self.lead_updates(queries)
+        self.assertIn('SET "agent_id" = %d, "version" = 1' % self.agent.pk, update)
+        self.assertEqual(Lead.objects.get(pk=self.lead.pk).agent, self.agent)
+        response = self.client.post(
+            reverse("leads:assign-agent", kwargs={"pk": self.other_lead.pk}), {"agent": self.agent.pk},
+        )
+        self.assertEqual(response.status_code, 404)
+
+    def test_category_update_is_one_update(self):
+        self.client.force_login(self.agent_user)
+        url = reverse("leads:lead-category-update", kwargs={"pk": self.lead.pk})
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post(url, {"category": self.category.pk, "version": 0})
+        self.assertRedirects(
+            response, reverse("leads:lead-detail", kwargs={"pk": self.lead.pk}), fetch_redirect_response=False,
+        )
+        [update] = self.lead_updates(queries)
+        self.assertIn('SET "category_id" = %d, "version" = 1' % self.category.pk, update)
+        # agents can only recategorize their own leads
+        response = self.client.post(
+            reverse("leads:lead-category-update", kwargs={"pk": self.other_lead.pk}),
+            {"category": self.category.pk},
+        )
+        self.assertEqual(response.status_code, 404)
+
+    def test_bulk_assign_bumps_versions(self):
+        bulk_assign(self.organization, [self.lead.pk], Agent.objects.create(
+            user=User.objects.create_user(username="agent2", is_organizer=False, is_agent=True),
+            organization=self.organization,
+        ))
+        self.assertEqual(Lead.objects.get(pk=self.lead.pk).version, 1)
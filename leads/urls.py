@@ -1,16 +1,27 @@
 from django.urls import path
 from .views import *
+from . import async_views
 
 app_name = "leads"
 
 urlpatterns = [
     path('', LeadListView.as_view(), name='lead-list'),
+    path('async/', async_views.lead_list, name='lead-list-async'),
+    path('async/<int:pk>/', async_views.lead_detail, name='lead-detail-async'),
+    path('async/categories/', async_views.category_list, name='category-list-async'),
     path('<int:pk>/', LeadDetailView.as_view(), name='lead-detail'),
+    path('<int:pk>/timeline/', LeadTimelineView.as_view(), name='lead-timeline'),
     path('<int:pk>/update/', LeadUpdateView.as_view(), name='lead-update'),
     path('<int:pk>/delete/', LeadDeleteView.as_view(), name='lead-delete'),
     path('<int:pk>/assign-agent/', AssignAgentView.as_view(), name="assign-agent"),
+    path('assign/', BulkAssignAgentView.as_view(), name="bulk-assign"),
+    path('assign/auto/', AutoAssignView.as_view(), name="auto-assign"),
     path('create/', LeadCreateView.as_view(), name='lead-create'),
+    path('import/', LeadImportView.as_view(), name='lead-import'),
+    path('export/', LeadExportView.as_view(), name='lead-export'),
+    path('search/', LeadSearchView.as_view(), name='lead-search'),
     path('categories/', CategoryListView.as_view(), name='category-list'),
+    path('dashboard/', DashboardView.as_view(), name='dashboard'),
     path('categories/<int:pk>', CategoryDetailView.as_view(), name='category-detail'),
     path('<int:pk>/category/', LeadCategoryUpdateView.as_view(), name="lead-category-update"),
 ]
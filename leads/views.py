@@ -1,11 +1,26 @@
-from django.shortcuts import render, redirect, reverse
+from datetime import timedelta
+
+from django.conf import settings
+from django.contrib.admin.views.decorators import staff_member_required
+from django.db import transaction
+from django.db.models import Count, Q
+from django.shortcuts import get_object_or_404, render, redirect, reverse
 from django.contrib.auth.mixins import LoginRequiredMixin
-from django.core.mail import send_mail
-from django.http import HttpResponse
-from django.views.generic import CreateView, TemplateView, ListView, DetailView, DeleteView, UpdateView, FormView
+from django.http import HttpResponse, HttpResponseRedirect, JsonResponse, StreamingHttpResponse
+from django.utils import timezone
+from django.utils.decorators import method_decorator
+from django.views.generic import View, CreateView, TemplateView, ListView, DetailView, DeleteView, UpdateView, FormView
 
-from .models import Lead, Agent, Category
-from .forms import LeadForm, LeadModelForm, CustomUserCreationForm, AssignAgentForm, LeadCategoryUpdateForm
+from .models import Lead, Agent, Category, LeadEvent, OrganizationStat, StaleLeadError
+from .forms import LeadForm, LeadModelForm, LeadCreateForm, LeadUpdateForm, CustomUserCreationForm, AssignAgentForm, LeadCategoryUpdateForm, LeadImportForm, BulkAssignAgentForm, AutoAssignForm
+from .assignment import auto_assign, bulk_assign
+from .cache import ConditionalGetMixin, TenantCacheMixin
+from .exporters import iter_lead_csv
+from .importers import LeadImportError, import_leads
+from .instrumentation import request_stats
+from .mail import enqueue_mail
+from .pagination import KeysetPaginationMixin
+from .search import search_leads
 from agents.mixins import OrganizerAndLoginRequiredMixin
 
 class SignupView(CreateView):
@@ -18,36 +33,110 @@ class SignupView(CreateView):
 class LandingPageView(TemplateView):
     template_name = "landing.html"
 
+@method_decorator(staff_member_required, name="dispatch")
+class RequestStatsView(View):
+    
+    def get(self, request, *args, **kwargs):
+        return JsonResponse(request_stats.snapshot())
+
+class TenantLeadMixin:
+    """The leads the requesting organizer, or agent, may see and change."""
+    
+    def get_lead_scope(self):
+        tenant = self.request.tenant
+        scope = Q(organization=tenant.organization)
+        if not tenant.is_organizer:
+            #filtering for the agent currently logged in
+            scope &= Q(agent=tenant.agent)
+        return scope
+    
+    def get_queryset(self):
+        return Lead.objects.filter(self.get_lead_scope())
+    
+    def save_lead(self, form, lead, fields):
+        """
+        Write only ``fields`` of ``lead``, if the lead is still at the version
+        the form was rendered with. Returns False, with a form error, if not.
+        """
+        if not fields:
+            return True
+        try:
+            #a savepoint, so a conflict doesn't break an enclosing transaction
+            with transaction.atomic():
+                lead.save_changes(fields, version=form.cleaned_data.get("version"), scope=self.get_lead_scope())
+        except StaleLeadError:
+            form.add_error(None, "This lead was changed by someone else while you were editing it. Reload the page to see their changes.")
+            return False
+        return True
+
 def landing_page(request):
     return render(request, "landing.html")
 
-class LeadListView(LoginRequiredMixin, ListView):
+class LeadListView(LoginRequiredMixin, ConditionalGetMixin, TenantCacheMixin, KeysetPaginationMixin, ListView):
     template_name = "leads/lead_list.html"
+    read_from_replica = True
     context_object_name = "leads"
+    paginate_by = 50
+    keyset_ordering = ("date_added", "id")
     
     def get_queryset(self):
-        user = self.request.user        
+        tenant = self.request.tenant
         #initial queryset of all the leads for the entire organization
-        if user.is_organizer:
-            queryset = Lead.objects.filter(organization=user.userprofile, agent__isnull=False)
+        if tenant.is_organizer:
+            queryset = Lead.objects.filter(organization=tenant.organization, agent__isnull=False)
         else:
-            queryset = Lead.objects.filter(organization=user.agent.organization)            
             #filtering for the agent currently logged in
-            queryset = queryset.filter(agent__user=self.request.user)        
-        return queryset 
+            queryset = Lead.objects.filter(organization=tenant.organization, agent=tenant.agent)
+        #join the category in and only load the columns the table renders
+        return queryset.select_related("category").only(
+            "id", "date_added", "first_name", "last_name", "age",
+            "email", "phone_number", "category__name",
+        )
+    def get_unassigned_queryset(self):
+        return Lead.objects.filter(
+            organization=self.request.tenant.organization, 
+            agent__isnull=True
+        ).only(
+            "id", "date_added", "first_name", "last_name", "description",
+        ).order_by("date_added", "id")[:self.paginate_by]
+    
     def get_context_data(self, **kwargs):
-        user = self.request.user
         context = super(LeadListView, self).get_context_data(**kwargs)
-        if user.is_organizer:
-            queryset = Lead.objects.filter(
-                organization=user.userprofile, 
-                agent__isnull=True
-            )
+        if self.request.tenant.is_organizer:
             context.update({
-                "unassigned_leads": queryset
+                "unassigned_leads": self.get_unassigned_queryset()
             })
         return context
 
+class LeadSearchView(LoginRequiredMixin, KeysetPaginationMixin, ListView):
+    template_name = "leads/lead_search.html"
+    read_from_replica = True
+    context_object_name = "leads"
+    paginate_by = 25
+    #best match first, id breaks ties so cursors stay stable
+    keyset_ordering = ("-search_rank", "id")
+    
+    def get_search_query(self):
+        return self.request.GET.get("q", "").strip()[:100]
+    
+    def get_queryset(self):
+        tenant = self.request.tenant
+        #organizers search the whole organization, agents their own leads
+        queryset = Lead.objects.filter(organization=tenant.organization)
+        if not tenant.is_organizer:
+            queryset = queryset.filter(agent=tenant.agent)
+        queryset = queryset.select_related("category").only(
+            "id", "first_name", "last_name", "email", "phone_number", "category__name",
+        )
+        return search_leads(queryset, self.get_search_query())
+    
+    def get_context_data(self, **kwargs):
+        context = super(LeadSearchView, self).get_context_data(**kwargs)
+        context.update({
+            "query": self.get_search_query()
+        })
+        return context
+
 def lead_list(request):
     leads = Lead.objects.all()
     context = {
@@ -55,13 +144,60 @@ def lead_list(request):
     }
     return render(request, 'leads/lead_list.html', context)
 
-class LeadDetailView(LoginRequiredMixin,DetailView):
+class LeadDetailView(LoginRequiredMixin, ConditionalGetMixin, TenantLeadMixin, DetailView):
     template_name = "leads/lead_detail.html"
-    queryset = Lead.objects.all()
+    read_from_replica = True
     context_object_name = "lead"
     
     
 
+class LeadTimelineView(LoginRequiredMixin, KeysetPaginationMixin, ListView):
+    template_name = "leads/lead_timeline.html"
+    read_from_replica = True
+    context_object_name = "events"
+    paginate_by = 50
+    #newest first, id breaks ties so cursors stay stable
+    keyset_ordering = ("-created_at", "-id")
+    
+    def get_lead(self):
+        if not hasattr(self, "lead"):
+            tenant = self.request.tenant
+            leads = Lead.objects.filter(organization=tenant.organization)
+            if not tenant.is_organizer:
+                leads = leads.filter(agent=tenant.agent)
+            self.lead = get_object_or_404(leads.only("id", "first_name", "last_name"), pk=self.kwargs["pk"])
+        return self.lead
+    
+    def get_queryset(self):
+        return LeadEvent.objects.filter(lead=self.get_lead()).select_related("actor").only(
+            "id", "kind", "changes", "created_at", "actor__username",
+        )
+    
+    def describe_changes(self, events):
+        """Set event.change_rows to (field, old, new) with agent and category names."""
+        ids = {"agent": set(), "category": set()}
+        for event in events:
+            for name in ids:
+                ids[name].update(value for value in event.changes.get(name, []) if value is not None)
+        names = {"agent": {}, "category": {}}
+        if ids["agent"]:
+            names["agent"] = dict(Agent.objects.filter(pk__in=ids["agent"]).values_list("pk", "user__username"))
+        if ids["category"]:
+            names["category"] = dict(Category.objects.filter(pk__in=ids["category"]).values_list("pk", "name"))
+        for event in events:
+            event.change_rows = [
+                (name.replace("_", " "),) + tuple(names.get(name, {}).get(value, value) for value in values)
+                for name, values in event.changes.items()
+            ]
+    
+    def get_context_data(self, **kwargs):
+        context = super(LeadTimelineView, self).get_context_data(**kwargs)
+        self.describe_changes(context["events"])
+        context.update({
+            "lead": self.get_lead()
+        })
+        return context
+    
 def lead_detail(request, pk):
     lead = Lead.objects.get(id=pk)
     context = {
@@ -71,16 +207,23 @@ def lead_detail(request, pk):
 
 class LeadCreateView(OrganizerAndLoginRequiredMixin,CreateView):
     template_name = "leads/lead_create.html"
-    form_class = LeadModelForm
+    form_class = LeadCreateForm
+    
+    def get_form_kwargs(self, **kwargs):
+        kwargs = super(LeadCreateView, self).get_form_kwargs(**kwargs)
+        kwargs.update({
+            "organization": self.request.tenant.organization
+        })
+        return kwargs
     
     def get_success_url(self):
         return reverse("leads:lead-list")
     
     def form_valid(self, form):
         lead = form.save(commit=False)
-        lead.organization = self.request.user.userprofile
+        lead.organization = self.request.tenant.organization
         lead.save()
-        send_mail(
+        enqueue_mail(
             subject="A lead has been created.", 
             message="Visit the site to check it out.",
             from_email="test_sender@test.com",
@@ -89,11 +232,14 @@ class LeadCreateView(OrganizerAndLoginRequiredMixin,CreateView):
         return super(LeadCreateView, self).form_valid(form)
 
 def lead_create(request):
-    form = LeadModelForm()
+    organization = request.tenant.organization
+    form = LeadCreateForm(organization=organization)
     if request.method == "POST":
-        form = LeadModelForm(request.POST)        
+        form = LeadCreateForm(request.POST, organization=organization)
         if form.is_valid():
-            form.save()
+            lead = form.save(commit=False)
+            lead.organization = organization
+            lead.save()
             return redirect("/leads")
     context = {
         'form': form
@@ -101,20 +247,66 @@ def lead_create(request):
     return render(request, "leads/lead_create.html", context)
 
 
-class LeadUpdateView(OrganizerAndLoginRequiredMixin, UpdateView):
-    template_name = "leads/lead_update.html"
-    form_class = LeadModelForm 
-       
+class LeadImportView(OrganizerAndLoginRequiredMixin, FormView):
+    template_name = "leads/lead_import.html"
+    form_class = LeadImportForm
+    
+    def form_valid(self, form):
+        upload = form.cleaned_data["file"]
+        try:
+            result = import_leads(
+                self.request.tenant.organization,
+                upload,
+                upload.name,
+                batch_size=form.cleaned_data["batch_size"] or 1000,
+                allow_duplicates=form.cleaned_data["allow_duplicates"],
+            )
+        except LeadImportError as e:
+            form.add_error("file", str(e))
+            return self.form_invalid(form)
+        return self.render_to_response(self.get_context_data(form=LeadImportForm(), result=result))
+
+
+class LeadExportView(LoginRequiredMixin, View):
+    chunk_size = 2000
+    
     def get_queryset(self):
-        user = self.request.user        
-        #initial queryset of all the leads for the entire organization       
-        return Lead.objects.filter(organization=user.userprofile)
+        tenant = self.request.tenant
+        #organizers export the whole organization, assigned or not
+        queryset = Lead.objects.filter(organization=tenant.organization)
+        if not tenant.is_organizer:
+            #filtering for the agent currently logged in
+            queryset = queryset.filter(agent=tenant.agent)
+        return queryset
+    
+    def get(self, request, *args, **kwargs):
+        response = StreamingHttpResponse(
+            iter_lead_csv(self.get_queryset(), chunk_size=self.chunk_size),
+            content_type="text/csv",
+        )
+        response["Content-Disposition"] = 'attachment; filename="leads.csv"'
+        return response
+
+
+class LeadUpdateView(OrganizerAndLoginRequiredMixin, TenantLeadMixin, UpdateView):
+    template_name = "leads/lead_update.html"
+    form_class = LeadUpdateForm 
+    
+    def get_form_kwargs(self, **kwargs):
+        kwargs = super(LeadUpdateView, self).get_form_kwargs(**kwargs)
+        kwargs.update({
+            "organization": self.request.tenant.organization
+        })
+        return kwargs
     
     def get_success_url(self):
         return reverse("leads:lead-list")
     
-    def get_queryset(self):
-        return Lead.objects.all()
+    def form_valid(self, form):
+        #the form has updated self.object, write only what changed
+        if not self.save_lead(form, self.object, form.changed_fields()):
+            return self.form_invalid(form)
+        return HttpResponseRedirect(self.get_success_url())
 
 def lead_update(request, pk):
     lead = Lead.objects.get(id=pk)
@@ -137,16 +329,27 @@ class LeadDeleteView(OrganizerAndLoginRequiredMixin,DeleteView):
         return reverse("leads:lead-list")
     
     def get_queryset(self):
-        user = self.request.user        
         #initial queryset of all the leads for the entire organization       
-        return Lead.objects.filter(organization=user.userprofile)
+        return Lead.objects.filter(organization=self.request.tenant.organization)
+    
+    def delete(self, request, *args, **kwargs):
+        #soft delete, purge_deleted removes the row in the background
+        self.object = self.get_object()
+        try:
+            with transaction.atomic():
+                self.object.soft_delete()
+        except StaleLeadError:
+            #edited since it was loaded, delete it as it is now
+            self.object = self.get_object()
+            self.object.soft_delete()
+        return HttpResponseRedirect(self.get_success_url())
 
 def lead_delete(request, pk):
     lead = Lead.objects.get(id=pk)
-    lead.delete()
+    lead.soft_delete()
     return redirect("/leads")
 
-class AssignAgentView(OrganizerAndLoginRequiredMixin, FormView):
+class AssignAgentView(OrganizerAndLoginRequiredMixin, TenantLeadMixin, FormView):
     template_name = "leads/assign_agent.html"
     form_class = AssignAgentForm
     
@@ -162,33 +365,156 @@ class AssignAgentView(OrganizerAndLoginRequiredMixin, FormView):
     
     def form_valid(self, form):
         agent = form.cleaned_data["agent"]
-        lead = Lead.objects.get(id=self.kwargs["pk"])
+        #just the columns the write and its signal handlers need
+        lead = get_object_or_404(
+            self.get_queryset().only("id", "organization", "agent", "category", "date_added", "version"),
+            pk=self.kwargs["pk"],
+        )
+        fields = ["agent"] if lead.agent_id != agent.pk else []
         lead.agent = agent
-        lead.save()
+        if not self.save_lead(form, lead, fields):
+            return self.form_invalid(form)
         return super(AssignAgentView, self).form_valid(form)
     
-class CategoryListView(LoginRequiredMixin, ListView):
+class BulkAssignAgentView(OrganizerAndLoginRequiredMixin, FormView):
+    template_name = "leads/bulk_assign_agent.html"
+    form_class = BulkAssignAgentForm
+    page_size = 100
+    
+    def get_form_kwargs(self, **kwargs):
+        kwargs = super(BulkAssignAgentView, self).get_form_kwargs(**kwargs)
+        kwargs.update({
+            "request": self.request
+        })
+        return kwargs
+    
+    def get_context_data(self, **kwargs):
+        context = super(BulkAssignAgentView, self).get_context_data(**kwargs)
+        #the oldest unassigned leads, one page at a time
+        context.update({
+            "unassigned_leads": Lead.objects.filter(
+                organization=self.request.tenant.organization,
+                agent__isnull=True,
+            ).only(
+                "id", "date_added", "first_name", "last_name", "email",
+            ).order_by("date_added", "id")[:self.page_size],
+        })
+        context.setdefault("auto_assign_form", AutoAssignForm())
+        return context
+    
+    def get_success_url(self):
+        return reverse("leads:bulk-assign")
+    
+    def form_valid(self, form):
+        bulk_assign(
+            self.request.tenant.organization,
+            [lead.pk for lead in form.cleaned_data["leads"]],
+            form.cleaned_data["agent"],
+        )
+        return super(BulkAssignAgentView, self).form_valid(form)
+    
+class AutoAssignView(OrganizerAndLoginRequiredMixin, FormView):
+    template_name = "leads/bulk_assign_agent.html"
+    form_class = AutoAssignForm
+    http_method_names = ["post"]
+    
+    def get_success_url(self):
+        return reverse("leads:bulk-assign")
+    
+    def form_valid(self, form):
+        auto_assign(
+            self.request.tenant.organization,
+            strategy=form.cleaned_data["strategy"],
+            limit=form.cleaned_data["limit"],
+        )
+        return super(AutoAssignView, self).form_valid(form)
+    
+    def form_invalid(self, form):
+        #re-render the bulk assign page with the auto assign errors
+        view = BulkAssignAgentView(request=self.request, args=self.args, kwargs=self.kwargs)
+        return self.render_to_response(view.get_context_data(auto_assign_form=form))
+    
+class CategoryListView(LoginRequiredMixin, ConditionalGetMixin, TenantCacheMixin, ListView):
     template_name = "leads/category_list.html"
+    read_from_replica = True
     context_object_name = "category_list"
     
+    def get_lead_counts(self):
+        """{category_id: lead count}, with None for leads without a category."""
+        leads = Lead.objects.filter(organization=self.request.tenant.organization)
+        if settings.CATEGORY_LEAD_COUNTERS:
+            #categories already carry their denormalized lead_count
+            return {None: leads.filter(category__isnull=True).count()}
+        #one grouped query for every category plus the unassigned bucket
+        return dict(
+            leads.order_by().values_list("category").annotate(count=Count("id"))
+        )
+    
+    def apply_lead_counts(self, categories, counts):
+        if not settings.CATEGORY_LEAD_COUNTERS:
+            for category in categories:
+                category.lead_count = counts.get(category.pk, 0)
+        return counts.get(None, 0)
+    
     def get_context_data(self, **kwargs):
         context = super(CategoryListView, self).get_context_data(**kwargs)
-        user = self.request.user
+        counts = self.get_lead_counts()
         context.update({
-            "unassigned_lead_count": Lead.objects.filter(category__isnull=True).count()
+            "unassigned_lead_count": self.apply_lead_counts(context["category_list"], counts)
         })
         return context
     
     def get_queryset(self):
-        user = self.request.user
-        if user.is_organizer:
-            queryset = Category.objects.filter(organization=user.userprofile)
-        else:
-            queryset = Category.objects.filter(organization=user.agent.organization)            
-        return queryset
+        queryset = Category.objects.filter(organization=self.request.tenant.organization)
+        return queryset.order_by("name", "id")
+    
+class DashboardView(OrganizerAndLoginRequiredMixin, TemplateView):
+    template_name = "leads/dashboard.html"
+    read_from_replica = True
+    days = 30
+    
+    def get_stats(self):
+        """{(kind, key): count} from the summary table, never from the leads."""
+        first_day = timezone.localdate() - timedelta(days=self.days - 1)
+        stats = OrganizationStat.objects.filter(
+            organization=self.request.tenant.organization
+        ).exclude(kind=OrganizationStat.DAY, key__lt=first_day.isoformat())
+        return {(kind, key): count for kind, key, count in stats.values_list("kind", "key", "count")}
     
-class CategoryDetailView(LoginRequiredMixin, DetailView):
+    def get_context_data(self, **kwargs):
+        context = super(DashboardView, self).get_context_data(**kwargs)
+        organization = self.request.tenant.organization
+        stats = self.get_stats()
+        total = stats.get((OrganizationStat.TOTAL, ""), 0)
+        agents = Agent.objects.filter(organization=organization).select_related("user").only(
+            "id", "user__username", "user__first_name", "user__last_name",
+        ).order_by("user__username")
+        categories = Category.objects.filter(organization=organization).only("id", "name").order_by("name", "id")
+        category_rows = [
+            (category.name, stats.get((OrganizationStat.CATEGORY, str(category.pk)), 0))
+            for category in categories
+        ]
+        category_rows.append(("Uncategorized", stats.get((OrganizationStat.CATEGORY, ""), 0)))
+        today = timezone.localdate()
+        days = [today - timedelta(days=offset) for offset in range(self.days - 1, -1, -1)]
+        context.update({
+            "total_leads": total,
+            "unassigned_leads": stats.get((OrganizationStat.UNASSIGNED, ""), 0),
+            "agent_rows": sorted(
+                ((agent, stats.get((OrganizationStat.AGENT, str(agent.pk)), 0)) for agent in agents),
+                key=lambda row: -row[1],
+            ),
+            "category_rows": [
+                (name, count, round(100 * count / total, 1) if total else 0)
+                for name, count in category_rows
+            ],
+            "day_rows": [(day, stats.get((OrganizationStat.DAY, day.isoformat()), 0)) for day in days],
+        })
+        return context
+    
+class CategoryDetailView(LoginRequiredMixin, ConditionalGetMixin, TenantCacheMixin, DetailView):
     template_name= "leads/category_detail.html"
+    read_from_replica = True
     context_object_name = "category"
     
     # def get_context_data(self, **kwargs):
@@ -201,14 +527,9 @@ class CategoryDetailView(LoginRequiredMixin, DetailView):
     #     return context
     
     def get_queryset(self):
-        user = self.request.user
-        if user.is_organizer:
-            queryset = Category.objects.filter(organization=user.userprofile)
-        else:
-            queryset = Category.objects.filter(organization=user.agent.organization)            
-        return queryset
+        return Category.objects.filter(organization=self.request.tenant.organization)
     
-class LeadCategoryUpdateView(LoginRequiredMixin, UpdateView):
+class LeadCategoryUpdateView(LoginRequiredMixin, TenantLeadMixin, UpdateView):
     template_name = "leads/lead_category_update.html"
     form_class = LeadCategoryUpdateForm 
        
@@ -222,8 +543,17 @@ class LeadCategoryUpdateView(LoginRequiredMixin, UpdateView):
     #         queryset = queryset.filter(agent__user=user)
     #     return queryset
     
+    def get_form_kwargs(self, **kwargs):
+        kwargs = super(LeadCategoryUpdateView, self).get_form_kwargs(**kwargs)
+        kwargs.update({
+            "organization": self.request.tenant.organization
+        })
+        return kwargs
+    
     def get_success_url(self):
-        return reverse("leads:lead-detail", kwargs={"pk": self.get_object().id})
+        return reverse("leads:lead-detail", kwargs={"pk": self.object.pk})
     
-    def get_queryset(self):
-        return Lead.objects.all()
\ No newline at end of file
+    def form_valid(self, form):
+        if not self.save_lead(form, self.object, form.changed_fields()):
+            return self.form_invalid(form)
+        return HttpResponseRedirect(self.get_success_url())
\ No newline at end of file
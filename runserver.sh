@@ -1,4 +1,8 @@
+set -e
+# without Node.js (or network for npx) the build fails and so does the
+# deploy, see TAILWIND_CLI in the README
+python manage.py build_css
 python manage.py collectstatic --no-input
 python manage.py migrate
 
-gunicorn djcrm2.wsgi:application --bind 0.0.0.0:$PORT
\ No newline at end of file
+gunicorn djcrm2.wsgi:application --config gunicorn.conf.py
\ No newline at end of file